@@ -0,0 +1,298 @@
+"""Agregações usadas pelos dashboards, independentes do Streamlit.
+
+O app_final monta os gráficos a partir destas funções e os benchmarks as
+executam sem interface.
+"""
+import importlib
+import os
+import threading
+
+import pandas as pd
+
+import db_rh as db
+
+
+# --- AGRUPAMENTO NO TEMPO ---
+# Intervalos longos chegam ao gráfico já somados por semana ou por mês: o
+# número de pontos, e o tamanho da figura enviada ao navegador, fica limitado
+# qualquer que seja o intervalo escolhido (~92 dias, ~105 semanas, 1 por mês).
+
+AGRUPAMENTOS = {"D": "dia", "W": "semana", "M": "mês"}
+MAX_DIAS_POR_DIA = 92
+MAX_DIAS_POR_SEMANA = 731
+
+def agrupamento_para(d_ini, d_fim):
+    """'D', 'W' ou 'M' conforme o tamanho do intervalo."""
+    dias = (pd.Timestamp(d_fim) - pd.Timestamp(d_ini)).days + 1
+    if dias <= MAX_DIAS_POR_DIA:
+        return "D"
+    return "W" if dias <= MAX_DIAS_POR_SEMANA else "M"
+
+
+# --- EFETIVO DIÁRIO ---
+
+def historico_presentes(d_ini, d_fim, agrupamento=None):
+    """Presentes no intervalo: DataFrame Data/Quantidade. Por dia, ou média diária
+    por semana/mês (agrupamento None escolhe pelo tamanho do intervalo)."""
+    agrupamento = agrupamento or agrupamento_para(d_ini, d_fim)
+    df = pd.DataFrame(db.get_efetivo_por_periodo(d_ini, d_fim, agrupamento, presentes=True),
+                      columns=['Data', 'Quantidade'])
+    df['Data'] = pd.to_datetime(df['Data'])
+    return df
+
+def situacoes_ultimo_dia():
+    """Ausências por situação no último dia carregado: (Timestamp, DataFrame Situação/Total)."""
+    data, situacoes = db.get_efetivo_situacoes_dia()
+    return pd.Timestamp(data), pd.DataFrame(situacoes, columns=['Situação', 'Total'])
+
+def detalhe_situacao(data, situacao):
+    """Colaboradores de uma situação no dia, com a abreviação do cadastro: Matrícula/Nome/Função/Abrev."""
+    df = pd.DataFrame(db.get_efetivo_detalhe(data, situacao), columns=['Matrícula', 'Nome', 'Função'])
+    # Para a hierarquia, precisamos da Abreviação do cadastro original
+    df['Abrev'] = df['Matrícula'].map(db.get_diretorio().siglas).fillna(df['Função'])
+    return df
+
+
+# --- DASH EFETIVO ---
+
+def efetivo_por_abreviacao():
+    """Métricas do cadastro: (total, ativos, inativos, DataFrame Função/Quantidade por abreviação)."""
+    df = pd.DataFrame(db.get_funcionarios(), columns=db.COLUNAS_FUNCIONARIOS)
+    counts = df['Abrev.'].str.upper().value_counts().reset_index()
+    counts.columns = ['Função', 'Quantidade']
+    return len(df), int((df['Status'] == 'Ativo').sum()), int((df['Status'] == 'Inativo').sum()), counts
+
+
+# --- ESPELHO COLUNAR DAS HORAS (opcional) ---
+# Com o duckdb instalado, as horas apontadas de cada obra ficam num espelho
+# colunar em memória e o filtro do mês, as somas por dia, por abreviação e por
+# equipamento rodam como consultas do DuckDB, que devolvem só o DataFrame do
+# resultado. O espelho guarda as chaves inteiras: a cada escrita só as linhas
+# novas são acrescentadas (ids de apontamento só crescem); exclusões e meses
+# arquivados/desarquivados recarregam tudo. Abreviações e tags são tabelas
+# pequenas, relidas quando mudam. Sem duckdb, ou com
+# SANTIN_MOTOR_ANALISE=sql, valem as consultas SQL do db_rh.
+
+MOTOR_ANALISE = os.environ.get("SANTIN_MOTOR_ANALISE", "auto").strip().lower()  # auto | duckdb | sql
+
+_duckdb = None
+_espelhos = {}
+_espelhos_lock = threading.Lock()
+
+
+def _modulo_duckdb():
+    global _duckdb
+    if MOTOR_ANALISE == "sql":
+        return None
+    if _duckdb is None:
+        try:
+            _duckdb = importlib.import_module("duckdb")
+        except ImportError:
+            if MOTOR_ANALISE == "duckdb":
+                raise
+            _duckdb = False
+    return _duckdb or None
+
+
+_COLUNAS_FATOS = ["id", "data", "colaborador_id", "equipamento_id", "minutos"]
+
+
+class EspelhoHoras:
+    """Horas apontadas de uma obra numa base DuckDB em memória.
+
+    Uma conexão DuckDB não pode ser usada por duas threads ao mesmo tempo:
+    atualizar grava pelo cursor _escrita (sob _lock) e cada thread que
+    consulta usa o seu próprio cursor, criado uma vez, também sob _lock.
+    """
+
+    def __init__(self, duckdb):
+        self.con = duckdb.connect()
+        self._lock = threading.Lock()
+        self._escrita = self.con.cursor()
+        self._cursores = threading.local()
+        self._escrita.execute("CREATE TABLE fatos (id BIGINT, data VARCHAR, colaborador_id BIGINT, "
+                              "equipamento_id BIGINT, minutos BIGINT)")
+        self._escrita.execute("CREATE TABLE siglas (colaborador_id BIGINT, sigla VARCHAR)")
+        self._escrita.execute("CREATE TABLE equipamentos (equipamento_id BIGINT, tag VARCHAR)")
+        self.versoes = None
+        self.ultimo_id = 0
+        # Resultados por consulta, válidos até a próxima mudança de versão
+        self._resultados = {}
+
+    def _inserir(self, tabela, linhas, colunas):
+        df = pd.DataFrame(linhas, columns=colunas)
+        self._escrita.register("_linhas", df)
+        try:
+            self._escrita.execute(f"INSERT INTO {tabela} SELECT * FROM _linhas")
+        finally:
+            self._escrita.unregister("_linhas")
+
+    def _tabela_nova(self, tabela, linhas, colunas):
+        # Monta o conteúdo completo ao lado da tabela em uso; _trocar a põe no lugar
+        self._escrita.execute(f"CREATE OR REPLACE TABLE {tabela}_nova AS SELECT * FROM {tabela} LIMIT 0")
+        self._inserir(f"{tabela}_nova", linhas, colunas)
+        return tabela
+
+    def _trocar(self, tabelas):
+        # Numa transação só: as consultas das outras sessões (cada uma no seu
+        # cursor) veem as tabelas antigas ou as novas, nunca uma tabela pela metade
+        if not tabelas:
+            return
+        self._escrita.execute("BEGIN TRANSACTION")
+        try:
+            for tabela in tabelas:
+                self._escrita.execute(f"DROP TABLE {tabela}")
+                self._escrita.execute(f"ALTER TABLE {tabela}_nova RENAME TO {tabela}")
+            self._escrita.execute("COMMIT")
+        except Exception:
+            self._escrita.execute("ROLLBACK")
+            raise
+
+    def atualizar(self):
+        """Sincroniza com o banco da obra atual; sem escrita desde a última vez, não faz nada."""
+        versoes = db.versoes_atuais("apontamentos", "funcionarios", "equipamentos", "meses_arquivados")
+        if versoes == self.versoes:
+            return
+        with self._lock:
+            if versoes == self.versoes:
+                return
+            anteriores = self.versoes
+            trocar = []
+            if anteriores is None or anteriores[3] != versoes[3]:
+                trocar.append(self._tabela_nova("fatos", db.ler_fatos_apontamentos(), _COLUNAS_FATOS))
+            elif anteriores[0] != versoes[0]:
+                novos = db.ler_fatos_apontamentos(self.ultimo_id)
+                atuais = self._escrita.execute("SELECT COUNT(*) FROM fatos").fetchone()[0]
+                if atuais + len(novos) == db.contar_apontamentos():
+                    # Só inclusões: um INSERT, que as outras sessões veem inteiro ou não veem
+                    self._inserir("fatos", novos, _COLUNAS_FATOS)
+                else:
+                    # Houve exclusão (o total não bate): recarrega
+                    trocar.append(self._tabela_nova("fatos", db.ler_fatos_apontamentos(), _COLUNAS_FATOS))
+            if anteriores is None or anteriores[1] != versoes[1]:
+                trocar.append(self._tabela_nova("siglas", db.get_siglas_colaboradores(), ["colaborador_id", "sigla"]))
+            if anteriores is None or anteriores[0] != versoes[0] or anteriores[2] != versoes[2]:
+                trocar.append(self._tabela_nova("equipamentos", db.get_ref_equipamentos(), ["equipamento_id", "tag"]))
+            self._trocar(trocar)
+            self.ultimo_id = self._escrita.execute("SELECT COALESCE(MAX(id), 0) FROM fatos").fetchone()[0]
+            self._resultados = {}
+            self.versoes = versoes
+
+    def _cursor(self):
+        # Cursor da thread atual; criá-lo usa a conexão principal, por isso sob _lock
+        cursor = getattr(self._cursores, "cursor", None)
+        if cursor is None:
+            with self._lock:
+                cursor = self._cursores.cursor = self.con.cursor()
+        return cursor
+
+    def consultar(self, sql, params=()):
+        """DataFrame do resultado (uma cópia: quem chama pode alterá-lo)."""
+        chave = (sql, tuple(params))
+        resultados = self._resultados
+        df = resultados.get(chave)
+        if df is None:
+            df = self._cursor().execute(sql, params).df()
+            if len(resultados) < 256:
+                resultados[chave] = df
+        return df.copy()
+
+
+def _espelho():
+    """Espelho atualizado da obra atual, ou None para usar o SQL do db_rh."""
+    duckdb = _modulo_duckdb()
+    if duckdb is None:
+        return None
+    chave = db.caminho_obra(db.obra_atual())
+    with _espelhos_lock:
+        espelho = _espelhos.get(chave)
+        if espelho is None:
+            espelho = _espelhos[chave] = EspelhoHoras(duckdb)
+    espelho.atualizar()
+    return espelho
+
+
+# --- DASH PRODUTIVIDADE ('mes' no formato 'AAAA-MM') ---
+
+def horas_por_dia(mes):
+    espelho = _espelho()
+    if espelho is not None:
+        df = espelho.consultar('''SELECT data AS Data, SUM(minutos) / 60.0 AS Horas_Dec FROM fatos
+                                  WHERE data BETWEEN ? AND ? GROUP BY data ORDER BY data''', [f"{mes}-01", f"{mes}-31"])
+    else:
+        df = pd.DataFrame(db.get_horas_por_dia(mes), columns=['Data', 'Horas_Dec'])
+    df['Data'] = pd.to_datetime(df['Data'])
+    return df
+
+def horas_por_abreviacao(mes):
+    espelho = _espelho()
+    if espelho is not None:
+        return espelho.consultar('''SELECT s.sigla AS "Função", SUM(f.minutos) / 60.0 AS Horas_Dec
+                                    FROM fatos f JOIN siglas s USING (colaborador_id)
+                                    WHERE f.data BETWEEN ? AND ?
+                                    GROUP BY 1 ORDER BY 1 NULLS FIRST''', [f"{mes}-01", f"{mes}-31"])
+    return pd.DataFrame(db.get_horas_por_abreviacao(mes), columns=['Função', 'Horas_Dec'])
+
+def horas_por_equipamento(mes, abreviacao=None):
+    espelho = _espelho()
+    if espelho is not None:
+        sql = '''SELECT ANY_VALUE(q.tag) AS Equipamento, SUM(f.minutos) / 60.0 AS Horas_Dec
+                 FROM fatos f
+                 LEFT JOIN equipamentos q USING (equipamento_id)
+                 LEFT JOIN siglas s USING (colaborador_id)
+                 WHERE f.data BETWEEN ? AND ?'''
+        params = [f"{mes}-01", f"{mes}-31"]
+        if abreviacao is not None:
+            sql += " AND s.sigla = ?"
+            params.append(abreviacao)
+        return espelho.consultar(sql + " GROUP BY f.equipamento_id ORDER BY 1 NULLS FIRST", params)
+    return pd.DataFrame(db.get_horas_por_equipamento(mes, abreviacao), columns=['Equipamento', 'Horas_Dec'])
+
+# Início do período no espelho, com a mesma regra de db.AGRUPAMENTOS_DATA (semana começa na segunda)
+_PERIODO_ESPELHO = {
+    "D": "data",
+    "W": "strftime(date_trunc('week', TRY_CAST(data AS DATE)), '%Y-%m-%d')",
+    "M": "substr(data, 1, 7) || '-01'",
+}
+
+def horas_por_periodo(d_ini, d_fim, agrupamento=None):
+    """Horas no intervalo por dia, semana ou mês: DataFrame Data/Horas_Dec
+    (agrupamento None escolhe pelo tamanho do intervalo)."""
+    agrupamento = agrupamento or agrupamento_para(d_ini, d_fim)
+    d_ini, d_fim = pd.Timestamp(d_ini).strftime("%Y-%m-%d"), pd.Timestamp(d_fim).strftime("%Y-%m-%d")
+    espelho = _espelho()
+    if espelho is not None:
+        df = espelho.consultar(f'''SELECT * FROM (
+                                       SELECT {_PERIODO_ESPELHO[agrupamento]} AS Data, SUM(minutos) / 60.0 AS Horas_Dec
+                                       FROM fatos WHERE data BETWEEN ? AND ? GROUP BY 1)
+                                   WHERE Data IS NOT NULL ORDER BY 1''', [d_ini, d_fim])
+        df['Horas_Dec'] = df['Horas_Dec'].fillna(0.0)
+    else:
+        df = pd.DataFrame(db.get_horas_por_periodo(d_ini, d_fim, agrupamento), columns=['Data', 'Horas_Dec'])
+    df['Data'] = pd.to_datetime(df['Data'])
+    return df
+
+
+# --- CONSOLIDADO DAS OBRAS ---
+
+def _resumo_obra(mes):
+    # Roda dentro de db.usar_obra(), uma thread por obra
+    diretorio = db.get_diretorio()
+    _, ultimo = db.get_efetivo_periodo()
+    presentes = db.get_efetivo_por_dia(ultimo, ultimo, presentes=True) if ultimo else []
+    horas = sum(h or 0 for _, h in db.get_horas_por_dia(mes))
+    return [len(diretorio), len(diretorio.ativos()), ultimo, presentes[0][1] if presentes else 0, horas]
+
+def meses_todas_as_obras():
+    """Meses ('AAAA-MM') com apontamentos em qualquer obra, do mais recente para o mais antigo."""
+    meses = db.em_todas_as_obras(db.get_meses_apontamentos)
+    return sorted({m for lista in meses.values() for m in lista}, reverse=True)
+
+def consolidado_obras(mes):
+    """Uma linha por obra, consultadas em paralelo: Obra/Cadastrados/Ativos/Último Efetivo/Presentes/Horas no Mês."""
+    nomes = {codigo: nome for codigo, nome in db.listar_obras()}
+    resultados = db.em_todas_as_obras(_resumo_obra, mes)
+    df = pd.DataFrame([[nomes[c], *r] for c, r in resultados.items()],
+                      columns=['Obra', 'Cadastrados', 'Ativos', 'Último Efetivo', 'Presentes', 'Horas no Mês'])
+    df['Horas no Mês'] = df['Horas no Mês'].round(1)
+    return df
@@ -1,14 +1,16 @@
 import streamlit as st
-import pandas as pd
 import time
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from io import BytesIO
 
-# Tenta importar o módulo db_rh
+# Leve: mede a partida do processo e carrega pandas/plotly sob demanda nas seções
+import perfil
+
+# Tenta importar o módulo db_rh; o esquema é preparado uma vez por processo
 try:
-    import db_rh as db
+    with perfil.partida("import db_rh"):
+        import db_rh as db
+    with perfil.partida("init_db (migrações e dados padrão)"):
+        db.init_db()
 except Exception as e:
     st.error(f"Erro ao carregar o módulo 'db_rh.py'. Erro: {e}")
 
@@ -62,6 +64,9 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+# Perfil do rerun (?perfil=1 na URL ou SANTIN_PERFIL=1; só SANTIN_PERFIL=cprofile grava .pstats)
+perf = perfil.iniciar(st.query_params.get("perfil"))
+
 # --- INICIALIZAÇÃO DE ESTADO ---
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -73,169 +78,130 @@ def reset_form():
     st.session_state.form_key += 1
 
 def calcular_horas(e, s_a, r_a, s_f):
-    try:
-        fmt = '%H:%M:%S'
-        t1 = datetime.strptime(str(e), fmt)
-        t2 = datetime.strptime(str(s_a), fmt)
-        t3 = datetime.strptime(str(r_a), fmt)
-        t4 = datetime.strptime(str(s_f), fmt)
-        p1 = t2 - t1
-        p2 = t4 - t3
-        total = p1 + p2
-        total_segundos = total.total_seconds()
-        horas = int(total_segundos // 3600)
-        minutos = int((total_segundos % 3600) // 60)
-        return f"{horas:02d}:{minutos:02d}"
-    except:
-        return "00:00"
-
-def horas_para_decimal(h_m):
-    try:
-        h, m = map(int, h_m.split(':'))
-        return h + m / 60.0
-    except:
-        return 0.0
+    # Aceita jornadas que passam da meia-noite
+    minutos = db.calcular_minutos_trabalhados(e, s_a, r_a, s_f)
+    return db.formatar_minutos(minutos) if minutos is not None else "00:00"
 
-# --- RELÓGIO DISCRETO ---
-now = datetime.now()
-st.markdown(f"<div class='clock-style'>{now.strftime('%d/%m/%Y - %H:%M')}</div>", unsafe_allow_html=True)
+# Séries no tempo: acima de LIMITE_PONTOS_ROTULO pontos o gráfico usa Scattergl
+# (WebGL), sem rótulo por ponto, e o Plotly escolhe as marcas do eixo
+LIMITE_PONTOS_ROTULO = 60
+FORMATO_EIXO_DATA = {"D": "%d/%m/%Y", "W": "%d/%m/%Y", "M": "%m/%Y"}
+PASSO_EIXO_DATA = {"D": "D1", "W": 7 * 24 * 3600 * 1000, "M": "M1"}
 
-# --- BARRA LATERAL (LOGIN COM SECRETS) ---
-with st.sidebar:
-    st.markdown("<h2 class='header-style'>🔐 Acesso Restrito</h2>", unsafe_allow_html=True)
-    
-    if not st.session_state.logged_in:
-        with st.container():
-            user = st.text_input("Usuário")
-            password = st.text_input("Senha", type="password")
-            if st.button("Entrar"):
-                try:
-                    admin_user = st.secrets["credentials"]["admin_user"]
-                    admin_password = st.secrets["credentials"]["admin_password"]
-                    if user == admin_user and password == admin_password:
-                        st.session_state.logged_in = True
-                        st.success("Acesso Autorizado!")
-                        time.sleep(1); st.rerun()
-                    else:
-                        st.error("Credenciais inválidas")
-                except:
-                    if hasattr(db, 'check_login'):
-                        if db.check_login(user, password):
-                            st.session_state.logged_in = True
-                            st.success("Acesso Autorizado!")
-                            time.sleep(1); st.rerun()
-                        else:
-                            st.error("Credenciais inválidas")
+def grafico_temporal(df, x, y, titulo, agrupamento, rotulo="{:.0f}", cor_marcador=None, largura=2, suave=False):
+    """Linha de `y` por data já agrupada em dia/semana/mês ('D', 'W', 'M')."""
+    go = perfil.importar("plotly.graph_objects")
+    linha = dict(width=largura, color='#FFD700')
+    marcador = dict(size=10 if cor_marcador else 6, color=cor_marcador or '#FFD700')
+    if len(df) <= LIMITE_PONTOS_ROTULO:
+        if suave:
+            linha["shape"] = "spline"
+        serie = go.Scatter(x=df[x], y=df[y], mode='lines+markers+text', text=[rotulo.format(v) for v in df[y]],
+                           textposition="top center", textfont=dict(color="black", size=12),
+                           line=linha, marker=marcador, name=y)
     else:
-        st.write(f"Conectado como: **Gestor de Projeto**")
-        if st.button("Sair"):
-            st.session_state.logged_in = False
-            st.rerun()
-
-    st.markdown("---")
-    st.info("Apenas gestores podem registrar apontamentos e gerenciar o efetivo.")
-
-# --- CORPO PRINCIPAL ---
-st.markdown("<h1 class='header-style'>🏗️ GRUPO SANTIN - Controle de Obras</h1>", unsafe_allow_html=True)
-
-# Definição das Abas
-if st.session_state.logged_in:
-    tabs_list = ["📅 Efetivo Diário", "➕ Novo Colaborador", "✍️ Apontar Horas", "📊 Dash Efetivo", "📈 Dash Produtividade", "📖 Consulta Geral", "⏱️ Registros de Horas", "⚙️ Gestão de Funções", "🚜 Gestão de Equipamentos", "✏️ Atualizar Dados", "🗑️ Remover Registro"]
-else:
-    tabs_list = ["📅 Efetivo Diário", "📊 Dash Efetivo", "📈 Dash Produtividade", "📖 Consulta Geral", "⏱️ Registros de Horas"]
-
-aba_view = st.tabs(tabs_list)
+        serie = go.Scattergl(x=df[x], y=df[y], mode='lines', line=linha, name=y)
+    eixo = dict(type='date', tickformat=FORMATO_EIXO_DATA[agrupamento], tickangle=-45)
+    if len(df) <= 31:
+        eixo["dtick"] = PASSO_EIXO_DATA[agrupamento]  # uma marca por ponto
+    fig = go.Figure(serie)
+    fig.update_layout(title=titulo, xaxis=eixo, template="plotly_white", margin=dict(b=100))
+    return fig
 
-# --- LÓGICA DE EXIBIÇÃO ---
+# --- SEÇÕES ---
+# Cada seção é uma função: só a escolhida na navegação é executada no rerun,
+# e só ela importa as bibliotecas pesadas que usa (pandas, plotly, analise).
 
-# ABA 0: EFETIVO DIÁRIO
-with aba_view[0]:
+# EFETIVO DIÁRIO
+def secao_efetivo_diario():
+    pd = perfil.importar("pandas")
+    px = perfil.importar("plotly.express")
+    analise = perfil.importar("analise")
     st.subheader("📅 Controle de Efetivo Diário")
     
     if st.session_state.logged_in:
         with st.expander("📤 Upload de Efetivo (Excel - Aba 'Efetivo')"):
             u_file = st.file_uploader("Selecione o arquivo Excel", type=['xlsx'])
+            aceitar_fora = st.checkbox("Aceitar matrículas fora do cadastro de funcionários", value=False)
             if u_file and st.button("Processar Arquivo"):
                 try:
-                    # Lê especificamente a aba 'Efetivo'
-                    df_u = pd.read_excel(u_file, sheet_name='Efetivo')
-                    
-                    # Verifica se as colunas necessárias existem (sem acentos conforme solicitado)
-                    cols_required = ['Data', 'Matricula', 'Nome', 'Funcao', 'Status', 'Situacao']
-                    if all(c in df_u.columns for c in cols_required):
-                        # Limpa dados das datas que estão sendo subidas para evitar duplicidade
-                        datas_no_arquivo = df_u['Data'].unique()
-                        for d in datas_no_arquivo:
-                            db.delete_efetivo_por_data(d)
-                        
-                        if db.add_efetivo_diario_batch(df_u):
-                            st.success("Efetivo carregado com sucesso!")
-                            time.sleep(1); st.rerun()
-                    else:
-                        st.error(f"O arquivo deve conter as colunas: {', '.join(cols_required)}")
+                    # Lê a aba 'Efetivo' em lotes; as datas do arquivo substituem as já gravadas
+                    barra = st.progress(0.0, text="Importando efetivo...")
+                    def atualizar_barra(rel):
+                        total = rel.get("total_estimado")
+                        fracao = min(rel["linhas"] / total, 1.0) if total else 0.0
+                        barra.progress(fracao, text=f"{rel['linhas']} linhas processadas")
+                    rel = db.importar_efetivo_excel(u_file, progresso=atualizar_barra,
+                                                    exigir_cadastro=not aceitar_fora)
+                    barra.progress(1.0, text=f"{rel['linhas']} linhas processadas")
+                    # O relatório sobrevive ao rerun para o usuário corrigir a planilha
+                    st.session_state["efetivo_rejeicoes"] = rel
+                    st.success(f"Efetivo carregado com sucesso! {rel['inseridas']} registros em {len(rel['datas'])} dia(s).")
+                    time.sleep(1); st.rerun()
+                except ValueError as e:
+                    st.error(str(e))
                 except Exception as e:
                     st.error(f"Erro ao processar: {e}")
 
-    # Visualização dos Dados
-    dados_efetivo = db.get_efetivo_diario()
-    if dados_efetivo:
-        df_ef = pd.DataFrame(dados_efetivo, columns=["Data", "Matrícula", "Nome", "Função", "Status", "Situação"])
-        df_ef['Data'] = pd.to_datetime(df_ef['Data'])
-        
+            rel = st.session_state.get("efetivo_rejeicoes")
+            if rel and rel["situacoes_corrigidas"]:
+                st.info("Situações gravadas com a grafia padrão: " +
+                        ", ".join(f"'{de}' → '{para}'" for de, para in rel["situacoes_corrigidas"].items()))
+            if rel and rel["rejeitadas"]:
+                st.warning(f"{rel['rejeitadas']} linha(s) rejeitada(s) na última importação:")
+                df_rej = pd.DataFrame(rel["rejeicoes"])
+                st.dataframe(df_rej, use_container_width=True, hide_index=True)
+                st.download_button("Baixar linhas rejeitadas (CSV)", df_rej.to_csv(index=False).encode("utf-8-sig"),
+                                   "efetivo_rejeitadas.csv", "text/csv")
+
+    # Visualização dos Dados (agregações feitas no banco)
+    data_min, data_max = db.get_efetivo_periodo()
+    if data_min:
         # 1. Gráfico de Linhas (Histórico Status 1 - Presente)
         st.markdown("### 📈 Histórico de Efetivo (Presentes)")
         c1, c2 = st.columns(2)
-        with c1: d_ini = st.date_input("Data Início", value=df_ef['Data'].min())
-        with c2: d_fim = st.date_input("Data Fim", value=df_ef['Data'].max())
-        
-        df_hist = df_ef[(df_ef['Data'] >= pd.Timestamp(d_ini)) & (df_ef['Data'] <= pd.Timestamp(d_fim)) & (df_ef['Status'] == 1)]
-        df_hist_count = df_hist.groupby('Data').size().reset_index(name='Quantidade')
-        
-        fig_hist = px.line(df_hist_count, x='Data', y='Quantidade', markers=True, 
-                          title="Efetivo Presente ao Longo do Tempo", color_discrete_sequence=['#FFD700'],
-                          text='Quantidade')
-        fig_hist.update_traces(textposition="top center", textfont=dict(color="black", size=12))
-        fig_hist.update_xaxes(
-            type='date',
-            tickformat='%d/%m/%Y',
-            dtick="D1", # Força intervalo de 1 dia
-            tickangle=-45
-        )
-        fig_hist.update_layout(margin=dict(b=100))
+        with c1: d_ini = st.date_input("Data Início", value=pd.Timestamp(data_min))
+        with c2: d_fim = st.date_input("Data Fim", value=pd.Timestamp(data_max))
+    
+        # Intervalos longos vêm agrupados por semana ou mês (média diária de presentes)
+        agrup_hist = analise.agrupamento_para(d_ini, d_fim)
+        with perf.etapa("dados"):
+            df_hist_count = analise.historico_presentes(d_ini, d_fim, agrup_hist)
+    
+        with perf.etapa("graficos"):
+            titulo_hist = "Efetivo Presente ao Longo do Tempo"
+            if agrup_hist != "D":
+                titulo_hist += f" (média diária por {analise.AGRUPAMENTOS[agrup_hist]})"
+            fig_hist = grafico_temporal(df_hist_count, 'Data', 'Quantidade', titulo_hist, agrup_hist)
         st.plotly_chart(fig_hist, use_container_width=True)
-        
+    
         st.markdown("---")
-        
+    
         # 2. Gráfico de Barras Horizontais (Status do Dia - Outras Situações)
         st.markdown("### 📊 Status do Efetivo (Último Registro)")
-        data_recente = df_ef['Data'].max()
-        df_recente = df_ef[df_ef['Data'] == data_recente]
-        
-        # Filtrar apenas status que NÃO são 1 para o gráfico de barras horizontais
-        df_status_dia = df_recente[df_recente['Status'] != 1].groupby('Situação').size().reset_index(name='Total')
-        
+        # Apenas status que NÃO são 1 entram no gráfico de barras horizontais
+        with perf.etapa("dados"):
+            data_recente, df_status_dia = analise.situacoes_ultimo_dia()
+    
         col_graf, col_tab = st.columns([1, 1])
-        
+    
         with col_graf:
-            fig_status = px.bar(df_status_dia, y='Situação', x='Total', orientation='h', 
-                               title=f"Distribuição de Situações - {data_recente.strftime('%d/%m/%Y')}",
-                               color_discrete_sequence=['#000000'], text_auto=True)
-            fig_status.update_layout(yaxis={'categoryorder':'total ascending'})
+            with perf.etapa("graficos"):
+                fig_status = px.bar(df_status_dia, y='Situação', x='Total', orientation='h', 
+                                   title=f"Distribuição de Situações - {data_recente.strftime('%d/%m/%Y')}",
+                                   color_discrete_sequence=['#000000'], text_auto=True)
+                fig_status.update_layout(yaxis={'categoryorder':'total ascending'})
             sel_status = st.plotly_chart(fig_status, use_container_width=True, on_select="rerun")
-        
+    
         with col_tab:
             sit_filtrada = None
             if sel_status and "selection" in sel_status and "points" in sel_status["selection"] and sel_status["selection"]["points"]:
                 sit_filtrada = sel_status["selection"]["points"][0]["y"]
                 st.markdown(f"#### Detalhes: {sit_filtrada}")
-                
-                df_detalhe = df_recente[df_recente['Situação'] == sit_filtrada]
-                
-                # Para a hierarquia, precisamos da Abreviação do cadastro original
-                dados_func = db.get_funcionarios()
-                dict_abrev = {f[0]: f[3].upper() if f[3] else f[2].upper() for f in dados_func}
-                df_detalhe['Abrev'] = df_detalhe['Matrícula'].map(dict_abrev).fillna(df_detalhe['Função'])
-                
+    
+                with perf.etapa("dados"):
+                    df_detalhe = analise.detalhe_situacao(data_recente, sit_filtrada)
+    
                 abrevs = sorted(df_detalhe['Abrev'].unique())
                 for a in abrevs:
                     with st.expander(f"🔸 {a}"):
@@ -247,52 +213,55 @@ with aba_view[0]:
     else:
         st.info("Nenhum dado de efetivo diário carregado.")
 
-if st.session_state.logged_in:
-    # 1: NOVO COLABORADOR
-    with aba_view[1]:
-        st.subheader("➕ Cadastro de Novo Colaborador")
-        funcoes_disponiveis = db.get_funcoes()
-        with st.form(key=f"form_novo_colab_{st.session_state.form_key}"):
-            c1, c2 = st.columns(2)
-            with c1:
-                mat = st.text_input("Matrícula *")
-                nome = st.text_input("Nome Completo *")
-                func = st.selectbox("Função/Cargo *", funcoes_disponiveis)
-            with c2:
-                abrev = st.text_input("Abreviação")
-                adm = st.date_input("Data de Admissão")
-                mo = st.selectbox("Tipo de MO", ["MOD", "MOI"])
-                status = st.selectbox("Status", ["Ativo", "Inativo"])
-            if st.form_submit_button("Cadastrar Colaborador"):
-                if mat.isdigit() and nome:
-                    success, msg = db.add_funcionario(mat, nome, func, abrev, adm, mo, status)
-                    if success:
-                        st.success("Cadastrado!"); reset_form(); time.sleep(1); st.rerun()
-                    else: st.error(f"Erro: {msg}")
-                else: st.error("Verifique os campos obrigatórios (Matrícula deve ser numérica).")
-
-    # 2: APONTAR HORAS
-    with aba_view[2]:
-        st.subheader("✍️ Novo Apontamento Diário")
-        dados_func = db.get_funcionarios()
-        mats = [d[0] for d in dados_func]
-        equipamentos_disp = db.get_equipamentos()
-        
+# NOVO COLABORADOR (gestor)
+def secao_novo_colaborador():
+    st.subheader("➕ Cadastro de Novo Colaborador")
+    funcoes_disponiveis = db.get_funcoes()
+    with st.form(key=f"form_novo_colab_{st.session_state.form_key}"):
+        c1, c2 = st.columns(2)
+        with c1:
+            mat = st.text_input("Matrícula *")
+            nome = st.text_input("Nome Completo *")
+            func = st.selectbox("Função/Cargo *", funcoes_disponiveis)
+        with c2:
+            abrev = st.text_input("Abreviação")
+            adm = st.date_input("Data de Admissão")
+            mo = st.selectbox("Tipo de MO", ["MOD", "MOI"])
+            status = st.selectbox("Status", ["Ativo", "Inativo"])
+        if st.form_submit_button("Cadastrar Colaborador"):
+            if mat.isdigit() and nome:
+                success, msg = db.add_funcionario(mat, nome, func, abrev, adm, mo, status)
+                if success:
+                    st.success("Cadastrado!"); reset_form(); time.sleep(1); st.rerun()
+                else: st.error(f"Erro: {msg}")
+            else: st.error("Verifique os campos obrigatórios (Matrícula deve ser numérica).")
+
+# APONTAR HORAS (gestor)
+def secao_apontar_horas():
+    pd = perfil.importar("pandas")
+    st.subheader("✍️ Novo Apontamento Diário")
+    diretorio = db.get_diretorio()
+    mats = diretorio.matriculas
+    equipamentos_disp = db.get_equipamentos()
+    
+    modo_ap = st.radio("Modo de lançamento", ["Individual", "Equipe (em lote)"], horizontal=True)
+    
+    if modo_ap == "Individual":
         with st.form(key=f"form_apont_horas_{st.session_state.form_key}"):
             c1, c2, c3 = st.columns(3)
             with c1:
                 sel_mat = st.selectbox("Matrícula Colaborador *", [""] + mats)
-                func_info = next((f for f in dados_func if f[0] == sel_mat), None)
-                nome_auto = func_info[1] if func_info else ""
-                funcao_auto = func_info[2] if func_info else ""
+                func_info = diretorio.get(sel_mat)
+                nome_auto = func_info.nome if func_info else ""
+                funcao_auto = func_info.funcao if func_info else ""
                 st.text_input("Nome", value=nome_auto, disabled=True)
                 st.text_input("Função", value=funcao_auto, disabled=True)
                 data_ap = st.date_input("Data do Apontamento", value=datetime.now().date())
-            
+    
             with c2:
                 equip = st.selectbox("Equipamento Utilizado *", [""] + equipamentos_disp)
                 ativ = st.text_area("Descrição da Atividade")
-            
+    
             with c3:
                 ent = st.time_input("Início Jornada", value=datetime.strptime("07:00", "%H:%M").time())
                 s_alm = st.time_input("Saída Intervalo", value=datetime.strptime("12:00", "%H:%M").time())
@@ -303,206 +272,481 @@ if st.session_state.logged_in:
 
             if st.form_submit_button("Registrar em Obra"):
                 if sel_mat and equip and ativ:
-                    db.add_apontamento(sel_mat, nome_auto, funcao_auto, equip, ativ, ent, s_alm, r_alm, s_fin, total_h, data_ap)
-                    st.success("Registrado com sucesso!")
-                    reset_form(); time.sleep(1); st.rerun()
+                    try:
+                        db.add_apontamento(sel_mat, nome_auto, funcao_auto, equip, ativ, ent, s_alm, r_alm, s_fin, total_h, data_ap)
+                    except ValueError as e:  # mês arquivado
+                        st.error(str(e))
+                    else:
+                        st.success("Registrado com sucesso!")
+                        reset_form(); time.sleep(1); st.rerun()
                 else: st.warning("Preencha os campos obrigatórios.")
     
-    idx_offset = 3
-else:
-    idx_offset = 1
+    else:
+        # Lançamento de uma equipe inteira: mesma data e equipamento, horários por colaborador
+        c1, c2, c3 = st.columns(3)
+        with c1: data_eq = st.date_input("Data do Apontamento", value=datetime.now().date(), key="data_equipe")
+        with c2: equip_eq = st.selectbox("Equipamento Utilizado *", [""] + equipamentos_disp, key="equip_equipe")
+        with c3: ativ_eq = st.text_input("Atividade padrão", key="ativ_equipe")
+    
+        ativos = diretorio.ativos()
+        funcoes_eq = st.multiselect("Filtrar por função", sorted({c.funcao for c in ativos if c.funcao}), key="func_equipe")
+        if funcoes_eq:
+            ativos = diretorio.ativos(funcoes_eq)
+    
+        hora = lambda h: datetime.strptime(h, "%H:%M").time()
+        with perf.etapa("dados"):
+            df_equipe = pd.DataFrame({
+                "Incluir": False,
+                "Matrícula": [c.matricula for c in ativos],
+                "Nome": [c.nome for c in ativos],
+                "Função": [c.funcao for c in ativos],
+                "Atividade": ativ_eq,
+                "Entrada": hora("07:00"),
+                "S. Almoço": hora("12:00"),
+                "R. Almoço": hora("13:00"),
+                "Saída": hora("17:00"),
+            })
+        grade = st.data_editor(
+            df_equipe, hide_index=True, use_container_width=True,
+            key=f"grade_equipe_{st.session_state.form_key}",
+            disabled=["Matrícula", "Nome", "Função"],
+            column_config={
+                "Entrada": st.column_config.TimeColumn(format="HH:mm", step=60),
+                "S. Almoço": st.column_config.TimeColumn(format="HH:mm", step=60),
+                "R. Almoço": st.column_config.TimeColumn(format="HH:mm", step=60),
+                "Saída": st.column_config.TimeColumn(format="HH:mm", step=60),
+            },
+        )
+        selecionados = grade[grade["Incluir"]]
+        st.info(f"Colaboradores selecionados: **{len(selecionados)}**")
+    
+        if st.button("Registrar Equipe em Obra"):
+            if not equip_eq or selecionados.empty:
+                st.warning("Selecione o equipamento e ao menos um colaborador.")
+            elif (selecionados["Atividade"].fillna("").str.strip() == "").any():
+                st.warning("Informe a atividade de todos os colaboradores selecionados.")
+            elif selecionados[["Entrada", "S. Almoço", "R. Almoço", "Saída"]].isna().any(axis=None):
+                st.warning("Preencha os quatro horários de todos os colaboradores selecionados.")
+            else:
+                registros = [
+                    (r["Matrícula"], r["Nome"], r["Função"], equip_eq, r["Atividade"],
+                     r["Entrada"], r["S. Almoço"], r["R. Almoço"], r["Saída"],
+                     calcular_horas(r["Entrada"], r["S. Almoço"], r["R. Almoço"], r["Saída"]), data_eq)
+                    for r in selecionados.to_dict("records")
+                ]
+                try:
+                    n = db.add_apontamentos_batch(registros)
+                except ValueError as e:  # mês arquivado
+                    st.error(str(e))
+                else:
+                    st.success(f"{n} apontamentos registrados com sucesso!")
+                    reset_form(); time.sleep(1); st.rerun()
 
 # DASHBOARD EFETIVO
-with aba_view[0 + idx_offset]:
-    dados = db.get_funcionarios()
-    if dados:
-        df = pd.DataFrame(dados, columns=["Matrícula", "Nome", "Função", "Abrev.", "Admissão", "MO", "Status"])
+def secao_dash_efetivo():
+    px = perfil.importar("plotly.express")
+    analise = perfil.importar("analise")
+    with perf.etapa("dados"):
+        total_ef, ativos_ef, inativos_ef, counts = analise.efetivo_por_abreviacao()
+    if total_ef:
         m1, m2, m3 = st.columns(3)
-        with m1: st.markdown(f"<div class='metric-card'><h3>Total Efetivo</h3><h2>{len(df)}</h2></div>", unsafe_allow_html=True)
-        with m2: st.markdown(f"<div class='metric-card'><h3>Ativos na Obra</h3><h2 style='color: green;'>{len(df[df['Status'] == 'Ativo'])}</h2></div>", unsafe_allow_html=True)
-        with m3: st.markdown(f"<div class='metric-card'><h3>Inativos/Desligados</h3><h2 style='color: red;'>{len(df[df['Status'] == 'Inativo'])}</h2></div>", unsafe_allow_html=True)
-        
-        df['Abrev_Upper'] = df['Abrev.'].str.upper()
-        counts = df['Abrev_Upper'].value_counts().reset_index()
-        counts.columns = ['Função', 'Quantidade']
-        fig = px.bar(counts, x='Função', y='Quantidade', title="Efetivo por Função (Agrupado por Abreviação)", color_discrete_sequence=['#FFD700'], text_auto=True)
-        fig.update_layout(
-            plot_bgcolor='white',
-            xaxis=dict(tickangle=-45, automargin=True, tickfont=dict(size=12)),
-            margin=dict(l=50, r=50, b=120, t=50)
-        )
+        with m1: st.markdown(f"<div class='metric-card'><h3>Total Efetivo</h3><h2>{total_ef}</h2></div>", unsafe_allow_html=True)
+        with m2: st.markdown(f"<div class='metric-card'><h3>Ativos na Obra</h3><h2 style='color: green;'>{ativos_ef}</h2></div>", unsafe_allow_html=True)
+        with m3: st.markdown(f"<div class='metric-card'><h3>Inativos/Desligados</h3><h2 style='color: red;'>{inativos_ef}</h2></div>", unsafe_allow_html=True)
+    
+        with perf.etapa("graficos"):
+            fig = px.bar(counts, x='Função', y='Quantidade', title="Efetivo por Função (Agrupado por Abreviação)", color_discrete_sequence=['#FFD700'], text_auto=True)
+            fig.update_layout(
+                plot_bgcolor='white',
+                xaxis=dict(tickangle=-45, automargin=True, tickfont=dict(size=12)),
+                margin=dict(l=50, r=50, b=120, t=50)
+            )
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("Nenhum colaborador cadastrado ainda.")
 
 # DASHBOARD PRODUTIVIDADE
-with aba_view[1 + idx_offset]:
+def secao_dash_produtividade():
+    pd = perfil.importar("pandas")
+    px = perfil.importar("plotly.express")
+    analise = perfil.importar("analise")
     st.subheader("📈 Análise de Produtividade (Horas)")
-    aponts = db.get_apontamentos()
-    if aponts:
-        df_ap = pd.DataFrame(aponts, columns=["Matrícula", "Nome", "Função", "Equipamento", "Atividade", "Entrada", "S. Almoço", "R. Almoço", "Saída", "Total", "Data"])
-        df_ap['Data'] = pd.to_datetime(df_ap['Data'])
-        df_ap['Horas_Dec'] = df_ap['Total'].apply(horas_para_decimal)
-        df_ap['Mes_Ano'] = df_ap['Data'].dt.strftime('%m/%Y')
-        
-        meses_disp = sorted(df_ap['Mes_Ano'].unique(), reverse=True)
-        mes_sel = st.selectbox("Filtrar Mês de Referência", meses_disp)
-        
-        df_filtrado = df_ap[df_ap['Mes_Ano'] == mes_sel].sort_values('Data')
-        
-        df_dia = df_filtrado.groupby('Data')['Horas_Dec'].sum().reset_index()
-        fig_dia = go.Figure()
-        fig_dia.add_trace(go.Scatter(
-            x=df_dia['Data'], y=df_dia['Horas_Dec'], mode='lines+markers+text',
-            line_shape='spline', text=[f"{h:.1f}h" for h in df_dia['Horas_Dec']],
-            textposition="top center", 
-            textfont=dict(color="black", size=12),
-            marker=dict(size=10, color='#000000'),
-            line=dict(width=3, color='#FFD700'), name="Horas"
-        ))
-        fig_dia.update_layout(
-            title=f"Horas por Dia - {mes_sel}", 
-            xaxis=dict(
-                type='date',
-                tickformat="%d/%m/%Y",
-                dtick="D1" # Força intervalo de 1 dia para não mostrar horas
-            ), 
-            template="plotly_white"
-        )
+    meses_disp = db.get_meses_apontamentos()
+    if meses_disp:
+        # Meses vêm como 'AAAA-MM' do banco; exibidos como MM/AAAA
+        mes_sel = st.selectbox("Filtrar Mês de Referência", meses_disp, format_func=lambda m: f"{m[5:7]}/{m[:4]}")
+        mes_label = f"{mes_sel[5:7]}/{mes_sel[:4]}"
+    
+        with perf.etapa("dados"):
+            df_dia = analise.horas_por_dia(mes_sel)
+        with perf.etapa("graficos"):
+            fig_dia = grafico_temporal(df_dia, 'Data', 'Horas_Dec', f"Horas por Dia - {mes_label}", "D",
+                                       rotulo="{:.1f}h", cor_marcador='#000000', largura=3, suave=True)
         st.plotly_chart(fig_dia, use_container_width=True)
-        
+
+        with st.expander("📆 Horas ao Longo do Tempo"):
+            # Padrão: todo o histórico (do mês mais antigo ao mais recente)
+            h1, h2 = st.columns(2)
+            with h1: h_ini = st.date_input("De", value=pd.Timestamp(f"{meses_disp[-1]}-01"), key="horas_ini")
+            with h2: h_fim = st.date_input("Até", value=pd.Timestamp(f"{meses_disp[0]}-01") + pd.offsets.MonthEnd(0),
+                                           key="horas_fim")
+            agrup_h = analise.agrupamento_para(h_ini, h_fim)
+            with perf.etapa("dados"):
+                df_periodo = analise.horas_por_periodo(h_ini, h_fim, agrup_h)
+            with perf.etapa("graficos"):
+                fig_periodo = grafico_temporal(df_periodo, 'Data', 'Horas_Dec',
+                                               f"Horas por {analise.AGRUPAMENTOS[agrup_h].capitalize()}", agrup_h,
+                                               rotulo="{:.0f}h", cor_marcador='#000000')
+            st.plotly_chart(fig_periodo, use_container_width=True)
+    
         st.markdown("---")
         st.markdown("### 🔍 Detalhamento Interativo")
-        
-        dados_func = db.get_funcionarios()
-        dict_abrev = {f[0]: f[3].upper() if f[3] else f[2].upper() for f in dados_func}
-        df_filtrado['Abrev'] = df_filtrado['Matrícula'].map(dict_abrev)
-        
-        df_f = df_filtrado.groupby('Abrev')['Horas_Dec'].sum().reset_index()
-        df_f.columns = ['Função', 'Horas_Dec']
-        fig_func = px.bar(df_f, x='Função', y='Horas_Dec', title="Horas por Função (Agrupado por Abreviação - Clique para filtrar)", 
-                         color_discrete_sequence=['#FFD700'], text_auto='.1f')
-        fig_func.update_layout(
-            clickmode='event+select',
-            xaxis=dict(tickangle=-45, automargin=True, tickfont=dict(size=12)),
-            margin=dict(l=50, r=50, b=120, t=50)
-        )
-        
+    
+        with perf.etapa("dados"):
+            df_f = analise.horas_por_abreviacao(mes_sel)
+        with perf.etapa("graficos"):
+            fig_func = px.bar(df_f, x='Função', y='Horas_Dec', title="Horas por Função (Agrupado por Abreviação - Clique para filtrar)", 
+                             color_discrete_sequence=['#FFD700'], text_auto='.1f')
+            fig_func.update_layout(
+                clickmode='event+select',
+                xaxis=dict(tickangle=-45, automargin=True, tickfont=dict(size=12)),
+                margin=dict(l=50, r=50, b=120, t=50)
+            )
+    
         selected_points = st.plotly_chart(fig_func, use_container_width=True, on_select="rerun")
-        
+    
         filtro_func = None
         if selected_points and "selection" in selected_points and "points" in selected_points["selection"] and selected_points["selection"]["points"]:
             filtro_func = selected_points["selection"]["points"][0]["x"]
             st.info(f"Filtrando por Função: **{filtro_func}**")
-        
+    
         if filtro_func:
-            df_e_data = df_filtrado[df_filtrado['Abrev'] == filtro_func]
             titulo_e = f"Horas por Equipamento - Função: {filtro_func}"
         else:
-            df_e_data = df_filtrado
             titulo_e = "Horas por Equipamento (Geral)"
-            
-        df_e = df_e_data.groupby('Equipamento')['Horas_Dec'].sum().reset_index()
-        fig_equip = px.bar(df_e, x='Equipamento', y='Horas_Dec', title=titulo_e, 
-                          color_discrete_sequence=['#000000'], text_auto='.1f')
-        fig_equip.update_layout(
-            xaxis=dict(tickangle=-45, automargin=True, tickfont=dict(size=12)),
-            margin=dict(l=50, r=50, b=120, t=50)
-        )
+    
+        with perf.etapa("dados"):
+            df_e = analise.horas_por_equipamento(mes_sel, filtro_func)
+        with perf.etapa("graficos"):
+            fig_equip = px.bar(df_e, x='Equipamento', y='Horas_Dec', title=titulo_e, 
+                              color_discrete_sequence=['#000000'], text_auto='.1f')
+            fig_equip.update_layout(
+                xaxis=dict(tickangle=-45, automargin=True, tickfont=dict(size=12)),
+                margin=dict(l=50, r=50, b=120, t=50)
+            )
         st.plotly_chart(fig_equip, use_container_width=True)
-        
+    
         if filtro_func:
             if st.button("Limpar Filtro"): st.rerun()
     else:
         st.info("Sem dados de produtividade registrados.")
 
 # CONSULTA GERAL
-with aba_view[2 + idx_offset]:
+def secao_consulta_geral():
+    pd = perfil.importar("pandas")
     st.subheader("📖 Consulta de Efetivo")
-    dados = db.get_funcionarios()
-    if dados:
-        df = pd.DataFrame(dados, columns=["Matrícula", "Nome", "Função", "Abrev.", "Admissão", "MO", "Status"])
-        df_up = df.applymap(lambda x: str(x).upper() if pd.notnull(x) else x)
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df_up.to_excel(writer, index=False)
-        st.download_button("⬇️ Exportar Excel", data=buffer.getvalue(), file_name="Efetivo_Santin.xlsx")
-        st.dataframe(df_up, use_container_width=True)
+    dados_up = db.get_funcionarios_maiusculas()
+    if dados_up:
+        # O arquivo só é gerado quando pedido; depois fica em cache até o cadastro mudar
+        c1, c2, c3 = st.columns([1, 1, 2])
+        with c1: formato = st.selectbox("Formato", db.FORMATOS_EXPORTACAO, format_func=str.upper, label_visibility="collapsed")
+        with c2:
+            if st.button("Gerar Exportação"):
+                st.session_state.exportacao = formato
+        if st.session_state.get('exportacao') == formato:
+            try:
+                with perf.etapa("dados"):
+                    arquivo = db.exportar_funcionarios(formato)
+                with c3: st.download_button(f"⬇️ Exportar {formato.upper()}", data=arquivo, file_name=f"Efetivo_Santin.{formato}")
+            except ImportError:
+                st.error("Exportação em Parquet requer o pacote 'pyarrow' instalado no servidor.")
+        with perf.etapa("dados"):
+            df_consulta = pd.DataFrame(dados_up, columns=db.COLUNAS_FUNCIONARIOS)
+        st.dataframe(df_consulta, use_container_width=True)
 
 # REGISTROS DE HORAS
-with aba_view[3 + idx_offset]:
+def secao_registros_horas():
+    pd = perfil.importar("pandas")
     st.subheader("⏱️ Histórico de Apontamentos")
-    aponts_raw = db.get_apontamentos_com_id()
-    if aponts_raw:
-        df_ap_full = pd.DataFrame(aponts_raw, columns=["ID", "Matrícula", "Nome", "Função", "Equipamento", "Atividade", "Entrada", "S. Almoço", "R. Almoço", "Saída", "Total", "Data"])
-        d_f = st.date_input("Filtrar Data", value=None, key="filtro_data_hist")
-        df_display = df_ap_full.copy()
-        if d_f: df_display = df_display[df_display['Data'] == str(d_f)]
-        st.dataframe(df_display.tail(20).applymap(lambda x: str(x).upper() if pd.notnull(x) else x), use_container_width=True)
-        
+    c1, c2 = st.columns(2)
+    with c1: d_f = st.date_input("Filtrar Data", value=None, key="filtro_data_hist")
+    with c2: m_f = st.text_input("Filtrar Matrícula", key="filtro_mat_hist").strip()
+    
+    # Pilha de cursores (id) das páginas visitadas; recomeça quando o filtro muda
+    filtro_atual = (str(d_f) if d_f else None, m_f)
+    if st.session_state.get('hist_filtro') != filtro_atual:
+        st.session_state.hist_filtro = filtro_atual
+        st.session_state.hist_cursores = [None]
+    cursores = st.session_state.hist_cursores
+    
+    linhas, proximo = db.get_apontamentos_pagina(data=d_f, matricula=m_f, antes_de_id=cursores[-1])
+    # Sem data, a lista percorre só os meses do banco vivo; os arquivados são lidos pelo filtro de data
+    arquivados = [] if d_f else [m[0] for m in db.get_meses_arquivados() if m[2]]
+    aviso_arquivo = None
+    if arquivados:
+        periodo = arquivados[0] if len(arquivados) == 1 else f"entre {arquivados[0]} e {arquivados[-1]}"
+        aviso_arquivo = (f"Os apontamentos de {len(arquivados)} mês(es) arquivado(s) ({periodo}) não aparecem "
+                         "nesta lista. Escolha um dia em 'Filtrar Data' para consultá-los.")
+    if linhas:
+        with perf.etapa("dados"):
+            df_display = pd.DataFrame(linhas, columns=["ID", "Matrícula", "Nome", "Função", "Equipamento", "Atividade", "Entrada", "S. Almoço", "R. Almoço", "Saída", "Total", "Data"])
+        st.dataframe(df_display, use_container_width=True, hide_index=True)
+    
+        p1, p2, p3 = st.columns([1, 2, 1])
+        with p1:
+            if st.button("⬅️ Mais recentes", disabled=len(cursores) == 1):
+                cursores.pop(); st.rerun()
+        with p2: st.caption(f"Página {len(cursores)}")
+        with p3:
+            if st.button("Mais antigos ➡️", disabled=proximo is None):
+                cursores.append(proximo); st.rerun()
+        if proximo is None and aviso_arquivo:
+            st.caption(aviso_arquivo)
+    
         if st.session_state.logged_in:
             with st.expander("🗑️ Excluir Apontamentos"):
-                opcoes_excluir = [f"ID: {row['ID']} | {row['Data']} | {row['Nome']} | {row['Total']}h" for _, row in df_display.iterrows()]
-                sel_excluir = st.multiselect("Selecione os registros", opcoes_excluir)
+                opcoes_excluir = {f"ID: {l[0]} | {l[11]} | {l[2]} | {l[10]}h": l[0] for l in linhas}
+                sel_excluir = st.multiselect("Selecione os registros", list(opcoes_excluir))
                 if st.button("Excluir Selecionados"):
                     if sel_excluir:
-                        for s in sel_excluir:
-                            db.delete_apontamento_por_id(int(s.split('|')[0].replace('ID: ', '').strip()))
+                        db.delete_apontamentos_por_ids([opcoes_excluir[s] for s in sel_excluir])
                         st.success("Excluído!"); time.sleep(1); st.rerun()
+    elif aviso_arquivo:
+        st.info(aviso_arquivo)
+    elif d_f or m_f:
+        st.info("Nenhum apontamento encontrado para o filtro.")
     else:
         st.info("Nenhum apontamento registrado.")
 
-# ABAS EXCLUSIVAS ADMIN
-if st.session_state.logged_in:
-    with aba_view[7]: # GESTÃO FUNÇÕES
-        st.subheader("⚙️ Gestão de Funções")
-        c1, c2 = st.columns([2, 1])
-        funcoes = db.get_funcoes()
-        with c1: st.table(pd.DataFrame([f.upper() for f in funcoes], columns=["Função"]))
-        with c2:
-            n_f = st.text_input("Nova Função")
-            if st.button("Salvar Função"):
-                if db.add_funcao(n_f): st.success("Salvo!"); st.rerun()
-            f_del = st.selectbox("Remover", [""] + funcoes)
-            if st.button("Excluir Função"):
-                if f_del: db.delete_funcao(f_del); st.success("Removido!"); time.sleep(1); st.rerun()
-
-    with aba_view[8]: # GESTÃO EQUIPAMENTOS
-        st.subheader("🚜 Gestão de Equipamentos")
-        c1, c2 = st.columns([2, 1])
-        equips = db.get_equipamentos()
-        with c1: st.table(pd.DataFrame([e.upper() for e in equips], columns=["Equipamento"]))
-        with c2:
-            n_e = st.text_input("Novo Equipamento")
-            if st.button("Salvar Equipamento"):
-                if db.add_equipamento(n_e): st.success("Salvo!"); st.rerun()
-            e_del = st.selectbox("Remover", [""] + equips)
-            if st.button("Excluir Equipamento"):
-                if e_del: db.delete_equipamento(e_del); st.success("Removido!"); time.sleep(1); st.rerun()
-
-    with aba_view[9]: # ATUALIZAR
-        st.subheader("✏️ Atualizar Cadastro")
-        dados = db.get_funcionarios()
-        mats = [d[0] for d in dados]
-        if mats:
-            s_m = st.selectbox("Matrícula", mats)
-            f_d = next((f for f in dados if f[0] == s_m), None)
-            if f_d:
-                with st.form(key=f"form_upd_{st.session_state.form_key}"):
-                    u_n = st.text_input("Nome", value=f_d[1])
-                    u_f = st.selectbox("Função", db.get_funcoes(), index=db.get_funcoes().index(f_d[2]) if f_d[2] in db.get_funcoes() else 0)
-                    u_a = st.text_input("Abreviação", value=f_d[3])
-                    u_d = st.date_input("Admissão", value=datetime.strptime(f_d[4], '%Y-%m-%d').date() if f_d[4] else datetime.now().date())
-                    u_mo = st.selectbox("MO", ["MOD", "MOI"], index=0 if f_d[5] == "MOD" else 1)
-                    u_st = st.selectbox("Status", ["Ativo", "Inativo"], index=0 if f_d[6] == "Ativo" else 1)
-                    if st.form_submit_button("Salvar"):
-                        if db.update_funcionario(s_m, u_n, u_f, u_a, u_d, u_mo, u_st):
-                            st.success("Atualizado!"); time.sleep(1); st.rerun()
-
-    with aba_view[10]: # REMOVER
-        st.subheader("🗑️ Remover Colaborador")
-        mats = [d[0] for d in db.get_funcionarios()]
-        if mats:
-            d_m = st.selectbox("Excluir Matrícula", mats)
-            if st.button("Confirmar Exclusão"):
-                if db.delete_funcionario(d_m): st.success("Removido!"); time.sleep(1); st.rerun()
+# GESTÃO FUNÇÕES (gestor)
+def secao_gestao_funcoes():
+    pd = perfil.importar("pandas")
+    st.subheader("⚙️ Gestão de Funções")
+    c1, c2 = st.columns([2, 1])
+    funcoes = db.get_funcoes()
+    with c1: st.table(pd.DataFrame([f.upper() for f in funcoes], columns=["Função"]))
+    with c2:
+        n_f = st.text_input("Nova Função")
+        if st.button("Salvar Função"):
+            if db.add_funcao(n_f): st.success("Salvo!"); st.rerun()
+        f_del = st.selectbox("Remover", [""] + funcoes)
+        if st.button("Excluir Função"):
+            if f_del: db.delete_funcao(f_del); st.success("Removido!"); time.sleep(1); st.rerun()
+
+# GESTÃO EQUIPAMENTOS (gestor)
+def secao_gestao_equipamentos():
+    pd = perfil.importar("pandas")
+    st.subheader("🚜 Gestão de Equipamentos")
+    c1, c2 = st.columns([2, 1])
+    equips = db.get_equipamentos()
+    with c1: st.table(pd.DataFrame([e.upper() for e in equips], columns=["Equipamento"]))
+    with c2:
+        n_e = st.text_input("Novo Equipamento")
+        if st.button("Salvar Equipamento"):
+            if db.add_equipamento(n_e): st.success("Salvo!"); st.rerun()
+        e_del = st.selectbox("Remover", [""] + equips)
+        if st.button("Excluir Equipamento"):
+            if e_del: db.delete_equipamento(e_del); st.success("Removido!"); time.sleep(1); st.rerun()
+
+# ATUALIZAR (gestor)
+def secao_atualizar_dados():
+    st.subheader("✏️ Atualizar Cadastro")
+    diretorio = db.get_diretorio()
+    mats = diretorio.matriculas
+    if mats:
+        s_m = st.selectbox("Matrícula", mats)
+        f_d = diretorio.get(s_m)
+        if f_d:
+            with st.form(key=f"form_upd_{st.session_state.form_key}"):
+                u_n = st.text_input("Nome", value=f_d.nome)
+                funcoes_upd = db.get_funcoes()
+                u_f = st.selectbox("Função", funcoes_upd, index=funcoes_upd.index(f_d.funcao) if f_d.funcao in funcoes_upd else 0)
+                u_a = st.text_input("Abreviação", value=f_d.abreviacao)
+                u_d = st.date_input("Admissão", value=datetime.strptime(f_d.admissao, '%Y-%m-%d').date() if f_d.admissao else datetime.now().date())
+                u_mo = st.selectbox("MO", ["MOD", "MOI"], index=0 if f_d.mo == "MOD" else 1)
+                u_st = st.selectbox("Status", ["Ativo", "Inativo"], index=0 if f_d.status == "Ativo" else 1)
+                if st.form_submit_button("Salvar"):
+                    if db.update_funcionario(s_m, u_n, u_f, u_a, u_d, u_mo, u_st):
+                        st.success("Atualizado!"); time.sleep(1); st.rerun()
+
+# REMOVER (gestor)
+def secao_remover_registro():
+    st.subheader("🗑️ Remover Colaborador")
+    mats = db.get_diretorio().matriculas
+    if mats:
+        d_m = st.selectbox("Excluir Matrícula", mats)
+        if st.button("Confirmar Exclusão"):
+            if db.delete_funcionario(d_m): st.success("Removido!"); time.sleep(1); st.rerun()
+
+# CONSOLIDADO: todas as obras, consultadas em paralelo
+def secao_consolidado():
+    px = perfil.importar("plotly.express")
+    analise = perfil.importar("analise")
+    st.subheader("🌐 Consolidado das Obras")
+    meses = analise.meses_todas_as_obras() or [datetime.now().strftime("%Y-%m")]
+    mes = st.selectbox("Mês de Referência (horas)", meses, format_func=lambda m: f"{m[5:7]}/{m[:4]}", key="mes_consolidado")
+    with perf.etapa("dados"):
+        df_obras = analise.consolidado_obras(mes)
+    
+    m1, m2, m3 = st.columns(3)
+    with m1: st.markdown(f"<div class='metric-card'><h3>Ativos</h3><h2>{df_obras['Ativos'].sum()}</h2></div>", unsafe_allow_html=True)
+    with m2: st.markdown(f"<div class='metric-card'><h3>Presentes (último efetivo)</h3><h2 style='color: green;'>{df_obras['Presentes'].sum()}</h2></div>", unsafe_allow_html=True)
+    with m3: st.markdown(f"<div class='metric-card'><h3>Horas no Mês</h3><h2>{df_obras['Horas no Mês'].sum():.1f}</h2></div>", unsafe_allow_html=True)
+    
+    st.dataframe(df_obras, use_container_width=True, hide_index=True)
+    if len(df_obras) > 1:
+        c1, c2 = st.columns(2)
+        with perf.etapa("graficos"):
+            fig_pres = px.bar(df_obras, x='Obra', y='Presentes', title="Presentes por Obra (último efetivo)",
+                              color_discrete_sequence=['#FFD700'], text_auto=True)
+            fig_horas = px.bar(df_obras, x='Obra', y='Horas no Mês', title=f"Horas por Obra - {mes[5:7]}/{mes[:4]}",
+                               color_discrete_sequence=['#000000'], text_auto='.1f')
+        with c1: st.plotly_chart(fig_pres, use_container_width=True)
+        with c2: st.plotly_chart(fig_horas, use_container_width=True)
+
+# OBRAS (gestor): cadastro de obras, cada uma com seu arquivo de banco
+def secao_obras():
+    pd = perfil.importar("pandas")
+    st.subheader("🏢 Cadastro de Obras")
+    c1, c2 = st.columns([2, 1])
+    with c1:
+        obras_cad = db.listar_obras()
+        st.table(pd.DataFrame([[c, n, db.caminho_obra(c)] for c, n in obras_cad], columns=["Código", "Obra", "Arquivo"]))
+    with c2:
+        with st.form(key=f"form_obra_{st.session_state.form_key}"):
+            cod_o = st.text_input("Código *")
+            nome_o = st.text_input("Nome da Obra *")
+            if st.form_submit_button("Cadastrar Obra"):
+                ok, msg = db.add_obra(cod_o, nome_o)
+                if ok:
+                    st.success("Obra cadastrada!"); reset_form(); time.sleep(1); st.rerun()
+                else: st.error(msg)
+
+# DESEMPENHO (gestor): tempos das consultas do db_rh neste processo
+def secao_desempenho():
+    pd = perfil.importar("pandas")
+    st.subheader("🩺 Desempenho do Banco de Dados")
+    st.caption(f"Consultas acima de {db.LIMITE_CONSULTA_LENTA_MS:.0f} ms são gravadas em '{db.LOG_CONSULTAS_LENTAS}'.")
+    estat = db.estatisticas_consultas()
+    if estat:
+        st.markdown("#### Tempo por função")
+        st.dataframe(pd.DataFrame(estat).rename(columns={
+            "funcao": "Função", "chamadas": "Chamadas", "p50_ms": "p50 (ms)", "p95_ms": "p95 (ms)",
+            "max_ms": "Máx. (ms)", "total_ms": "Total (ms)", "linhas": "Linhas"}), use_container_width=True, hide_index=True)
+    else:
+        st.info("Nenhuma consulta registrada ainda.")
+    
+    lentas = db.consultas_lentas_recentes()
+    if lentas:
+        st.markdown("#### Consultas lentas recentes")
+        st.dataframe(pd.DataFrame(lentas), use_container_width=True, hide_index=True)
+    
+    cache = db.estatisticas_cache()
+    if cache:
+        st.markdown("#### Cache de leituras")
+        st.dataframe(pd.DataFrame.from_dict(cache, orient="index"), use_container_width=True)
+    
+    partida = perfil.relatorio_partida()
+    if partida:
+        st.markdown("#### Partida do processo")
+        st.caption("Primeira carga de cada etapa neste processo (imports e inicialização do banco).")
+        st.dataframe(pd.DataFrame(partida), use_container_width=True, hide_index=True)
+    
+    if st.button("Zerar Estatísticas"):
+        db.limpar_estatisticas_consultas(); st.rerun()
+
+# --- RELÓGIO DISCRETO ---
+now = datetime.now()
+st.markdown(f"<div class='clock-style'>{now.strftime('%d/%m/%Y - %H:%M')}</div>", unsafe_allow_html=True)
+
+# --- BARRA LATERAL (LOGIN COM SECRETS) ---
+with st.sidebar, perf.secao("Barra lateral (login)"):
+    st.markdown("<h2 class='header-style'>🔐 Acesso Restrito</h2>", unsafe_allow_html=True)
+    
+    if not st.session_state.logged_in:
+        with st.container():
+            user = st.text_input("Usuário")
+            password = st.text_input("Senha", type="password")
+            if st.button("Entrar"):
+                try:
+                    admin_user = st.secrets["credentials"]["admin_user"]
+                    admin_password = st.secrets["credentials"]["admin_password"]
+                    if user == admin_user and password == admin_password:
+                        st.session_state.logged_in = True
+                        st.success("Acesso Autorizado!")
+                        time.sleep(1); st.rerun()
+                    else:
+                        st.error("Credenciais inválidas")
+                except:
+                    if hasattr(db, 'check_login'):
+                        if db.check_login(user, password):
+                            st.session_state.logged_in = True
+                            st.success("Acesso Autorizado!")
+                            time.sleep(1); st.rerun()
+                        else:
+                            st.error("Credenciais inválidas")
+    else:
+        st.write(f"Conectado como: **Gestor de Projeto**")
+        if st.button("Sair"):
+            st.session_state.logged_in = False
+            st.rerun()
+
+    # Obra de trabalho: todas as seções leem e gravam no banco da obra escolhida
+    obras = {codigo: nome for codigo, nome in db.listar_obras()}
+    if st.session_state.get('obra_ativa') not in obras:
+        st.session_state.obra_ativa = db.OBRA_PADRAO
+    if len(obras) > 1:
+        st.markdown("---")
+        st.selectbox("🏗️ Obra", list(obras), format_func=obras.get, key="obra_ativa")
+
+    st.markdown("---")
+    st.info("Apenas gestores podem registrar apontamentos e gerenciar o efetivo.")
+
+# --- CORPO PRINCIPAL ---
+st.markdown("<h1 class='header-style'>🏗️ GRUPO SANTIN - Controle de Obras</h1>", unsafe_allow_html=True)
+if len(obras) > 1:
+    st.caption(f"Obra: **{obras[st.session_state.obra_ativa]}**")
+
+# Navegação entre seções (substitui st.tabs, que executava todas as abas a cada rerun)
+SECOES_PUBLICAS = {
+    "📅 Efetivo Diário": secao_efetivo_diario,
+    "📊 Dash Efetivo": secao_dash_efetivo,
+    "📈 Dash Produtividade": secao_dash_produtividade,
+    "📖 Consulta Geral": secao_consulta_geral,
+    "⏱️ Registros de Horas": secao_registros_horas,
+    "🌐 Consolidado": secao_consolidado,
+}
+SECOES_GESTOR = {
+    "📅 Efetivo Diário": secao_efetivo_diario,
+    "➕ Novo Colaborador": secao_novo_colaborador,
+    "✍️ Apontar Horas": secao_apontar_horas,
+    "📊 Dash Efetivo": secao_dash_efetivo,
+    "📈 Dash Produtividade": secao_dash_produtividade,
+    "📖 Consulta Geral": secao_consulta_geral,
+    "⏱️ Registros de Horas": secao_registros_horas,
+    "⚙️ Gestão de Funções": secao_gestao_funcoes,
+    "🚜 Gestão de Equipamentos": secao_gestao_equipamentos,
+    "✏️ Atualizar Dados": secao_atualizar_dados,
+    "🗑️ Remover Registro": secao_remover_registro,
+    "🌐 Consolidado": secao_consolidado,
+    "🏢 Obras": secao_obras,
+    "🩺 Desempenho": secao_desempenho,
+}
+secoes = SECOES_GESTOR if st.session_state.logged_in else SECOES_PUBLICAS
+
+# Ao sair, uma seção exclusiva do gestor volta para a primeira seção pública
+if st.session_state.get('secao_ativa') not in secoes:
+    st.session_state.secao_ativa = next(iter(secoes))
+secao_ativa = st.radio("Seção", list(secoes), horizontal=True, key="secao_ativa", label_visibility="collapsed")
+st.markdown("---")
+
+with perf.secao(secao_ativa), db.usar_obra(st.session_state.obra_ativa):
+    secoes[secao_ativa]()
+
+# --- PERFIL DO RERUN ---
+df_perfil = perf.finalizar()
+if df_perfil is not None:
+    with st.expander("⏱️ Perfil deste rerun", expanded=True):
+        st.dataframe(df_perfil, use_container_width=True, hide_index=True)
+        if perf.arquivo:
+            st.caption(f"cProfile gravado em '{perf.arquivo}'.")
@@ -0,0 +1,8 @@
+"""Benchmarks reproduzíveis do db_rh e das agregações dos dashboards.
+
+Gera uma obra sintética num banco SQLite temporário (somente pelas funções
+públicas do db_rh), mede leituras, escritas, o upload da planilha de efetivo
+e as agregações em pandas, e grava o resultado em JSON.
+
+    python -m benchmarks --funcionarios 500 --equipamentos 40 --anos 2 --saida bench.json
+"""
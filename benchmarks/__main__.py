@@ -0,0 +1,100 @@
+"""python -m benchmarks: gera a obra sintética, mede e grava o JSON de resultados."""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--funcionarios", type=int, default=200, help="colaboradores cadastrados (N)")
+    parser.add_argument("--equipamentos", type=int, default=30, help="tags de equipamento (M)")
+    parser.add_argument("--anos", type=float, default=1.0, help="anos de histórico diário (Y)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--pasta", help="pasta de trabalho (padrão: temporária)")
+    parser.add_argument("--reusar", action="store_true", help="reaproveita o banco já gerado na --pasta")
+    parser.add_argument("--dias-planilha", type=int, default=30, help="dias da planilha usada no teste de upload")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="bench_obras_")
+    os.makedirs(pasta, exist_ok=True)
+    banco = os.path.join(pasta, "bench.db")
+    if not args.reusar:
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(banco + sufixo):
+                os.remove(banco + sufixo)
+
+    # O db_rh só é importado depois de apontar para o banco de trabalho
+    os.environ["SANTIN_DB_PATH"] = banco
+    import db_rh as db
+    from benchmarks import executar, gerador
+    db.init_db()
+
+    fim = date(2025, 12, 31)
+    if args.reusar and db.get_funcionarios():
+        inicio, fim_txt = db.get_efetivo_periodo()
+        dados = {"inicio": inicio, "fim": fim_txt, "reaproveitado": True}
+    else:
+        print(f"Gerando obra sintética em {banco}...", file=sys.stderr)
+        dados = gerador.gerar_obra(args.funcionarios, args.equipamentos, args.anos, args.semente, fim)
+
+    planilha = os.path.join(pasta, "efetivo.xlsx")
+    funcionarios = [(f[0], f[1], f[2], f[5]) for f in db.get_funcionarios()]
+    inicio_planilha = date.fromisoformat(dados["fim"]) - timedelta(days=args.dias_planilha - 1)
+    linhas_planilha = gerador.gerar_planilha_efetivo(planilha, funcionarios, inicio_planilha, args.dias_planilha)
+
+    print("Medindo...", file=sys.stderr)
+    resultados = executar.executar(dados, args.repeticoes, (planilha, linhas_planilha))
+    if resultados["consistencia"]["divergencias_resumo"]:
+        print("ATENÇÃO: efetivo_resumo ou a função por dia divergem do efetivo gravado", file=sys.stderr)
+    if resultados["consistencia"]["grafias_duplicadas"]:
+        print("ATENÇÃO: situações gravadas com mais de uma grafia na importação em lotes:",
+              ", ".join(resultados["consistencia"]["grafias_duplicadas"]), file=sys.stderr)
+
+    with db.get_connection() as conn:
+        contagens = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                     for t in ("funcionarios", "equipamentos", "efetivo_diario", "efetivo_resumo", "apontamentos")}
+
+    relatorio = {
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "ambiente": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "motor_analise": "duckdb" if executar.analise._modulo_duckdb() else "sql",
+        },
+        "parametros": vars(args),
+        "dados": dados,
+        "contagens": contagens,
+        "versao_esquema": db.versao_esquema(),
+        "tamanho_banco_mb": round(os.path.getsize(banco) / 2**20, 2),
+        "resultados": resultados,
+    }
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+        print(f"Resultados gravados em {args.saida}", file=sys.stderr)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
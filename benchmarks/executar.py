@@ -0,0 +1,255 @@
+"""Medições de tempo das funções do db_rh, do upload e das agregações dos dashboards."""
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta, time as hora
+
+import db_rh as db
+import analise
+from benchmarks import gerador
+
+
+def medir(func, repeticoes=5, antes=None):
+    """Executa func `repeticoes` vezes (chamando `antes` fora da medição) e resume os tempos em ms."""
+    tempos = []
+    for _ in range(repeticoes):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        func()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "repeticoes": repeticoes,
+        "min_ms": round(min(tempos), 3),
+        "mediana_ms": round(statistics.median(tempos), 3),
+        "media_ms": round(statistics.fmean(tempos), 3),
+        "max_ms": round(max(tempos), 3),
+    }
+
+
+def _leituras(dados):
+    """(nome, função em cache) das leituras usadas pelo app."""
+    inicio, fim = dados["inicio"], dados["fim"]
+    mes = fim[:7]
+    ultimo_dia = db.get_efetivo_periodo()[1]
+    # Últimos ~30 dias, como a visão padrão de um gestor
+    inicio_30 = date.fromisoformat(fim).replace(day=1).isoformat()
+    return [
+        ("get_funcionarios", db.get_funcionarios, ()),
+        ("get_diretorio", db.get_diretorio, ()),
+        ("get_funcoes", db.get_funcoes, ()),
+        ("get_equipamentos", db.get_equipamentos, ()),
+        ("get_apontamentos", db.get_apontamentos, ()),
+        ("get_apontamentos_com_id", db.get_apontamentos_com_id, ()),
+        ("get_efetivo_diario", db.get_efetivo_diario, ()),
+        ("get_efetivo_periodo", db.get_efetivo_periodo, ()),
+        ("get_efetivo_por_dia[mes]", db.get_efetivo_por_dia, (inicio_30, fim)),
+        ("get_efetivo_por_dia[tudo]", db.get_efetivo_por_dia, (inicio, fim)),
+        ("get_efetivo_situacoes_dia", db.get_efetivo_situacoes_dia, ()),
+        ("get_efetivo_detalhe", db.get_efetivo_detalhe, (ultimo_dia, "FÉRIAS")),
+        ("get_meses_apontamentos", db.get_meses_apontamentos, ()),
+        ("get_horas_por_periodo[tudo]", db.get_horas_por_periodo, (inicio, fim, analise.agrupamento_para(inicio, fim))),
+        ("get_horas_por_dia", db.get_horas_por_dia, (mes,)),
+        ("get_horas_por_abreviacao", db.get_horas_por_abreviacao, (mes,)),
+        ("get_horas_por_equipamento", db.get_horas_por_equipamento, (mes,)),
+        ("get_apontamentos_pagina", db.get_apontamentos_pagina, ()),
+        ("get_funcionarios_maiusculas", db.get_funcionarios_maiusculas, ()),
+        ("exportar_funcionarios[xlsx]", db.exportar_funcionarios, ("xlsx",)),
+    ]
+
+
+def _agregacoes(dados):
+    """(nome, função) das agregações em pandas dos dois dashboards."""
+    inicio, fim = dados["inicio"], dados["fim"]
+    mes = fim[:7]
+    return [
+        ("analise.historico_presentes", lambda: analise.historico_presentes(inicio, fim)),
+        ("analise.situacoes_ultimo_dia", analise.situacoes_ultimo_dia),
+        ("analise.detalhe_situacao", lambda: analise.detalhe_situacao(db.get_efetivo_periodo()[1], "FÉRIAS")),
+        ("analise.efetivo_por_abreviacao", analise.efetivo_por_abreviacao),
+        ("analise.horas_por_dia", lambda: analise.horas_por_dia(mes)),
+        ("analise.horas_por_abreviacao", lambda: analise.horas_por_abreviacao(mes)),
+        ("analise.horas_por_equipamento", lambda: analise.horas_por_equipamento(mes)),
+        # Como no gráfico de horas: o agrupamento sai do tamanho do intervalo
+        ("analise.horas_por_periodo[tudo]", lambda: analise.horas_por_periodo(inicio, fim)),
+        ("analise.horas_por_periodo[mes]", lambda: analise.horas_por_periodo(f"{mes}-01", fim)),
+    ]
+
+
+def _escritas(dados):
+    """(nome, função) das escritas; todas deixam o banco num estado equivalente."""
+    fim = date.fromisoformat(dados["fim"])
+    funcionarios = db.get_funcionarios()
+    equipe = funcionarios[:60]
+    f0 = funcionarios[0]
+    ultimo = date.fromisoformat(db.get_efetivo_periodo()[1])
+    efetivo_dia = list(gerador.linhas_efetivo(random.Random(1), [(f[0], f[1], f[2], f[5]) for f in funcionarios], ultimo))
+
+    def apontamento(f):
+        return (f[0], f[1], f[2], "TAG-0001", "BENCHMARK", hora(7), hora(12), hora(13), hora(17), None, fim)
+
+    def apontar_e_remover(registros):
+        db.add_apontamentos_batch(registros)
+        linhas, _ = db.get_apontamentos_pagina.sem_cache(tamanho=len(registros))
+        db.delete_apontamentos_por_ids([l[0] for l in linhas])
+
+    def cadastrar_e_remover():
+        db.add_funcionario("BENCH", "BENCH", "AJUDANTE", "", fim, "MOD", "Ativo")
+        db.delete_funcionario("BENCH")
+
+    return [
+        ("add_apontamento+delete", lambda: apontar_e_remover([apontamento(f0)])),
+        ("add_apontamentos_batch[60]+delete", lambda: apontar_e_remover([apontamento(f) for f in equipe])),
+        ("update_funcionario", lambda: db.update_funcionario(*f0)),
+        ("add_funcionario+delete", cadastrar_e_remover),
+        ("replace_efetivo_for_dates[1 dia]", lambda: db.replace_efetivo_for_dates([efetivo_dia])),
+    ]
+
+
+def medir_concorrencia(dados, threads=8, por_thread=25):
+    """Vários gestores apontando ao mesmo tempo: cada thread grava `por_thread`
+    apontamentos avulsos. Retorna o tempo total e as escritas por segundo."""
+    fim = date.fromisoformat(dados["fim"])
+    funcionarios = db.get_funcionarios()[:threads]
+    commits_antes = db.estatisticas_escrita()["commits"]
+
+    def apontar(f):
+        for _ in range(por_thread):
+            db.add_apontamento(f[0], f[1], f[2], "TAG-0001", "CONCORRENCIA", hora(7), hora(12), hora(13), hora(17), None, fim)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(apontar, funcionarios))
+    decorrido = time.perf_counter() - inicio
+    total = len(funcionarios) * por_thread
+    linhas, _ = db.get_apontamentos_pagina.sem_cache(tamanho=total)
+    db.delete_apontamentos_por_ids([l[0] for l in linhas if l[5] == "CONCORRENCIA"])
+    return {"threads": len(funcionarios), "escritas": total, "total_ms": round(decorrido * 1000, 3),
+            "escritas_por_s": round(total / decorrido, 1),
+            "commits": db.estatisticas_escrita()["commits"] - commits_antes}
+
+
+def verificar_troca_de_funcao(dados):
+    """Matrícula fora do cadastro que muda de função de um dia para o outro:
+    cada dia mantém a função enviada e o resumo confere com o efetivo. Retorna
+    as divergências de verificar_resumo_efetivo mais os dias que mostram outra
+    função (vazio quando está tudo certo)."""
+    dia = date.fromisoformat(dados["fim"]) + timedelta(days=1)
+    dias = [dia.isoformat(), (dia + timedelta(days=1)).isoformat()]
+    funcoes = ("AJUDANTE", "SOLDADOR")
+    for d, funcao in zip(dias, funcoes):
+        db.replace_efetivo_for_dates([[(d, "BENCH-FORA", "BENCH", funcao, 1, "PRESENTE")]])
+    divergencias = db.verificar_resumo_efetivo()
+    with db.get_connection() as conn:
+        for d, funcao in zip(dias, funcoes):
+            gravada = conn.execute("SELECT funcao FROM efetivo_diario WHERE data = ? AND matricula = 'BENCH-FORA'",
+                                   (d,)).fetchone()[0]
+            if gravada != funcao:
+                divergencias.append([d, "BENCH-FORA", funcao, gravada])
+    for d in dias:
+        db.delete_efetivo_por_data(d)
+    return divergencias
+
+
+def verificar_grafias_em_lotes(dados):
+    """Planilha importada em lotes de 3 linhas com a mesma situação escrita de
+    jeitos diferentes em cada lote (uma situação já gravada e uma nova): cada
+    uma precisa ficar com uma grafia só. Retorna as grafias gravadas a mais
+    (vazio quando está tudo certo)."""
+    import tempfile
+    from openpyxl import Workbook
+
+    grafias = ["Licença Médica"] * 3 + ["LICENCA MEDICA"] * 3 + ["ferias", "ferias", "licença  médica"] + \
+              ["Férias", "FERIAS", " férias "]
+    dia = date.fromisoformat(dados["fim"]) + timedelta(days=1)
+    dias = [dia, dia + timedelta(days=1)]
+    funcionarios = db.get_funcionarios()
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "grafias.xlsx")
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(db.ABA_EFETIVO)
+        ws.append(db.COLUNAS_EFETIVO)
+        for i, situacao in enumerate(grafias):
+            f = funcionarios[i % len(funcionarios)]
+            ws.append([dias[i % 2], f[0], f[1], f[2], 7, situacao])
+        wb.save(caminho)
+        db.importar_efetivo_excel(caminho, tamanho_lote=3)
+    with db.get_connection() as conn:
+        gravadas = {row[0] for row in conn.execute("SELECT DISTINCT situacao FROM efetivo_diario WHERE data IN (?, ?)",
+                                                   [d.isoformat() for d in dias])}
+    for d in dias:
+        db.delete_efetivo_por_data(d)
+    return sorted(gravadas - {"FÉRIAS", "Licença Médica"})
+
+
+# Cada etapa roda num interpretador novo, como um worker recém-criado: o
+# processo filho imprime só o tempo do trecho (sem a partida do próprio Python).
+_PARTIDA = [
+    ("import db_rh", "import db_rh"),
+    ("import db_rh + init_db", "import db_rh; db_rh.init_db()"),
+    ("import perfil", "import perfil"),
+    ("import analise (pandas)", "import analise"),
+    ("import plotly.express", "import plotly.express"),
+    ("import streamlit", "import streamlit"),
+]
+
+
+def _medir_partida(codigo):
+    script = f"import time; _t = time.perf_counter(); {codigo}; print((time.perf_counter() - _t) * 1000)"
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    saida = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                           cwd=raiz, env={**os.environ, "PYTHONPATH": raiz})
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def medir_partida(repeticoes=3):
+    """Tempo de partida a frio (ms) de cada etapa, cada repetição num processo novo."""
+    resultados = {}
+    for nome, codigo in _PARTIDA:
+        try:
+            tempos = [_medir_partida(codigo) for _ in range(repeticoes)]
+        except subprocess.CalledProcessError:
+            continue  # dependência opcional ausente (ex.: streamlit no servidor de benchmarks)
+        resultados[nome] = {"repeticoes": repeticoes, "min_ms": round(min(tempos), 3),
+                            "mediana_ms": round(statistics.median(tempos), 3), "max_ms": round(max(tempos), 3)}
+    return resultados
+
+
+def executar(dados, repeticoes=5, planilha=None):
+    """Roda todas as medições e devolve {grupo: {nome: estatísticas}}."""
+    resultados = {"leituras_frias": {}, "leituras_cache": {}, "agregacoes_frias": {},
+                  "agregacoes_cache": {}, "escritas": {}, "upload": {}}
+
+    resultados["partida"] = medir_partida(max(1, repeticoes // 2))
+
+    for nome, func, args in _leituras(dados):
+        resultados["leituras_frias"][nome] = medir(lambda: func.sem_cache(*args), repeticoes)
+        func(*args)
+        resultados["leituras_cache"][nome] = medir(lambda: func(*args), repeticoes)
+
+    for nome, func in _agregacoes(dados):
+        resultados["agregacoes_frias"][nome] = medir(func, repeticoes, antes=db.limpar_cache)
+        func()
+        resultados["agregacoes_cache"][nome] = medir(func, repeticoes)
+
+    for nome, func in _escritas(dados):
+        resultados["escritas"][nome] = medir(func, repeticoes)
+    resultados["escritas"]["concorrencia[8 threads]"] = medir_concorrencia(dados)
+    resultados["consistencia"] = {"divergencias_resumo": len(verificar_troca_de_funcao(dados)),
+                                  "grafias_duplicadas": verificar_grafias_em_lotes(dados)}
+
+    if planilha:
+        caminho, linhas = planilha
+        resultados["upload"]["ler_efetivo_excel"] = medir(
+            lambda: sum(len(l) for l in db.ler_efetivo_excel(caminho)), max(1, repeticoes // 2))
+        lidas = [linha for lote in db.ler_efetivo_excel(caminho) for linha in lote]
+        resultados["upload"]["validar_efetivo"] = medir(lambda: db.validar_efetivo(lidas), repeticoes)
+        resultados["upload"]["importar_efetivo_excel"] = medir(
+            lambda: db.importar_efetivo_excel(caminho), max(1, repeticoes // 2))
+        resultados["upload"]["linhas_planilha"] = linhas
+
+    return resultados
@@ -0,0 +1,143 @@
+"""Gerador de dados sintéticos de obra (cadastro, efetivo diário e apontamentos)."""
+import random
+from datetime import date, time, timedelta
+
+import db_rh as db
+
+# (função, abreviação, tipo de MO)
+FUNCOES = [
+    ("MONTADOR I", "MONT", "MOD"),
+    ("MONTADOR II", "MONT", "MOD"),
+    ("SOLDADOR IV", "SOLD", "MOD"),
+    ("CALDEIREIRO II", "CALDEIREIRO", "MOD"),
+    ("ENCANADOR III", "ENCANADOR", "MOD"),
+    ("ELETRICISTA DE MANUTENÇÃO I", "ELETRICISTA", "MOD"),
+    ("LIXADOR", "LIXADOR", "MOD"),
+    ("AJUDANTE", "AJUDANTE", "MOD"),
+    ("ENCARREGADO", "ENCARREGADO", "MOI"),
+    ("TECNICO DE SEGURANCA DO TRABALHO", "TST", "MOI"),
+    ("ALMOXARIFE PLENO", "ALMOXARIFE", "MOI"),
+]
+
+# (status, situação, peso) — mesmos códigos das planilhas reais
+SITUACOES = [
+    (1, "PRESENTE", 80),
+    (2, "AG. INTEGRAÇÃO", 2),
+    (3, "AG. DOC.", 1),
+    (4, "TRAB. EXTERNO", 6),
+    (5, "FOLGA CAMPO", 3),
+    (6, "AUSENTE", 2),
+    (7, "ATESTADO", 2),
+    (9, "PERIÓDICO", 1),
+    (10, "FÉRIAS", 3),
+]
+
+NOMES = ["JOSE", "JOAO", "ANTONIO", "FRANCISCO", "CARLOS", "PAULO", "PEDRO", "LUCAS", "MARCOS", "ROGÉRIO",
+         "ABIA", "MARIA", "ANA", "VAILTON", "MURILO", "ALESSANDRO", "MANOEL", "ALEXANDRE"]
+SOBRENOMES = ["SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "PEREIRA", "NASCIMENTO", "CRUZ", "CONCEICAO", "NUNES", "GUEDES"]
+
+
+def dias_uteis(inicio, fim):
+    """Dias de segunda a sábado entre inicio e fim (inclusive)."""
+    dia = inicio
+    while dia <= fim:
+        if dia.weekday() != 6:
+            yield dia
+        dia += timedelta(days=1)
+
+
+def gerar_funcionarios(rng, n):
+    """Cadastra n funcionários; retorna [(matricula, nome, funcao, mo), ...]."""
+    for funcao, _, _ in FUNCOES:
+        db.add_funcao(funcao)
+    funcionarios = []
+    for i in range(n):
+        funcao, abrev, mo = rng.choice(FUNCOES)
+        mat = str(10000 + i)
+        nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+        status = "Ativo" if rng.random() < 0.9 else "Inativo"
+        db.add_funcionario(mat, nome, funcao, abrev, date(2020, 1, 1) + timedelta(days=rng.randrange(1800)), mo, status)
+        funcionarios.append((mat, nome, funcao, mo))
+    return funcionarios
+
+
+def gerar_equipamentos(n):
+    tags = [f"TAG-{i:04d}" for i in range(1, n + 1)]
+    for tag in tags:
+        db.add_equipamento(tag)
+    return tags
+
+
+def linhas_efetivo(rng, funcionarios, dia):
+    """Linhas de efetivo de um dia para todos os funcionários."""
+    pesos = [s[2] for s in SITUACOES]
+    for (mat, nome, funcao, _), (status, situacao, _) in zip(funcionarios, rng.choices(SITUACOES, pesos, k=len(funcionarios))):
+        yield (dia.isoformat(), mat, nome, funcao, status, situacao)
+
+
+def gerar_historico(rng, funcionarios, equipamentos, inicio, fim):
+    """Efetivo diário e apontamentos (um por MOD presente) mês a mês.
+
+    Retorna (linhas de efetivo, apontamentos) gravados.
+    """
+    n_efetivo = n_apont = 0
+    mes_atual, efetivo, apontamentos = None, [], []
+    mods = {f[0] for f in funcionarios if f[3] == "MOD"}
+
+    def gravar():
+        nonlocal n_efetivo, n_apont
+        if efetivo:
+            n_efetivo += db.replace_efetivo_for_dates([efetivo])[0]
+        if apontamentos:
+            n_apont += db.add_apontamentos_batch(apontamentos)
+
+    for dia in dias_uteis(inicio, fim):
+        if (dia.year, dia.month) != mes_atual:
+            gravar()
+            mes_atual, efetivo, apontamentos = (dia.year, dia.month), [], []
+        for linha in linhas_efetivo(rng, funcionarios, dia):
+            efetivo.append(linha)
+            _, mat, nome, funcao, status, _ = linha
+            if status == 1 and mat in mods:
+                ent = time(7, rng.choice((0, 0, 15, 30)))
+                s_fin = time(rng.choice((16, 17, 17, 18)), 0)
+                apontamentos.append((mat, nome, funcao, rng.choice(equipamentos), "MONTAGEM",
+                                     ent, time(12, 0), time(13, 0), s_fin, None, dia))
+    gravar()
+    return n_efetivo, n_apont
+
+
+def gerar_obra(n_funcionarios, n_equipamentos, anos, semente=42, fim=None):
+    """Popula o banco configurado no db_rh com uma obra sintética reproduzível."""
+    rng = random.Random(semente)
+    fim = fim or date(2025, 12, 31)
+    inicio = fim - timedelta(days=int(365 * anos) - 1)
+    funcionarios = gerar_funcionarios(rng, n_funcionarios)
+    equipamentos = gerar_equipamentos(n_equipamentos)
+    n_efetivo, n_apont = gerar_historico(rng, funcionarios, equipamentos, inicio, fim)
+    return {
+        "funcionarios": len(funcionarios),
+        "equipamentos": len(equipamentos),
+        "dias": sum(1 for _ in dias_uteis(inicio, fim)),
+        "efetivo_diario": n_efetivo,
+        "apontamentos": n_apont,
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+    }
+
+
+def gerar_planilha_efetivo(caminho, funcionarios, inicio, dias, semente=7):
+    """Grava uma planilha .xlsx (aba 'Efetivo') no formato do upload do app."""
+    from openpyxl import Workbook
+
+    rng = random.Random(semente)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(db.ABA_EFETIVO)
+    ws.append(db.COLUNAS_EFETIVO)
+    linhas = 0
+    for dia in list(dias_uteis(inicio, inicio + timedelta(days=dias - 1))):
+        for _, mat, nome, funcao, status, situacao in linhas_efetivo(rng, funcionarios, dia):
+            ws.append([dia, int(mat), nome, funcao, status, situacao])
+            linhas += 1
+    wb.save(caminho)
+    return linhas
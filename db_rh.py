@@ -1,19 +1,777 @@
 import sqlite3
 import os
+import sys
+import csv
+import glob
+import json
+import io
+import time
+import atexit
+import itertools
+import queue
+import logging
+import re
+import threading
+import functools
+import multiprocessing
+from collections import Counter, OrderedDict, defaultdict, deque
+from logging.handlers import RotatingFileHandler
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from inspect import CO_GENERATOR
 from datetime import datetime
 
-# Caminho do banco de dados
-DB_PATH = "santin_obras.db"
+# Caminho do banco de dados (SANTIN_DB_PATH permite apontar para outro arquivo)
+DB_PATH = os.environ.get("SANTIN_DB_PATH", "santin_obras.db")
+
+# Cada obra adicional tem seu próprio arquivo em DIR_OBRAS; a obra principal usa DB_PATH
+DIR_OBRAS = os.environ.get("SANTIN_DIR_OBRAS", "obras")
+
+# --- CONEXÕES ---
+
+# Tamanho máximo do pool (conexões simultâneas abertas pelo processo)
+POOL_TAMANHO = int(os.environ.get("DB_POOL_TAMANHO", "4"))
+# Tempo que uma thread espera por uma conexão livre com o pool cheio
+POOL_ESPERA_S = 30
+# Tempo que uma conexão espera por um lock antes de falhar
+BUSY_TIMEOUT_MS = 5000
+
+# PRAGMAs aplicados uma vez a cada conexão nova
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",      # seguro com WAL e evita fsync por commit
+    "PRAGMA cache_size=-16000",       # ~16 MB de cache de páginas por conexão
+    "PRAGMA mmap_size=268435456",     # 256 MB mapeados em memória
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+# --- INSTRUMENTAÇÃO DAS CONSULTAS ---
+# As conexões do pool usam as classes abaixo: todo execute/executemany/fetch
+# é cronometrado e atribuído à função do db_rh que o chamou. Consultas acima de
+# LIMITE_CONSULTA_LENTA_MS vão para um log rotativo.
+
+INSTRUMENTAR_CONSULTAS = os.environ.get("SANTIN_INSTRUMENTAR", "1") != "0"
+LIMITE_CONSULTA_LENTA_MS = float(os.environ.get("SANTIN_LIMITE_LENTA_MS", "200"))
+LOG_CONSULTAS_LENTAS = os.environ.get("SANTIN_LOG_LENTAS", "consultas_lentas.log")
+AMOSTRAS_POR_FUNCAO = 1000
+
+_log_lentas = logging.getLogger("db_rh.consultas_lentas")
+_log_lentas.propagate = False
+
+
+class _Registro:
+    __slots__ = ("funcao", "sql", "duracao_ms", "linhas", "finalizado")
+
+    def __init__(self, funcao, sql, duracao_ms, linhas):
+        self.funcao = funcao
+        self.sql = sql
+        self.duracao_ms = duracao_ms
+        self.linhas = linhas
+        self.finalizado = False
+
+
+class EstatisticasConsultas:
+    """Duração e linhas das consultas agrupadas pela função que as chamou."""
+
+    def __init__(self, amostras=AMOSTRAS_POR_FUNCAO):
+        self._lock = threading.Lock()
+        self._amostras = defaultdict(lambda: deque(maxlen=amostras))
+        self._chamadas = Counter()
+        self.lentas = deque(maxlen=200)
+
+    def adicionar(self, registro):
+        with self._lock:
+            self._amostras[registro.funcao].append(registro)
+            self._chamadas[registro.funcao] += 1
+
+    def resumo(self):
+        """[{funcao, chamadas, p50_ms, p95_ms, max_ms, total_ms, linhas}, ...] pelo maior tempo total."""
+        with self._lock:
+            grupos = {f: list(a) for f, a in self._amostras.items()}
+            chamadas = dict(self._chamadas)
+        linhas = []
+        for funcao, registros in grupos.items():
+            duracoes = sorted(r.duracao_ms for r in registros)
+            n = len(duracoes)
+            linhas.append({
+                "funcao": funcao,
+                "chamadas": chamadas[funcao],
+                "p50_ms": round(duracoes[(n - 1) // 2], 3),
+                "p95_ms": round(duracoes[min(n - 1, int(n * 0.95))], 3),
+                "max_ms": round(duracoes[-1], 3),
+                "total_ms": round(sum(duracoes), 3),
+                "linhas": sum(r.linhas for r in registros),
+            })
+        return sorted(linhas, key=lambda l: l["total_ms"], reverse=True)
+
+    def limpar(self):
+        with self._lock:
+            self._amostras.clear()
+            self._chamadas.clear()
+            self.lentas.clear()
+
+
+_estatisticas = EstatisticasConsultas()
+
+# Tempo acumulado por thread: cada sessão do Streamlit roda o script na sua
+# própria thread, então a diferença entre duas leituras mede só aquele rerun.
+_tempo_thread = threading.local()
+
+
+def _acumular_tempo(ms):
+    _tempo_thread.ms = getattr(_tempo_thread, "ms", 0.0) + ms
+
+
+def _funcao_do_modulo(frame):
+    # Função definida no nível do módulo (as decoradas são achadas pelo __wrapped__)
+    funcao = frame.f_globals.get(frame.f_code.co_name)
+    while funcao is not None:
+        if getattr(funcao, "__code__", None) is frame.f_code:
+            return True
+        funcao = getattr(funcao, "__wrapped__", None)
+    return False
+
+
+def _chamador():
+    # Função pública (sem "_") do db_rh mais interna na pilha; senão a primeira
+    # função privada ou método do módulo; senão a primeira função de fora.
+    # Ficam de fora os context managers (transacao, conexão do pool), os
+    # métodos da conexão e do cursor instrumentados e as funções internas,
+    # como o wrapper de em_cache.
+    frame = sys._getframe(2)
+    privada = None
+    while frame is not None:
+        codigo = frame.f_code
+        modulo = frame.f_globals.get("__name__")
+        if modulo == __name__:
+            if codigo.co_flags & CO_GENERATOR:
+                pass
+            elif _funcao_do_modulo(frame):
+                if not codigo.co_name.startswith("_"):
+                    return codigo.co_name
+                privada = privada or codigo.co_name
+            elif codigo.co_varnames[:1] == ("self",) and not isinstance(frame.f_locals["self"],
+                                                                         (sqlite3.Connection, sqlite3.Cursor)):
+                privada = privada or codigo.co_name
+        elif modulo != "contextlib" and privada is None:
+            return f"{modulo}.{codigo.co_name}"
+        frame = frame.f_back
+    return privada or "?"
+
+
+def _configurar_log_lentas():
+    if not _log_lentas.handlers:
+        handler = RotatingFileHandler(LOG_CONSULTAS_LENTAS, maxBytes=1_000_000, backupCount=5, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        _log_lentas.addHandler(handler)
+        _log_lentas.setLevel(logging.WARNING)
+
+
+def _finalizar(registro):
+    if registro.finalizado:
+        return
+    registro.finalizado = True
+    if registro.duracao_ms >= LIMITE_CONSULTA_LENTA_MS:
+        sql = " ".join(registro.sql.split())
+        _estatisticas.lentas.append({"funcao": registro.funcao, "duracao_ms": round(registro.duracao_ms, 3),
+                                     "linhas": registro.linhas, "sql": sql, "quando": datetime.now().isoformat(timespec="seconds")})
+        try:
+            _configurar_log_lentas()
+            _log_lentas.warning("%.1f ms | %d linhas | %s | %s", registro.duracao_ms, registro.linhas, registro.funcao, sql)
+        except OSError:
+            pass
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    _registro = None
+
+    def execute(self, sql, params=()):
+        funcao = _chamador()
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._registrar(funcao, sql, inicio)
+
+    def executemany(self, sql, params):
+        funcao = _chamador()
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, params)
+        finally:
+            self._registrar(funcao, sql, inicio)
+
+    def _registrar(self, funcao, sql, inicio):
+        registro = _Registro(funcao, sql, (time.perf_counter() - inicio) * 1000, max(self.rowcount, 0))
+        _acumular_tempo(registro.duracao_ms)
+        _estatisticas.adicionar(registro)
+        self._registro = registro
+        if self.description is None:
+            _finalizar(registro)
+
+    def _fetch(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        registro = self._registro
+        if registro is not None:
+            ms = (time.perf_counter() - inicio) * 1000
+            registro.duracao_ms += ms
+            _acumular_tempo(ms)
+            registro.linhas += len(resultado) if isinstance(resultado, list) else int(resultado is not None)
+            _finalizar(registro)
+        return resultado
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, size if size is not None else self.arraysize)
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    # Connection.execute em C não passa por cursor(): os atalhos são redefinidos aqui
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, params):
+        return self.cursor().executemany(sql, params)
+
+
+def estatisticas_consultas():
+    """Resumo por função: chamadas, p50/p95/máximo e total em ms, linhas."""
+    return _estatisticas.resumo()
+
+
+def consultas_lentas_recentes():
+    """Últimas consultas acima do limite (as mesmas gravadas no log), da mais nova para a mais antiga."""
+    return list(reversed(_estatisticas.lentas))
+
+
+def limpar_estatisticas_consultas():
+    _estatisticas.limpar()
+
+
+def tempo_consultas_thread():
+    """Total de ms gasto em consultas pela thread atual (só cresce; use a diferença entre leituras)."""
+    return getattr(_tempo_thread, "ms", 0.0)
+
+
+def _maiusculas(valor):
+    return valor.upper() if isinstance(valor, str) else valor
+
+
+class ConnectionPool:
+    """Pool pequeno de conexões SQLite compartilhado pelas threads do processo.
+
+    Cada conexão é emprestada a uma única thread por vez. Chamadas aninhadas na
+    mesma thread reutilizam a conexão já emprestada, de modo que uma função que
+    chama outra participa da mesma transação.
+    """
+
+    def __init__(self, caminho, tamanho=POOL_TAMANHO):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self._livres = queue.LifoQueue()
+        self._criadas = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _nova_conexao(self):
+        conn = sqlite3.connect(
+            self.caminho,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            isolation_level=None,  # transações explícitas via transacao()
+            factory=ConexaoInstrumentada if INSTRUMENTAR_CONSULTAS else sqlite3.Connection,
+        )
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        # O UPPER nativo do SQLite só converte ASCII ('João' -> 'JOãO')
+        conn.create_function("upper", 1, _maiusculas, deterministic=True)
+        return conn
+
+    def _obter(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._criadas < self.tamanho:
+                self._criadas += 1
+                try:
+                    return self._nova_conexao()
+                except Exception:
+                    self._criadas -= 1
+                    raise
+        # Pool cheio: espera outra thread devolver uma conexão
+        try:
+            return self._livres.get(timeout=POOL_ESPERA_S)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"pool de conexões esgotado: as {self.tamanho} conexões de {self.caminho} seguiram ocupadas "
+                f"por {POOL_ESPERA_S} s (aumente DB_POOL_TAMANHO ou procure uma conexão não devolvida)") from None
+
+    @contextmanager
+    def conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._obter()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.put(conn)
+
+    def fechar(self):
+        """Fecha as conexões livres (usado ao trocar de banco ou encerrar)."""
+        with self._lock:
+            while True:
+                try:
+                    self._livres.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._criadas = 0
+
 
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    return conn
+    """Empresta uma conexão do pool da obra atual: `with get_connection() as conn: ...`"""
+    return _banco().pool.conexao()
 
-def init_db():
-    """Inicializa as tabelas do banco de dados se não existirem."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+
+def configurar_banco(caminho):
+    """Passa a usar outro arquivo de banco para a obra principal (benchmarks, scripts) e o inicializa."""
+    global DB_PATH
+    with _bancos_lock:
+        for banco in _bancos.values():
+            banco.fechar()
+        _bancos.clear()
+        DB_PATH = caminho
+    init_db()
+
+
+@contextmanager
+def transacao():
+    """Transação de escrita (BEGIN IMMEDIATE). Se já houver uma transação
+    aberta na thread, usa um SAVEPOINT dentro dela."""
+    with get_connection() as conn:
+        if conn.in_transaction:
+            nome = f"sp_{threading.get_ident()}_{id(conn)}"
+            conn.execute(f"SAVEPOINT {nome}")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {nome}")
+                conn.execute(f"RELEASE {nome}")
+                raise
+            conn.execute(f"RELEASE {nome}")
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+# --- CACHE DE LEITURAS ---
+# Cada tabela tem um contador de versão em versoes_tabelas, incrementado na
+# mesma transação de toda escrita. Leituras ficam em memória até a versão de
+# alguma tabela de que dependem mudar. PRAGMA data_version, lido numa conexão
+# própria, avisa quando houve commit de qualquer outra conexão (inclusive de
+# outros processos); só então os contadores são relidos do banco.
+
+CACHE_MAX_ENTRADAS = 256
+
+TABELAS_VERSIONADAS = ("funcionarios", "funcoes", "equipamentos", "apontamentos",
+                       "efetivo_diario", "efetivo_resumo", "obras", "meses_arquivados")
+
+
+class CacheLeituras:
+    """Cache de resultados de leitura invalidado pela versão das tabelas."""
+
+    def __init__(self, caminho, max_entradas=CACHE_MAX_ENTRADAS):
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self.acertos = Counter()
+        self.faltas = Counter()
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self._sentinela = None
+        self._data_version = None
+        self._versoes = {}
+
+    def _versoes_atuais(self, tabelas):
+        with self._lock:
+            if self._sentinela is None:
+                self._sentinela = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None)
+            data_version = self._sentinela.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._versoes = dict(self._sentinela.execute("SELECT tabela, versao FROM versoes_tabelas"))
+                self._data_version = data_version
+            return tuple(self._versoes.get(t, 0) for t in tabelas)
+
+    def obter(self, nome, chave, tabelas, carregar):
+        # As versões são lidas ANTES da consulta: se uma escrita acontecer no
+        # meio, o valor fica guardado com a versão antiga e é recarregado depois.
+        versoes = self._versoes_atuais(tabelas)
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None and entrada[0] == versoes:
+                self._dados.move_to_end(chave)
+                self.acertos[nome] += 1
+                return entrada[1]
+            self.faltas[nome] += 1
+        valor = carregar()
+        with self._lock:
+            self._dados[chave] = (versoes, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+            self.acertos.clear()
+            self.faltas.clear()
+            if self._sentinela is not None:
+                self._sentinela.close()
+            self._sentinela = None
+            self._data_version = None
+
+
+def em_cache(*tabelas):
+    """Decorador para leituras que dependem das tabelas informadas.
+
+    O valor devolvido é compartilhado entre chamadas (e sessões): não altere
+    as listas retornadas. A função original fica em `func.sem_cache`.
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            chave = (func.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(chave)
+            except TypeError:
+                return func(*args, **kwargs)
+            return _banco().cache.obter(func.__name__, chave, tabelas, lambda: func(*args, **kwargs))
+        wrapper.sem_cache = func
+        return wrapper
+    return decorador
+
+
+def _marcar_alteracao(conn, *tabelas):
+    """Incrementa a versão das tabelas alteradas (chamar dentro da transação da escrita)."""
+    conn.executemany("UPDATE versoes_tabelas SET versao = versao + 1 WHERE tabela = ?",
+                     [(t,) for t in tabelas])
+
+
+def estatisticas_cache():
+    """Acertos e faltas do cache por função de leitura (somando todas as obras abertas)."""
+    acertos, faltas = Counter(), Counter()
+    for banco in list(_bancos.values()):
+        acertos.update(banco.cache.acertos)
+        faltas.update(banco.cache.faltas)
+    return {n: {"acertos": acertos[n], "faltas": faltas[n]} for n in sorted(set(acertos) | set(faltas))}
+
+
+def limpar_cache():
+    for banco in list(_bancos.values()):
+        banco.cache.limpar()
+
+
+# --- OBRAS ---
+# Cada obra é um arquivo SQLite próprio, com o esquema completo, seu pool de
+# conexões e seu cache de leituras; o histórico de uma obra não pesa nas
+# consultas de outra. A obra de trabalho é escolhida por thread com
+# usar_obra(); sem ela, tudo vai para a obra principal (DB_PATH), que também
+# guarda o cadastro das obras.
+
+OBRA_PADRAO = "PRINCIPAL"
+NOME_OBRA_PADRAO = "Obra Principal"
+
+_CODIGO_OBRA = re.compile(r"^[A-Z0-9_-]{1,32}$")
+
+
+class _Banco:
+    """Pool, cache de leituras e estado de inicialização de um arquivo de obra."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.pool = ConnectionPool(caminho)
+        self.cache = CacheLeituras(caminho)
+        self.inicializado = False
+
+    def fechar(self):
+        self.pool.fechar()
+        self.cache.limpar()
+
+
+_bancos = {}
+_bancos_lock = threading.Lock()
+_obra_local = threading.local()
+
+
+def obra_atual():
+    """Código da obra usada pelas leituras e escritas desta thread."""
+    return getattr(_obra_local, "codigo", OBRA_PADRAO)
+
+
+def caminho_obra(codigo):
+    if codigo == OBRA_PADRAO:
+        return DB_PATH
+    return os.path.join(DIR_OBRAS, f"{codigo}.db")
+
+
+def _banco(codigo=None):
+    codigo = codigo or obra_atual()
+    banco = _bancos.get(codigo)
+    if banco is None:
+        with _bancos_lock:
+            banco = _bancos.get(codigo)
+            if banco is None:
+                caminho = caminho_obra(codigo)
+                if codigo != OBRA_PADRAO:
+                    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+                banco = _bancos[codigo] = _Banco(caminho)
+    return banco
+
+
+@contextmanager
+def usar_obra(codigo):
+    """Executa o bloco com leituras e escritas no banco da obra (aberto e inicializado sob demanda)."""
+    anterior = obra_atual()
+    _obra_local.codigo = codigo or OBRA_PADRAO
+    try:
+        init_db()
+        yield
+    finally:
+        _obra_local.codigo = anterior
+
+
+def em_todas_as_obras(func, *args, max_threads=8):
+    """Executa func(*args) em cada obra, em paralelo (uma thread por obra).
+    Retorna {codigo: resultado} na ordem de listar_obras()."""
+    codigos = [codigo for codigo, _ in listar_obras()]
+
+    def executar(codigo):
+        with usar_obra(codigo):
+            return func(*args)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_threads, len(codigos)))) as executor:
+        return dict(zip(codigos, executor.map(executar, codigos)))
+
+
+# --- FILA DE ESCRITA ---
+# Todas as escritas do processo passam por uma única thread escritora. As
+# funções marcadas com @escrita, chamadas de qualquer outra thread, viram
+# tarefas numa fila e a chamada espera o resultado (func.enviar(...) devolve o
+# Future sem esperar). A escritora junta as tarefas que já estão na fila, até
+# MAX_ESCRITAS_POR_COMMIT, num único BEGIN IMMEDIATE ... COMMIT por obra; cada
+# tarefa roda no seu próprio SAVEPOINT, então uma que falha desfaz só o que
+# ela fez e a exceção vai para o Future dela. Os Futures só são resolvidos
+# depois do COMMIT: quem esperou já enxerga a escrita nas leituras seguintes.
+# Como só uma conexão do processo escreve, as sessões não disputam lock entre
+# si; um lock de outro processo (CLI, benchmarks) é esperado com novas
+# tentativas em vez de virar erro.
+
+MAX_ESCRITAS_POR_COMMIT = 64
+TENTATIVAS_LOCK = 5
+
+
+class _Tarefa:
+    __slots__ = ("obra", "func", "args", "kwargs", "futuro")
+
+    def __init__(self, obra, func, args, kwargs):
+        self.obra = obra
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.futuro = Future()
+
+
+class FilaEscrita:
+    """Thread escritora única, iniciada na primeira escrita."""
+
+    def __init__(self, max_por_commit=MAX_ESCRITAS_POR_COMMIT):
+        self.max_por_commit = max_por_commit
+        self.commits = 0
+        self.tarefas = 0
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # obra -> (banco, contexto do pool, conexão): a escritora fica com uma
+        # conexão por obra, o que mantém as tabelas temporárias entre tarefas
+        self._conexoes = {}
+
+    def na_escritora(self):
+        return threading.current_thread() is self._thread
+
+    def enviar(self, func, *args, **kwargs):
+        """Põe func(*args, **kwargs) na fila, na obra atual desta thread. Retorna o Future."""
+        tarefa = _Tarefa(obra_atual(), func, args, kwargs)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="db_rh-escritora", daemon=True)
+                self._thread.start()
+            self._fila.put(tarefa)
+        return tarefa.futuro
+
+    def encerrar(self, timeout=30):
+        """Grava o que ainda está na fila e para a thread (chamado na saída do processo)."""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._fila.put(None)
+        thread.join(timeout)
+
+    def _executar(self):
+        parar = False
+        while not parar:
+            tarefas = [self._fila.get()]
+            while len(tarefas) < self.max_por_commit:
+                try:
+                    tarefas.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            if None in tarefas:
+                parar = True
+                tarefas = [t for t in tarefas if t is not None]
+            por_obra = {}
+            for tarefa in tarefas:
+                por_obra.setdefault(tarefa.obra, []).append(tarefa)
+            for obra, grupo in por_obra.items():
+                self._gravar(obra, grupo)
+        for banco, contexto, conn in self._conexoes.values():
+            contexto.__exit__(None, None, None)
+        self._conexoes.clear()
+
+    def _conexao(self, obra):
+        banco = _banco(obra)
+        atual = self._conexoes.get(obra)
+        if atual is None or atual[0] is not banco:
+            if atual is not None:
+                # configurar_banco trocou o arquivo: larga a conexão antiga
+                atual[1].__exit__(None, None, None)
+                atual[2].close()
+            contexto = banco.pool.conexao()
+            self._conexoes[obra] = atual = (banco, contexto, contexto.__enter__())
+        return atual[2]
+
+    def _abrir_transacao(self, conn):
+        for tentativa in range(TENTATIVAS_LOCK):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as erro:
+                if tentativa == TENTATIVAS_LOCK - 1 or "locked" not in str(erro) and "busy" not in str(erro):
+                    raise
+                time.sleep(0.05 * 2 ** tentativa)
+
+    def _gravar(self, obra, tarefas):
+        tarefas = [t for t in tarefas if t.futuro.set_running_or_notify_cancel()]
+        if not tarefas:
+            return
+        resultados = []
+        try:
+            with usar_obra(obra):
+                conn = self._conexao(obra)
+                self._abrir_transacao(conn)
+                try:
+                    for tarefa in tarefas:
+                        try:
+                            with transacao():  # SAVEPOINT da tarefa
+                                valor = tarefa.func(*tarefa.args, **tarefa.kwargs)
+                            resultados.append((tarefa.futuro, valor, None))
+                        except Exception as erro:
+                            resultados.append((tarefa.futuro, None, erro))
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+        except Exception as erro:
+            # Falhou o BEGIN ou o COMMIT: nenhuma tarefa do grupo foi gravada
+            for tarefa in tarefas:
+                tarefa.futuro.set_exception(erro)
+            return
+        self.commits += 1
+        self.tarefas += len(tarefas)
+        for futuro, valor, erro in resultados:
+            if erro is None:
+                futuro.set_result(valor)
+            else:
+                futuro.set_exception(erro)
+
+
+_fila_escrita = FilaEscrita()
+atexit.register(_fila_escrita.encerrar)
+
+
+def _em_transacao():
+    conn = getattr(_banco().pool._local, "conn", None)
+    return conn is not None and conn.in_transaction
+
+
+def escrita(func):
+    """Roda a função de escrita na thread escritora e espera o resultado.
+
+    Dentro da escritora (uma escrita chamando outra) ou com uma transação já
+    aberta nesta thread, roda direto, participando da transação corrente.
+    `func.enviar(...)` põe na fila e devolve o Future sem esperar.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _fila_escrita.na_escritora() or _em_transacao():
+            return func(*args, **kwargs)
+        return _fila_escrita.enviar(func, *args, **kwargs).result()
+    wrapper.enviar = functools.partial(_fila_escrita.enviar, func)
+    return wrapper
+
+
+def estatisticas_escrita():
+    """Tarefas gravadas, commits feitos e tarefas ainda na fila."""
+    return {"tarefas": _fila_escrita.tarefas, "commits": _fila_escrita.commits,
+            "na_fila": _fila_escrita._fila.qsize()}
+
+
+# --- MIGRAÇÕES DE ESQUEMA ---
+# Cada migração roda em sua própria transação e, ao final, grava o número da
+# versão em PRAGMA user_version. Migrações novas entram sempre no fim da lista.
+
+# Resumo diário do efetivo: presentes (status 1) e ausentes por data, situação
+# e abreviação. A abreviação segue a mesma regra dos gráficos: abreviação do
+# cadastro, senão a função do cadastro, senão a função informada no upload.
+_SQL_RESUMO_EFETIVO = '''
+    INSERT INTO efetivo_resumo (data, situacao, abreviacao, presentes, ausentes)
+    SELECT e.data,
+           COALESCE(e.situacao, ''),
+           UPPER(COALESCE(NULLIF(f.abreviacao, ''), f.funcao, e.funcao, '')),
+           SUM(e.status = 1),
+           SUM(e.status IS NOT 1)
+    FROM efetivo_diario e
+    LEFT JOIN funcionarios f ON f.matricula = e.matricula
+    WHERE e.data IS NOT NULL {filtro}
+    GROUP BY 1, 2, 3
+'''
+
+def _colunas(cursor, tabela):
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({tabela})")}
+
+def _m001_esquema_inicial(cursor):
     # Tabela de Funcionários
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS funcionarios (
@@ -26,13 +784,13 @@ def init_db():
             status TEXT
         )
     ''')
-    
+
     # Tabela de Funções
     cursor.execute('CREATE TABLE IF NOT EXISTS funcoes (nome TEXT PRIMARY KEY)')
-    
+
     # Tabela de Equipamentos
     cursor.execute('CREATE TABLE IF NOT EXISTS equipamentos (tag TEXT PRIMARY KEY)')
-    
+
     # Tabela de Apontamentos
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS apontamentos (
@@ -50,17 +808,11 @@ def init_db():
             data_apontamento TEXT
         )
     ''')
-    
+
     # Tabela de Usuários (Login)
     cursor.execute('CREATE TABLE IF NOT EXISTS usuarios (usuario TEXT PRIMARY KEY, senha TEXT)')
-    
-    # Tabela de Efetivo Diário - Forçar recriação para garantir nomes sem acentos
-    # Vamos sempre garantir que a estrutura esteja limpa para evitar erros de coluna
-    try:
-        cursor.execute("SELECT situacao FROM efetivo_diario LIMIT 1")
-    except sqlite3.OperationalError:
-        cursor.execute("DROP TABLE IF EXISTS efetivo_diario")
-    
+
+    # Tabela de Efetivo Diário (nomes de colunas sem acentos)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS efetivo_diario (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -72,184 +824,1690 @@ def init_db():
             situacao TEXT
         )
     ''')
-    
-    # Insere usuário padrão se não existir
-    cursor.execute("INSERT OR IGNORE INTO usuarios (usuario, senha) VALUES ('admin', '1234')")
-    
-    # Insere algumas funções básicas se estiver vazio
-    cursor.execute("SELECT COUNT(*) FROM funcoes")
-    if cursor.fetchone()[0] == 0:
-        for f in ["ENCARREGADO", "MONTADOR", "SOLDADOR", "AJUDANTE", "TECNICO"]:
-            cursor.execute("INSERT INTO funcoes (nome) VALUES (?)", (f,))
-
-    conn.commit()
-    conn.close()
-
-# Inicializa o banco ao carregar o módulo
-init_db()
+
+def _m002_colunas_efetivo(cursor):
+    # Bancos antigos podem ter o efetivo_diario com colunas acentuadas. Antes a
+    # tabela era apagada; agora só acrescentamos as colunas que faltam.
+    existentes = _colunas(cursor, "efetivo_diario")
+    for coluna, tipo in [("data", "TEXT"), ("matricula", "TEXT"), ("nome", "TEXT"),
+                         ("funcao", "TEXT"), ("status", "INTEGER"), ("situacao", "TEXT")]:
+        if coluna not in existentes:
+            cursor.execute(f"ALTER TABLE efetivo_diario ADD COLUMN {coluna} {tipo}")
+
+def _m003_indices(cursor):
+    # (data, status) também atende filtros e DELETEs só por data
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_efetivo_data_status ON efetivo_diario (data, status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_efetivo_matricula ON efetivo_diario (matricula)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_apont_data ON apontamentos (data_apontamento)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_apont_matricula ON apontamentos (matricula)")
+
+def _m004_datas_efetivo(cursor):
+    # Uploads antigos gravaram a data como 'AAAA-MM-DD 00:00:00'; padroniza
+    # em 'AAAA-MM-DD' para que filtros e GROUP BY em SQL agrupem o mesmo dia.
+    cursor.execute("UPDATE efetivo_diario SET data = substr(data, 1, 10) WHERE length(data) > 10")
+
+def _m005_resumo_efetivo(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS efetivo_resumo (
+            data TEXT NOT NULL,
+            situacao TEXT NOT NULL,
+            abreviacao TEXT NOT NULL,
+            presentes INTEGER NOT NULL,
+            ausentes INTEGER NOT NULL,
+            PRIMARY KEY (data, situacao, abreviacao)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("DELETE FROM efetivo_resumo")
+    cursor.execute(_SQL_RESUMO_EFETIVO.format(filtro=""))
+
+def _m006_versoes_tabelas(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS versoes_tabelas (
+            tabela TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.executemany("INSERT OR IGNORE INTO versoes_tabelas (tabela) VALUES (?)",
+                       [(t,) for t in TABELAS_VERSIONADAS])
+
+def _sql_minutos(coluna):
+    # 'HH:MM' ou 'HH:MM:SS' -> minutos desde 00:00 (NULL se o texto não for um horário)
+    return (f"CASE WHEN {coluna} GLOB '[0-9][0-9]:[0-9][0-9]*' "
+            f"THEN CAST(substr({coluna}, 1, 2) AS INTEGER) * 60 + CAST(substr({coluna}, 4, 2) AS INTEGER) END")
+
+def _m007_minutos_apontamentos(cursor):
+    existentes = _colunas(cursor, "apontamentos")
+    for coluna in ["entrada_min", "saida_almoco_min", "retorno_almoco_min", "saida_final_min", "minutos_trabalhados"]:
+        if coluna not in existentes:
+            cursor.execute(f"ALTER TABLE apontamentos ADD COLUMN {coluna} INTEGER")
+    cursor.execute(f'''UPDATE apontamentos SET
+                         entrada_min = {_sql_minutos("entrada")},
+                         saida_almoco_min = {_sql_minutos("saida_almoco")},
+                         retorno_almoco_min = {_sql_minutos("retorno_almoco")},
+                         saida_final_min = {_sql_minutos("saida_final")}''')
+    # Cada período que passa da meia-noite soma 24h; sem os horários, usa o total_horas ('HH:MM')
+    cursor.execute('''UPDATE apontamentos SET minutos_trabalhados = COALESCE(
+                         (saida_almoco_min - entrada_min + 1440) % 1440
+                         + (saida_final_min - retorno_almoco_min + 1440) % 1440,
+                         CAST(substr(total_horas, 1, instr(total_horas, ':') - 1) AS INTEGER) * 60
+                         + CAST(substr(total_horas, instr(total_horas, ':') + 1, 2) AS INTEGER))''')
+
+# Esquema normalizado: efetivo e apontamentos guardam só chaves inteiras. O nome
+# fica em ref_colaboradores (um registro por matrícula); a função, em cada
+# registro, como veio no upload ou no apontamento (migração 12); funções,
+# situações e equipamentos, em tabelas de referência. As views efetivo_diario e
+# apontamentos mantêm as colunas antigas para as consultas de leitura.
+
+def _sql_horario(coluna, formato="%02d:%02d:00"):
+    # minutos -> 'HH:MM:SS' (ou 'HH:MM'); NULL continua NULL
+    return f"CASE WHEN {coluna} IS NOT NULL THEN printf('{formato}', {coluna} / 60, {coluna} % 60) END"
+
+# Colunas das tabelas de fatos, na ordem em que são criadas (a mesma nos arquivos de meses fechados)
+COLUNAS_EFETIVO_REGISTROS = "id, data, colaborador_id, status, situacao_id, funcao_id"
+COLUNAS_APONTAMENTOS_REGISTROS = ("id, data_apontamento, colaborador_id, equipamento_id, atividade, entrada_min, "
+                                  "saida_almoco_min, retorno_almoco_min, saida_final_min, minutos_trabalhados, funcao_id")
+
+def _sql_efetivo(fonte="efetivo_registros"):
+    # Colunas da view efetivo_diario sobre `fonte` (a tabela ou a união com meses arquivados)
+    return f'''
+    SELECT e.id, e.data, c.matricula, c.nome, rf.nome AS funcao, e.status, s.nome AS situacao
+    FROM {fonte} e
+    LEFT JOIN ref_colaboradores c ON c.id = e.colaborador_id
+    LEFT JOIN ref_funcoes rf ON rf.id = e.funcao_id
+    LEFT JOIN ref_situacoes s ON s.id = e.situacao_id
+'''
+
+def _sql_apontamentos(fonte="apontamentos_registros"):
+    return f'''
+    SELECT a.id, c.matricula, c.nome, rf.nome AS funcao, q.tag AS equipamento, a.atividade,
+           {_sql_horario("a.entrada_min")} AS entrada,
+           {_sql_horario("a.saida_almoco_min")} AS saida_almoco,
+           {_sql_horario("a.retorno_almoco_min")} AS retorno_almoco,
+           {_sql_horario("a.saida_final_min")} AS saida_final,
+           {_sql_horario("a.minutos_trabalhados", "%02d:%02d")} AS total_horas,
+           a.data_apontamento, a.entrada_min, a.saida_almoco_min, a.retorno_almoco_min,
+           a.saida_final_min, a.minutos_trabalhados
+    FROM {fonte} a
+    LEFT JOIN ref_colaboradores c ON c.id = a.colaborador_id
+    LEFT JOIN ref_funcoes rf ON rf.id = a.funcao_id
+    LEFT JOIN ref_equipamentos q ON q.id = a.equipamento_id
+'''
+
+_SQL_VIEW_EFETIVO = "CREATE VIEW efetivo_diario AS" + _sql_efetivo()
+
+_SQL_VIEW_APONTAMENTOS = "CREATE VIEW apontamentos AS" + _sql_apontamentos()
+
+def _m008_esquema_normalizado(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS ref_funcoes (id INTEGER PRIMARY KEY, nome TEXT NOT NULL UNIQUE)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS ref_situacoes (id INTEGER PRIMARY KEY, nome TEXT NOT NULL UNIQUE)")
+    cursor.execute("CREATE TABLE IF NOT EXISTS ref_equipamentos (id INTEGER PRIMARY KEY, tag TEXT NOT NULL UNIQUE)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ref_colaboradores (
+            id INTEGER PRIMARY KEY,
+            matricula TEXT NOT NULL UNIQUE,
+            nome TEXT,
+            funcao_id INTEGER REFERENCES ref_funcoes (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE efetivo_registros (
+            id INTEGER PRIMARY KEY,
+            data TEXT,
+            colaborador_id INTEGER REFERENCES ref_colaboradores (id),
+            status INTEGER,
+            situacao_id INTEGER REFERENCES ref_situacoes (id),
+            funcao_id INTEGER REFERENCES ref_funcoes (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE apontamentos_registros (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_apontamento TEXT,
+            colaborador_id INTEGER REFERENCES ref_colaboradores (id),
+            equipamento_id INTEGER REFERENCES ref_equipamentos (id),
+            atividade TEXT,
+            entrada_min INTEGER,
+            saida_almoco_min INTEGER,
+            retorno_almoco_min INTEGER,
+            saida_final_min INTEGER,
+            minutos_trabalhados INTEGER,
+            funcao_id INTEGER REFERENCES ref_funcoes (id)
+        )
+    ''')
+
+    # Valores de referência já usados no cadastro e no histórico
+    cursor.execute('''INSERT OR IGNORE INTO ref_funcoes (nome)
+                      SELECT funcao FROM funcionarios UNION SELECT funcao FROM efetivo_diario
+                      UNION SELECT funcao FROM apontamentos''')
+    cursor.execute("DELETE FROM ref_funcoes WHERE nome = ''")
+    cursor.execute("INSERT OR IGNORE INTO ref_situacoes (nome) SELECT DISTINCT situacao FROM efetivo_diario WHERE situacao <> ''")
+    cursor.execute("INSERT OR IGNORE INTO ref_equipamentos (tag) SELECT DISTINCT equipamento FROM apontamentos WHERE equipamento <> ''")
+
+    # Colaboradores: o cadastro vale; matrículas fora dele ficam com o nome/função mais recente
+    cursor.execute('''INSERT INTO ref_colaboradores (matricula, nome, funcao_id)
+                      SELECT f.matricula, f.nome, rf.id FROM funcionarios f
+                      LEFT JOIN ref_funcoes rf ON rf.nome = f.funcao''')
+    cursor.execute('''INSERT OR IGNORE INTO ref_colaboradores (matricula, nome, funcao_id)
+                      SELECT o.matricula, o.nome, rf.id
+                      FROM (SELECT matricula, nome, funcao, MAX(data) FROM (
+                                SELECT matricula, nome, funcao, data FROM efetivo_diario
+                                UNION ALL
+                                SELECT matricula, nome, funcao, data_apontamento FROM apontamentos)
+                            WHERE matricula IS NOT NULL AND matricula <> '' GROUP BY matricula) o
+                      LEFT JOIN ref_funcoes rf ON rf.nome = o.funcao''')
+
+    # Histórico com os mesmos ids (a paginação dos apontamentos usa o id como cursor)
+    # e a função de cada linha
+    cursor.execute('''INSERT INTO efetivo_registros (id, data, colaborador_id, status, situacao_id, funcao_id)
+                      SELECT e.id, e.data, c.id, e.status, s.id, rf.id FROM efetivo_diario e
+                      LEFT JOIN ref_colaboradores c ON c.matricula = e.matricula
+                      LEFT JOIN ref_situacoes s ON s.nome = e.situacao
+                      LEFT JOIN ref_funcoes rf ON rf.nome = e.funcao''')
+    cursor.execute('''INSERT INTO apontamentos_registros (id, data_apontamento, colaborador_id, equipamento_id, atividade,
+                                                          entrada_min, saida_almoco_min, retorno_almoco_min,
+                                                          saida_final_min, minutos_trabalhados, funcao_id)
+                      SELECT a.id, a.data_apontamento, c.id, q.id, a.atividade, a.entrada_min, a.saida_almoco_min,
+                             a.retorno_almoco_min, a.saida_final_min, a.minutos_trabalhados, rf.id
+                      FROM apontamentos a
+                      LEFT JOIN ref_colaboradores c ON c.matricula = a.matricula
+                      LEFT JOIN ref_equipamentos q ON q.tag = a.equipamento
+                      LEFT JOIN ref_funcoes rf ON rf.nome = a.funcao''')
+
+    cursor.execute("DROP TABLE efetivo_diario")
+    cursor.execute("DROP TABLE apontamentos")
+    cursor.execute(_SQL_VIEW_EFETIVO)
+    cursor.execute(_SQL_VIEW_APONTAMENTOS)
+    cursor.execute("CREATE INDEX idx_efetivo_reg_data_status ON efetivo_registros (data, status)")
+    cursor.execute("CREATE INDEX idx_efetivo_reg_colaborador ON efetivo_registros (colaborador_id)")
+    cursor.execute("CREATE INDEX idx_apont_reg_data ON apontamentos_registros (data_apontamento)")
+    cursor.execute("CREATE INDEX idx_apont_reg_colaborador ON apontamentos_registros (colaborador_id)")
+
+def _m009_obras(cursor):
+    # Cadastro das obras (usado no banco da obra principal)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS obras (
+            codigo TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            criada_em TEXT
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO versoes_tabelas (tabela) VALUES ('obras')")
+
+def _m010_meses_arquivados(cursor):
+    # Meses fechados movidos para os arquivos de histórico (ver arquivar_mes)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS meses_arquivados (
+            mes TEXT PRIMARY KEY,
+            efetivo INTEGER NOT NULL,
+            apontamentos INTEGER NOT NULL,
+            arquivado_em TEXT
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO versoes_tabelas (tabela) VALUES ('meses_arquivados')")
+
+def _m011_datas_apontamentos(cursor):
+    # Apontamentos da edição em lote gravaram datetime/Timestamp como
+    # 'AAAA-MM-DD 00:00:00'; padroniza como na migração 4 do efetivo.
+    cursor.execute('''UPDATE apontamentos_registros SET data_apontamento = substr(data_apontamento, 1, 10)
+                      WHERE length(data_apontamento) > 10''')
+
+def _m012_funcao_por_registro(cursor):
+    # A função passa a ser de cada registro: quem muda de função fora do
+    # cadastro não reescreve mais os dias anteriores. A função enviada nas
+    # linhas gravadas desde a migração 8 não existe mais; elas ficam com a
+    # função atual do colaborador.
+    for tabela in ("efetivo_registros", "apontamentos_registros"):
+        if "funcao_id" not in _colunas(cursor, tabela):
+            cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN funcao_id INTEGER REFERENCES ref_funcoes (id)")
+            cursor.execute(f'''UPDATE {tabela} SET funcao_id =
+                                 (SELECT c.funcao_id FROM ref_colaboradores c WHERE c.id = {tabela}.colaborador_id)''')
+    cursor.execute("DROP VIEW efetivo_diario")
+    cursor.execute("DROP VIEW apontamentos")
+    cursor.execute(_SQL_VIEW_EFETIVO)
+    cursor.execute(_SQL_VIEW_APONTAMENTOS)
+
+    # Os arquivos dos meses fechados ganham a mesma coluna (ver ARQUIVO DE MESES FECHADOS)
+    funcoes = cursor.execute("SELECT funcao_id, id FROM ref_colaboradores").fetchall()
+    for (mes,) in cursor.execute("SELECT mes FROM meses_arquivados").fetchall():
+        arquivo = _arquivo_mes(mes)
+        if not os.path.exists(arquivo):
+            continue
+        conn = sqlite3.connect(arquivo)
+        try:
+            with conn:
+                for tabela in ("efetivo_registros", "apontamentos_registros"):
+                    if "funcao_id" not in _colunas(conn, tabela):
+                        conn.execute(f"ALTER TABLE {tabela} ADD COLUMN funcao_id INTEGER")
+                        conn.executemany(f"UPDATE {tabela} SET funcao_id = ? WHERE colaborador_id = ?", funcoes)
+        finally:
+            conn.close()
+
+MIGRACOES = [
+    (1, "esquema inicial", _m001_esquema_inicial),
+    (2, "colunas do efetivo_diario sem acentos", _m002_colunas_efetivo),
+    (3, "índices de efetivo_diario e apontamentos", _m003_indices),
+    (4, "datas do efetivo_diario em AAAA-MM-DD", _m004_datas_efetivo),
+    (5, "tabela de resumo diário do efetivo", _m005_resumo_efetivo),
+    (6, "versões das tabelas para o cache de leituras", _m006_versoes_tabelas),
+    (7, "horários dos apontamentos em minutos inteiros", _m007_minutos_apontamentos),
+    (8, "efetivo e apontamentos normalizados com chaves inteiras", _m008_esquema_normalizado),
+    (9, "cadastro de obras", _m009_obras),
+    (10, "meses arquivados", _m010_meses_arquivados),
+    (11, "datas dos apontamentos em AAAA-MM-DD", _m011_datas_apontamentos),
+    (12, "função gravada em cada registro de efetivo e apontamento", _m012_funcao_por_registro),
+]
+
+def versao_esquema():
+    """Versão do esquema gravada no banco (PRAGMA user_version)."""
+    with get_connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+@escrita
+def migrar():
+    """Aplica, em ordem, as migrações ainda não aplicadas. Retorna a versão final.
+
+    Roda na escritora, como as demais escritas. Lá, usar_obra inicializa o
+    banco antes de abrir a transação do grupo, e cada migração faz o seu
+    próprio commit.
+    """
+    for versao, descricao, aplicar in MIGRACOES:
+        with transacao() as conn:
+            # Relido dentro da transação: outro processo pode ter migrado antes
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= versao:
+                continue
+            aplicar(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {versao}")
+    return versao_esquema()
+
+def init_db():
+    """Atualiza o esquema do banco da obra atual e insere os dados padrão, uma vez por processo.
+
+    Não roda ao importar o módulo: o app, os benchmarks e os scripts chamam
+    explicitamente (usar_obra chama para as demais obras). Chamadas seguintes
+    para o mesmo banco retornam na hora.
+    """
+    if not _banco().inicializado:
+        _inicializar_banco()
+
+
+@escrita
+def _inicializar_banco():
+    # Na escritora, que executa uma tarefa por vez: chamadas simultâneas de
+    # outras threads esperam na fila e a segunda encontra o banco pronto
+    banco = _banco()
+    if banco.inicializado:
+        return
+    migrar()
+    with transacao() as conn:
+        cursor = conn.cursor()
+
+        # Insere usuário padrão se não existir
+        cursor.execute("INSERT OR IGNORE INTO usuarios (usuario, senha) VALUES ('admin', '1234')")
+
+        # Insere algumas funções básicas se estiver vazio
+        cursor.execute("SELECT COUNT(*) FROM funcoes")
+        if cursor.fetchone()[0] == 0:
+            for f in ["ENCARREGADO", "MONTADOR", "SOLDADOR", "AJUDANTE", "TECNICO"]:
+                cursor.execute("INSERT INTO funcoes (nome) VALUES (?)", (f,))
+    banco.inicializado = True
+
+# --- CHAVES DAS TABELAS DE REFERÊNCIA ---
+
+def _id_referencia(conn, tabela, coluna, valor):
+    """Chave inteira de um valor da tabela de referência, criando-o se preciso (None para vazio)."""
+    if valor is None or valor == "":
+        return None
+    row = conn.execute(f"SELECT id FROM {tabela} WHERE {coluna} = ?", (valor,)).fetchone()
+    if row:
+        return row[0]
+    return conn.execute(f"INSERT INTO {tabela} ({coluna}) VALUES (?)", (valor,)).lastrowid
+
+def _id_colaborador(conn, mat, nome, funcao, cadastro=False):
+    """Chave do colaborador da matrícula, criando-o se preciso.
+
+    Nome e função só são sobrescritos pelo cadastro (cadastro=True) ou, para
+    matrículas fora do cadastro, pelo dado que está sendo gravado. O nome
+    aparece em todos os dias da matrícula; a função de cada dia fica no
+    próprio registro.
+    """
+    if mat is None or mat == "":
+        return None
+    mat = str(mat)
+    funcao_id = _id_referencia(conn, "ref_funcoes", "nome", funcao)
+    row = conn.execute("SELECT id, nome, funcao_id FROM ref_colaboradores WHERE matricula = ?", (mat,)).fetchone()
+    if row is None:
+        return conn.execute("INSERT INTO ref_colaboradores (matricula, nome, funcao_id) VALUES (?, ?, ?)",
+                            (mat, nome, funcao_id)).lastrowid
+    if (nome, funcao_id) == tuple(row[1:]):
+        return row[0]
+    if cadastro:
+        conn.execute("UPDATE ref_colaboradores SET nome = ?, funcao_id = ? WHERE id = ?", (nome, funcao_id, row[0]))
+    elif conn.execute("SELECT 1 FROM funcionarios WHERE matricula = ?", (mat,)).fetchone() is None:
+        conn.execute("UPDATE ref_colaboradores SET nome = ?, funcao_id = ? WHERE id = ?", (nome, funcao_id, row[0]))
+        _marcar_alteracao(conn, "efetivo_diario", "apontamentos")
+    return row[0]
+
+def compactar_banco():
+    """VACUUM do arquivo (devolve ao disco o espaço liberado, ex.: após a migração 8).
+    Retorna (MB antes, MB depois)."""
+    caminho = _banco().caminho
+    with get_connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        antes = os.path.getsize(caminho) / 2**20
+        conn.execute("VACUUM")
+    return round(antes, 2), round(os.path.getsize(caminho) / 2**20, 2)
 
 def check_login(user, pwd):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM usuarios WHERE usuario = ? AND senha = ?", (user, pwd))
-    result = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.execute("SELECT * FROM usuarios WHERE usuario = ? AND senha = ?", (user, pwd))
+        result = cursor.fetchone()
     return result is not None
 
+@em_cache("funcionarios")
 def get_funcionarios():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM funcionarios")
-    rows = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        rows = conn.execute("SELECT * FROM funcionarios").fetchall()
+    return [list(row) for row in rows]
+
+# --- EXPORTAÇÃO DO CADASTRO (aba Consulta Geral) ---
+
+COLUNAS_FUNCIONARIOS = ["Matrícula", "Nome", "Função", "Abrev.", "Admissão", "MO", "Status"]
+FORMATOS_EXPORTACAO = ("xlsx", "csv", "parquet")
+
+@em_cache("funcionarios")
+def get_funcionarios_maiusculas():
+    """Cadastro completo com todos os textos em maiúsculas (como é exibido e exportado)."""
+    with get_connection() as conn:
+        rows = conn.execute('''SELECT UPPER(matricula), UPPER(nome), UPPER(funcao), UPPER(abreviacao),
+                                      UPPER(admissao), UPPER(mo), UPPER(status) FROM funcionarios''').fetchall()
     return [list(row) for row in rows]
 
+@em_cache("funcionarios")
+def exportar_funcionarios(formato="xlsx"):
+    """Cadastro em maiúsculas serializado no formato pedido ('xlsx', 'csv' ou 'parquet').
+
+    Gerado só quando pedido e guardado em cache até o cadastro mudar. O XLSX
+    usa o modo write-only do openpyxl, que grava as linhas em fluxo. Parquet
+    exige pandas com pyarrow (ImportError caso contrário).
+    """
+    rows = get_funcionarios_maiusculas()
+    buffer = io.BytesIO()
+    if formato == "xlsx":
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Efetivo")
+        ws.append(COLUNAS_FUNCIONARIOS)
+        for row in rows:
+            ws.append(row)
+        wb.save(buffer)
+    elif formato == "csv":
+        # ';' e BOM UTF-8 para o Excel em português abrir direto
+        texto = io.TextIOWrapper(buffer, encoding="utf-8-sig", newline="")
+        writer = csv.writer(texto, delimiter=";")
+        writer.writerow(COLUNAS_FUNCIONARIOS)
+        writer.writerows(rows)
+        texto.flush()
+        texto.detach()
+    elif formato == "parquet":
+        import pandas as pd
+        pd.DataFrame(rows, columns=COLUNAS_FUNCIONARIOS).to_parquet(buffer, index=False)
+    else:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+    return buffer.getvalue()
+
+@escrita
 def add_funcionario(mat, nome, func, abrev, adm, mo, status):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO funcionarios VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                       (mat, nome, func, abrev, str(adm), mo, status))
-        conn.commit()
-        conn.close()
+        with transacao() as conn:
+            conn.execute("INSERT INTO funcionarios VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (mat, nome, func, abrev, str(adm), mo, status))
+            _id_colaborador(conn, mat, nome, func, cadastro=True)
+            _atualizar_resumo_da_matricula(conn, mat)
+            # O nome do cadastro aparece no efetivo e nos apontamentos já gravados
+            _marcar_alteracao(conn, "funcionarios", "efetivo_diario", "apontamentos", "efetivo_resumo")
         return True, "Sucesso"
     except sqlite3.IntegrityError:
         return False, "Matrícula já existe"
 
+@escrita
 def update_funcionario(mat, nome, func, abrev, adm, mo, status):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''UPDATE funcionarios SET nome=?, funcao=?, abreviacao=?, admissao=?, mo=?, status=? 
-                      WHERE matricula=?''', (nome, func, abrev, str(adm), mo, status, mat))
-    conn.commit()
-    conn.close()
+    with transacao() as conn:
+        conn.execute('''UPDATE funcionarios SET nome=?, funcao=?, abreviacao=?, admissao=?, mo=?, status=? 
+                        WHERE matricula=?''', (nome, func, abrev, str(adm), mo, status, mat))
+        _id_colaborador(conn, mat, nome, func, cadastro=True)
+        _atualizar_resumo_da_matricula(conn, mat)
+        _marcar_alteracao(conn, "funcionarios", "efetivo_diario", "apontamentos", "efetivo_resumo")
     return True
 
+@escrita
 def delete_funcionario(mat):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM funcionarios WHERE matricula = ?", (mat,))
-    conn.commit()
-    conn.close()
+    with transacao() as conn:
+        conn.execute("DELETE FROM funcionarios WHERE matricula = ?", (mat,))
+        _atualizar_resumo_da_matricula(conn, mat)
+        _marcar_alteracao(conn, "funcionarios", "efetivo_resumo")
     return True
 
+# --- DIRETÓRIO DE COLABORADORES ---
+# Cadastro em memória com índices por matrícula, função e abreviação. É montado
+# uma vez por versão da tabela funcionarios (via cache de leituras) e o mesmo
+# objeto é compartilhado por todas as sessões: trate-o como somente leitura.
+
+class Colaborador:
+    __slots__ = ("matricula", "nome", "funcao", "abreviacao", "admissao", "mo", "status", "sigla")
+
+    def __init__(self, matricula, nome, funcao, abreviacao, admissao, mo, status):
+        self.matricula = matricula
+        self.nome = nome
+        self.funcao = funcao
+        self.abreviacao = abreviacao
+        self.admissao = admissao
+        self.mo = mo
+        self.status = status
+        # Agrupamento dos gráficos: abreviação do cadastro, senão a função
+        self.sigla = (abreviacao or funcao or "").upper()
+
+    def como_lista(self):
+        """Mesma forma de uma linha de get_funcionarios()."""
+        return [self.matricula, self.nome, self.funcao, self.abreviacao, self.admissao, self.mo, self.status]
+
+
+class DiretorioColaboradores:
+    """Colaboradores na ordem do cadastro, com buscas em tempo constante."""
+
+    def __init__(self, linhas):
+        self.colaboradores = tuple(Colaborador(*linha) for linha in linhas)
+        self.matriculas = [c.matricula for c in self.colaboradores]
+        self.por_matricula = {c.matricula: c for c in self.colaboradores}
+        por_funcao, por_sigla = defaultdict(list), defaultdict(list)
+        for c in self.colaboradores:
+            por_funcao[c.funcao].append(c)
+            por_sigla[c.sigla].append(c)
+        self.por_funcao = dict(por_funcao)
+        self.por_sigla = dict(por_sigla)
+        # matrícula -> sigla, usado para agrupar o efetivo e as horas por abreviação
+        self.siglas = {c.matricula: c.sigla for c in self.colaboradores}
+
+    def get(self, matricula, padrao=None):
+        return self.por_matricula.get(matricula, padrao)
+
+    def __contains__(self, matricula):
+        return matricula in self.por_matricula
+
+    def __len__(self):
+        return len(self.colaboradores)
+
+    def __iter__(self):
+        return iter(self.colaboradores)
+
+    def ativos(self, funcoes=None):
+        """Colaboradores com status 'Ativo', opcionalmente só das funções informadas."""
+        grupos = [self.por_funcao.get(f, ()) for f in funcoes] if funcoes else [self.colaboradores]
+        ativos = {c.matricula for g in grupos for c in g if c.status == "Ativo"}
+        return [c for c in self.colaboradores if c.matricula in ativos]
+
+@em_cache("funcionarios")
+def get_diretorio():
+    """Diretório do cadastro atual (compartilhado; não altere os objetos)."""
+    return DiretorioColaboradores(get_funcionarios())
+
+@em_cache("funcoes")
 def get_funcoes():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT nome FROM funcoes ORDER BY nome")
-    rows = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        rows = conn.execute("SELECT nome FROM funcoes ORDER BY nome").fetchall()
     return [row[0] for row in rows]
 
+@escrita
 def add_funcao(nome):
     if not nome: return False
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO funcoes VALUES (?)", (nome.strip().upper(),))
-        conn.commit()
-        conn.close()
+        with transacao() as conn:
+            conn.execute("INSERT INTO funcoes VALUES (?)", (nome.strip().upper(),))
+            _marcar_alteracao(conn, "funcoes")
         return True
     except: return False
 
+@escrita
 def delete_funcao(nome):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM funcoes WHERE nome = ?", (nome,))
-    conn.commit()
-    conn.close()
+    with transacao() as conn:
+        conn.execute("DELETE FROM funcoes WHERE nome = ?", (nome,))
+        _marcar_alteracao(conn, "funcoes")
     return True
 
+@em_cache("equipamentos")
 def get_equipamentos():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT tag FROM equipamentos ORDER BY tag")
-    rows = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        rows = conn.execute("SELECT tag FROM equipamentos ORDER BY tag").fetchall()
     return [row[0] for row in rows]
 
+@escrita
 def add_equipamento(tag):
     if not tag: return False
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO equipamentos VALUES (?)", (tag.strip().upper(),))
-        conn.commit()
-        conn.close()
+        with transacao() as conn:
+            conn.execute("INSERT INTO equipamentos VALUES (?)", (tag.strip().upper(),))
+            _marcar_alteracao(conn, "equipamentos")
         return True
     except: return False
 
+@escrita
 def delete_equipamento(tag):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM equipamentos WHERE tag = ?", (tag,))
-    conn.commit()
-    conn.close()
+    with transacao() as conn:
+        conn.execute("DELETE FROM equipamentos WHERE tag = ?", (tag,))
+        _marcar_alteracao(conn, "equipamentos")
     return True
 
+# --- CADASTRO DE OBRAS (no banco da obra principal) ---
+
+@em_cache("obras")
+def _obras_cadastradas():
+    with get_connection() as conn:
+        rows = conn.execute("SELECT codigo, nome FROM obras ORDER BY nome").fetchall()
+    return [list(row) for row in rows]
+
+def listar_obras():
+    """[[codigo, nome], ...] com a obra principal primeiro."""
+    with usar_obra(OBRA_PADRAO):
+        return [[OBRA_PADRAO, NOME_OBRA_PADRAO]] + _obras_cadastradas()
+
+@escrita
+def add_obra(codigo, nome):
+    """Cadastra uma obra e cria o seu arquivo de banco. Retorna (sucesso, mensagem)."""
+    codigo = (codigo or "").strip().upper()
+    if not _CODIGO_OBRA.match(codigo) or codigo == OBRA_PADRAO:
+        return False, "Código inválido (use letras, números, '-' ou '_', até 32 caracteres)"
+    if not (nome or "").strip():
+        return False, "Informe o nome da obra"
+    try:
+        with usar_obra(OBRA_PADRAO), transacao() as conn:
+            conn.execute("INSERT INTO obras VALUES (?, ?, ?)",
+                         (codigo, nome.strip(), datetime.now().isoformat(timespec="seconds")))
+            _marcar_alteracao(conn, "obras")
+    except sqlite3.IntegrityError:
+        return False, "Obra já existe"
+    with usar_obra(codigo):  # cria e migra o arquivo da obra
+        pass
+    return True, "Sucesso"
+
+@em_cache("apontamentos")
 def get_apontamentos():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT matricula, nome, funcao, equipamento, atividade, entrada, saida_almoco, retorno_almoco, saida_final, total_horas, data_apontamento FROM apontamentos")
-    rows = cursor.fetchall()
-    conn.close()
+    rows = _ler_com_arquivo("SELECT matricula, nome, funcao, equipamento, atividade, entrada, saida_almoco, retorno_almoco, saida_final, total_horas, data_apontamento FROM {apontamentos}")
     return [list(row) for row in rows]
 
+@em_cache("apontamentos")
 def get_apontamentos_com_id():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, matricula, nome, funcao, equipamento, atividade, entrada, saida_almoco, retorno_almoco, saida_final, total_horas, data_apontamento FROM apontamentos")
-    rows = cursor.fetchall()
-    conn.close()
+    rows = _ler_com_arquivo("SELECT id, matricula, nome, funcao, equipamento, atividade, entrada, saida_almoco, retorno_almoco, saida_final, total_horas, data_apontamento FROM {apontamentos}")
     return [list(row) for row in rows]
 
+def minutos_do_horario(valor):
+    """Converte um horário (time, 'HH:MM' ou 'HH:MM:SS') em minutos desde 00:00; None se inválido."""
+    if valor is None:
+        return None
+    if hasattr(valor, "hour"):
+        return valor.hour * 60 + valor.minute
+    try:
+        h, m = str(valor).split(":")[:2]
+        return int(h) * 60 + int(m)
+    except ValueError:
+        return None
+
+def calcular_minutos_trabalhados(ent, s_alm, r_alm, s_fin):
+    """Minutos trabalhados (manhã + tarde). Um período que termina antes de
+    começar é tratado como virada da meia-noite. Retorna None se algum horário for inválido."""
+    e, sa, ra, sf = (minutos_do_horario(v) for v in (ent, s_alm, r_alm, s_fin))
+    if None in (e, sa, ra, sf):
+        return None
+    return (sa - e) % 1440 + (sf - ra) % 1440
+
+def formatar_minutos(minutos):
+    """Minutos -> 'HH:MM'."""
+    minutos = int(minutos or 0)
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+def _linha_apontamento(mat, nome, func, equip, ativ, ent, s_alm, r_alm, s_fin, total, data):
+    # Só os minutos são gravados; a view apontamentos monta os textos 'HH:MM'
+    minutos = [minutos_do_horario(v) for v in (ent, s_alm, r_alm, s_fin)]
+    trabalhados = calcular_minutos_trabalhados(ent, s_alm, r_alm, s_fin)
+    if trabalhados is None and total is not None:
+        trabalhados = minutos_do_horario(total)
+    return (mat, nome, func, equip, ativ, _data_iso(data), *minutos, trabalhados)
+
+@escrita
 def add_apontamento(mat, nome, func, equip, ativ, ent, s_alm, r_alm, s_fin, total, data):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''INSERT INTO apontamentos (matricula, nome, funcao, equipamento, atividade, entrada, saida_almoco, retorno_almoco, saida_final, total_horas, data_apontamento) 
-                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', 
-                   (mat, nome, func, equip, ativ, str(ent), str(s_alm), str(r_alm), str(s_fin), total, str(data)))
-    conn.commit()
-    conn.close()
+    add_apontamentos_batch([(mat, nome, func, equip, ativ, ent, s_alm, r_alm, s_fin, total, data)])
     return True
 
+TAMANHO_PAGINA_APONTAMENTOS = 20
+
+@em_cache("apontamentos")
+def get_apontamentos_pagina(data=None, matricula=None, antes_de_id=None, tamanho=TAMANHO_PAGINA_APONTAMENTOS):
+    """Uma página de apontamentos, do mais recente para o mais antigo.
+
+    Paginação por chave (id): para a página seguinte, passe em antes_de_id o
+    cursor devolvido pela chamada anterior. O custo não depende do tamanho do
+    histórico. Retorna (linhas, proximo_cursor); proximo_cursor é None na
+    última página. As linhas têm as colunas de get_apontamentos_com_id, com
+    os textos em maiúsculas. Sem `data`, a lista percorre só os meses ainda no
+    banco vivo; com uma data de mês arquivado, lê o arquivo do mês.
+    """
+    filtros, params = [], []
+    if data is not None:
+        filtros.append("data_apontamento = ?")
+        params.append(_data_iso(data))
+    if matricula:
+        filtros.append("matricula = ?")
+        params.append(str(matricula))
+    if antes_de_id is not None:
+        filtros.append("id < ?")
+        params.append(antes_de_id)
+    where = ("WHERE " + " AND ".join(filtros)) if filtros else ""
+    rows = _ler_com_arquivo(f'''SELECT id, matricula, UPPER(nome), UPPER(funcao), UPPER(equipamento), UPPER(atividade),
+                                      entrada, saida_almoco, retorno_almoco, saida_final, total_horas, data_apontamento
+                               FROM {{apontamentos}} {where}
+                               ORDER BY id DESC LIMIT ?''', params + [tamanho + 1],
+                            data, data, arquivo=data is not None)
+    proximo = rows[tamanho - 1][0] if len(rows) > tamanho else None
+    return [list(row) for row in rows[:tamanho]], proximo
+
+@escrita
+def add_apontamentos_batch(registros):
+    """Grava vários apontamentos (ex.: uma equipe inteira) com um executemany numa transação.
+
+    Cada registro segue a ordem de add_apontamento: (mat, nome, func, equip,
+    ativ, ent, s_alm, r_alm, s_fin, total, data); total=None é calculado a
+    partir dos horários. Retorna a quantidade gravada.
+    """
+    linhas = [_linha_apontamento(*r) for r in registros]
+    if not linhas:
+        return 0
+    with transacao() as conn:
+        _verificar_meses_ativos(conn, [linha[5] for linha in linhas])
+        colaboradores, equipamentos, funcoes = {}, {}, {}
+        gravar = []
+        for mat, nome, func, equip, ativ, data, e, sa, ra, sf, trabalhados in linhas:
+            if mat not in colaboradores:
+                colaboradores[mat] = _id_colaborador(conn, mat, nome, func)
+            if equip not in equipamentos:
+                equipamentos[equip] = _id_referencia(conn, "ref_equipamentos", "tag", equip)
+            if func not in funcoes:
+                funcoes[func] = _id_referencia(conn, "ref_funcoes", "nome", func)
+            gravar.append((data, colaboradores[mat], equipamentos[equip], ativ, e, sa, ra, sf, trabalhados,
+                           funcoes[func]))
+        conn.executemany('''INSERT INTO apontamentos_registros (data_apontamento, colaborador_id, equipamento_id, atividade,
+                                                                entrada_min, saida_almoco_min, retorno_almoco_min,
+                                                                saida_final_min, minutos_trabalhados, funcao_id)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', gravar)
+        _marcar_alteracao(conn, "apontamentos")
+    return len(linhas)
+
+@escrita
 def delete_apontamento_por_id(apontamento_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM apontamentos WHERE id = ?", (apontamento_id,))
-    conn.commit()
-    conn.close()
+    with transacao() as conn:
+        conn.execute("DELETE FROM apontamentos_registros WHERE id = ?", (apontamento_id,))
+        _marcar_alteracao(conn, "apontamentos")
     return True
 
+@escrita
+def delete_apontamentos_por_ids(ids):
+    """Remove vários apontamentos numa única transação."""
+    with transacao() as conn:
+        conn.executemany("DELETE FROM apontamentos_registros WHERE id = ?", [(int(i),) for i in ids])
+        _marcar_alteracao(conn, "apontamentos")
+    return True
+
+# --- HORAS APONTADAS (Dash Produtividade) ---
+# Somas feitas em SQL sobre minutos_trabalhados, direto em apontamentos_registros
+# (agrupando pelas chaves inteiras); 'mes' no formato 'AAAA-MM'.
+
+def _intervalo_mes(mes):
+    return f"{mes}-01", f"{mes}-31"
+
+@em_cache("apontamentos")
+def get_meses_apontamentos():
+    """Meses ('AAAA-MM') com apontamentos, do mais recente para o mais antigo (inclusive os arquivados)."""
+    with get_connection() as conn:
+        rows = conn.execute("SELECT DISTINCT substr(data_apontamento, 1, 7) FROM apontamentos_registros "
+                            "WHERE data_apontamento IS NOT NULL "
+                            "UNION SELECT mes FROM meses_arquivados WHERE apontamentos > 0 ORDER BY 1 DESC").fetchall()
+    return [row[0] for row in rows]
+
+@em_cache("apontamentos")
+def get_horas_por_dia(mes):
+    """[[data, horas], ...] do mês, em ordem de data."""
+    intervalo = _intervalo_mes(mes)
+    rows = _ler_com_arquivo('''SELECT data_apontamento, SUM(minutos_trabalhados) / 60.0 FROM {apontamentos_registros}
+                               WHERE data_apontamento BETWEEN ? AND ?
+                               GROUP BY data_apontamento ORDER BY data_apontamento''', intervalo, *intervalo)
+    return [list(row) for row in rows]
+
+# Início do período de cada data ('AAAA-MM-DD'): o próprio dia, a segunda-feira da semana ou o dia 1 do mês
+AGRUPAMENTOS_DATA = {
+    "D": "{coluna}",
+    "W": "date({coluna}, '-6 days', 'weekday 1')",
+    "M": "substr({coluna}, 1, 7) || '-01'",
+}
+
+@em_cache("apontamentos")
+def get_horas_por_periodo(data_ini, data_fim, agrupamento="D"):
+    """[[início do período, horas], ...] no intervalo, por dia ('D'), semana ('W') ou mês ('M')."""
+    periodo = AGRUPAMENTOS_DATA[agrupamento].format(coluna="data_apontamento")
+    data_ini, data_fim = _data_iso(data_ini), _data_iso(data_fim)
+    rows = _ler_com_arquivo(f'''SELECT {periodo}, SUM(minutos_trabalhados) / 60.0 FROM {{apontamentos_registros}}
+                                WHERE data_apontamento BETWEEN ? AND ? GROUP BY 1''',
+                            (data_ini, data_fim), data_ini, data_fim)
+    # Lido em partes (muitos meses arquivados), um período pode vir repetido: soma aqui
+    horas = {}
+    for periodo, total in rows:
+        if periodo is not None:
+            horas[periodo] = horas.get(periodo, 0.0) + (total or 0.0)
+    return [[p, horas[p]] for p in sorted(horas)]
+
+# Abreviação do cadastro (ou função); apontamentos sem cadastro ficam de fora
+_SQL_ABREVIACAO = "UPPER(COALESCE(NULLIF(f.abreviacao, ''), f.funcao))"
+
+@em_cache("apontamentos", "funcionarios")
+def get_horas_por_abreviacao(mes):
+    """[[abreviacao, horas], ...] do mês."""
+    intervalo = _intervalo_mes(mes)
+    rows = _ler_com_arquivo(f'''SELECT {_SQL_ABREVIACAO}, SUM(a.minutos_trabalhados) / 60.0
+                                FROM {{apontamentos_registros}} a
+                                JOIN ref_colaboradores c ON c.id = a.colaborador_id
+                                JOIN funcionarios f ON f.matricula = c.matricula
+                                WHERE a.data_apontamento BETWEEN ? AND ?
+                                GROUP BY 1 ORDER BY 1''', intervalo, *intervalo)
+    return [list(row) for row in rows]
+
+@em_cache("apontamentos", "funcionarios")
+def get_horas_por_equipamento(mes, abreviacao=None):
+    """[[equipamento, horas], ...] do mês, opcionalmente só de uma abreviação."""
+    sql = '''SELECT q.tag, SUM(a.minutos_trabalhados) / 60.0
+             FROM {apontamentos_registros} a
+             LEFT JOIN ref_equipamentos q ON q.id = a.equipamento_id
+             LEFT JOIN ref_colaboradores c ON c.id = a.colaborador_id
+             LEFT JOIN funcionarios f ON f.matricula = c.matricula
+             WHERE a.data_apontamento BETWEEN ? AND ?'''
+    params = list(_intervalo_mes(mes))
+    if abreviacao is not None:
+        sql += f" AND {_SQL_ABREVIACAO} = ?"
+        params.append(abreviacao)
+    rows = _ler_com_arquivo(sql + " GROUP BY a.equipamento_id ORDER BY 1", params, *_intervalo_mes(mes))
+    return [list(row) for row in rows]
+
+# Leituras para espelhos analíticos (analise.py): fatos com as chaves inteiras
+# e as tabelas pequenas para traduzir as chaves.
+
+def ler_fatos_apontamentos(depois_de_id=None):
+    """Linhas (id, data_apontamento, colaborador_id, equipamento_id, minutos_trabalhados).
+
+    Sem depois_de_id, todo o histórico (inclusive arquivado); com ele, só as
+    linhas do banco vivo com id maior (ids de apontamentos nunca são reaproveitados).
+    """
+    sql = ("SELECT id, data_apontamento, colaborador_id, equipamento_id, minutos_trabalhados "
+           "FROM {apontamentos_registros}")
+    if depois_de_id is None:
+        return _ler_com_arquivo(sql)
+    return _ler_com_arquivo(sql + " WHERE id > ?", (depois_de_id,), arquivo=False)
+
+def contar_apontamentos():
+    """Total de apontamentos, somando banco vivo e meses arquivados."""
+    with get_connection() as conn:
+        return conn.execute("SELECT (SELECT COUNT(*) FROM apontamentos_registros) + "
+                            "(SELECT COALESCE(SUM(apontamentos), 0) FROM meses_arquivados)").fetchone()[0]
+
+@em_cache("funcionarios")
+def get_siglas_colaboradores():
+    """[[colaborador_id, abreviação], ...] dos colaboradores do cadastro (regra de _SQL_ABREVIACAO)."""
+    with get_connection() as conn:
+        rows = conn.execute(f'''SELECT c.id, {_SQL_ABREVIACAO} FROM ref_colaboradores c
+                                JOIN funcionarios f ON f.matricula = c.matricula''').fetchall()
+    return [list(row) for row in rows]
+
+@em_cache("apontamentos", "equipamentos")
+def get_ref_equipamentos():
+    """[[equipamento_id, tag], ...]"""
+    with get_connection() as conn:
+        rows = conn.execute("SELECT id, tag FROM ref_equipamentos").fetchall()
+    return [list(row) for row in rows]
+
+def versoes_atuais(*tabelas):
+    """Versões atuais das tabelas na obra atual (mudam a cada escrita; ver CACHE DE LEITURAS)."""
+    return _banco().cache._versoes_atuais(tabelas)
+
 # --- FUNÇÕES DE EFETIVO DIÁRIO ---
 
+def _data_iso(valor):
+    """Normaliza uma data (date, datetime, Timestamp, datetime64 ou texto) para 'AAAA-MM-DD'."""
+    if hasattr(valor, "strftime"):
+        return valor.strftime("%Y-%m-%d")
+    return str(valor)[:10]
+
+def _atualizar_resumo_efetivo(conn, datas):
+    """Recalcula o resumo apenas das datas informadas (na transação corrente)."""
+    params = [(d,) for d in sorted(set(datas))]
+    conn.executemany("DELETE FROM efetivo_resumo WHERE data = ?", params)
+    conn.executemany(_SQL_RESUMO_EFETIVO.format(filtro="AND e.data = ?"), params)
+
+def _atualizar_resumo_da_matricula(conn, mat):
+    # A abreviação do resumo vem do cadastro: ao mudar o cadastro, recalcula os dias do colaborador
+    datas = [row[0] for row in conn.execute("SELECT DISTINCT data FROM efetivo_diario WHERE matricula = ?", (mat,))]
+    _atualizar_resumo_efetivo(conn, datas)
+
+def _linhas_efetivo_df(df):
+    """DataFrame com as colunas do upload -> lista de tuplas prontas para o INSERT."""
+    # Mapear colunas do DataFrame para as colunas da tabela (usando nomes sem acentos conforme solicitado)
+    # DataFrame esperado: Data, Matricula, Nome, Funcao, Status, Situacao
+    df_to_db = df[['Data', 'Matricula', 'Nome', 'Funcao', 'Status', 'Situacao']].copy()
+    df_to_db.columns = ['data', 'matricula', 'nome', 'funcao', 'status', 'situacao']
+    df_to_db['data'] = df_to_db['data'].map(_data_iso)
+    df_to_db = df_to_db.astype(object).where(df_to_db.notna(), None)
+    return list(df_to_db.itertuples(index=False, name=None))
+
+def _criar_staging_efetivo(conn, tabela="efetivo_staging"):
+    conn.execute(f'''CREATE TEMP TABLE IF NOT EXISTS {tabela} (
+                         data TEXT, matricula TEXT, nome TEXT, funcao TEXT, status INTEGER, situacao TEXT)''')
+
+def _gravar_efetivo_da_staging(conn, tabela="efetivo_staging"):
+    """Grava a tabela temporária em efetivo_registros, criando as referências que faltarem (na transação corrente)."""
+    conn.execute(f"INSERT OR IGNORE INTO ref_funcoes (nome) SELECT DISTINCT funcao FROM temp.{tabela} WHERE funcao <> ''")
+    conn.execute(f"INSERT OR IGNORE INTO ref_situacoes (nome) SELECT DISTINCT situacao FROM temp.{tabela} WHERE situacao <> ''")
+    # Um colaborador por matrícula; fora do cadastro, nome e função seguem o dia mais recente do lote
+    recentes = f'''SELECT o.matricula, o.nome, rf.id AS funcao_id
+                    FROM (SELECT matricula, nome, funcao, MAX(data) FROM temp.{tabela}
+                          WHERE matricula <> '' GROUP BY matricula) o
+                    LEFT JOIN ref_funcoes rf ON rf.nome = o.funcao'''
+    # O nome aparece em todos os dias da matrícula (inclusive nos apontamentos); a função, não
+    renomeados = conn.execute(f'''SELECT 1 FROM ({recentes}) o
+                                  JOIN ref_colaboradores c ON c.matricula = o.matricula
+                                  WHERE o.matricula NOT IN (SELECT matricula FROM funcionarios)
+                                    AND c.nome IS NOT o.nome LIMIT 1''').fetchone()
+    conn.execute(f'''INSERT INTO ref_colaboradores (matricula, nome, funcao_id)
+                     SELECT matricula, nome, funcao_id FROM ({recentes})
+                     WHERE true
+                     ON CONFLICT (matricula) DO UPDATE SET nome = excluded.nome, funcao_id = excluded.funcao_id
+                     WHERE matricula NOT IN (SELECT matricula FROM funcionarios)''')
+    conn.execute(f'''INSERT INTO efetivo_registros (data, colaborador_id, status, situacao_id, funcao_id)
+                     SELECT s.data, c.id, s.status, si.id, rf.id FROM temp.{tabela} s
+                     LEFT JOIN ref_colaboradores c ON c.matricula = s.matricula
+                     LEFT JOIN ref_situacoes si ON si.nome = s.situacao
+                     LEFT JOIN ref_funcoes rf ON rf.nome = s.funcao''')
+    if renomeados:
+        _marcar_alteracao(conn, "apontamentos")
+
+@escrita
 def add_efetivo_diario_batch(df):
-    """Insere múltiplos registros de efetivo diário de uma vez."""
+    """Insere múltiplos registros de efetivo diário de uma vez.
+
+    Erros (inclusive lock de outro processo, após as novas tentativas da fila
+    de escrita) sobem para quem chamou: nada é gravado pela metade.
+    """
+    linhas = _linhas_efetivo_df(df)
+    with transacao() as conn:
+        _verificar_meses_ativos(conn, [linha[0] for linha in linhas])
+        _criar_staging_efetivo(conn)
+        conn.execute("DELETE FROM temp.efetivo_staging")
+        conn.executemany("INSERT INTO temp.efetivo_staging VALUES (?, ?, ?, ?, ?, ?)", linhas)
+        _gravar_efetivo_da_staging(conn)
+        conn.execute("DELETE FROM temp.efetivo_staging")
+        _atualizar_resumo_efetivo(conn, [linha[0] for linha in linhas])
+        _marcar_alteracao(conn, "efetivo_diario", "efetivo_resumo")
+    return True
+
+# Cada carga de replace_efetivo_for_dates usa a sua tabela temporária, na
+# conexão da escritora, para que duas importações simultâneas não se misturem
+_cargas_efetivo = itertools.count(1)
+
+@escrita
+def _carregar_staging(tabela, lote):
+    with transacao() as conn:
+        _criar_staging_efetivo(conn, tabela)
+        conn.executemany(f"INSERT INTO temp.{tabela} VALUES (?, ?, ?, ?, ?, ?)", lote)
+
+@escrita
+def _aplicar_staging(tabela):
+    with transacao() as conn:
+        _criar_staging_efetivo(conn, tabela)
+        datas = [row[0] for row in conn.execute(f"SELECT DISTINCT data FROM temp.{tabela}")]
+        _verificar_meses_ativos(conn, datas)
+        conn.execute(f"DELETE FROM efetivo_registros WHERE data IN (SELECT data FROM temp.{tabela})")
+        _gravar_efetivo_da_staging(conn, tabela)
+        _atualizar_resumo_efetivo(conn, datas)
+        _marcar_alteracao(conn, "efetivo_diario", "efetivo_resumo")
+    return sorted(datas)
+
+@escrita
+def _descartar_staging(tabela):
+    with transacao() as conn:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{tabela}")
+
+def replace_efetivo_for_dates(linhas, progresso=None):
+    """Substitui o efetivo de todos os dias presentes em `linhas`, numa única transação.
+
+    `linhas` é um DataFrame com as colunas do upload ou um iterável de lotes de
+    tuplas (data, matricula, nome, funcao, status, situacao). Os lotes vão para
+    uma tabela temporária; depois um único DELETE apaga os dias afetados e um
+    INSERT ... SELECT grava o conteúdo novo. Se algo falhar, nada muda.
+    progresso(n) é chamado a cada lote carregado com o total acumulado.
+    Retorna (registros inseridos, datas substituídas).
+    """
+    if hasattr(linhas, "columns"):
+        linhas = [_linhas_efetivo_df(linhas)]
+    # A leitura do arquivo acontece aqui, na thread de quem chamou; a escritora
+    # só recebe um lote pronto por vez e não fica presa esperando o arquivo.
+    tabela = f"efetivo_staging_{next(_cargas_efetivo)}"
     try:
-        conn = get_connection()
-        # Mapear colunas do DataFrame para as colunas da tabela (usando nomes sem acentos conforme solicitado)
-        # DataFrame esperado: Data, Matricula, Nome, Funcao, Status, Situacao
-        df_to_db = df[['Data', 'Matricula', 'Nome', 'Funcao', 'Status', 'Situacao']].copy()
-        df_to_db.columns = ['data', 'matricula', 'nome', 'funcao', 'status', 'situacao']
-        df_to_db.to_sql('efetivo_diario', conn, if_exists='append', index=False)
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Erro ao inserir batch: {e}")
-        return False
+        carregadas = 0
+        for lote in linhas:
+            _carregar_staging(tabela, lote)
+            carregadas += len(lote)
+            if progresso:
+                progresso(carregadas)
+        datas = _aplicar_staging(tabela)
+    finally:
+        _descartar_staging(tabela)
+    return carregadas, datas
 
+@em_cache("efetivo_diario")
 def get_efetivo_diario():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT data, matricula, nome, funcao, status, situacao FROM efetivo_diario")
-    rows = cursor.fetchall()
-    conn.close()
+    rows = _ler_com_arquivo("SELECT data, matricula, nome, funcao, status, situacao FROM {efetivo_diario}")
     return [list(row) for row in rows]
 
+@escrita
 def delete_efetivo_por_data(data):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM efetivo_diario WHERE data = ?", (str(data),))
-    conn.commit()
-    conn.close()
+    with transacao() as conn:
+        _verificar_meses_ativos(conn, [_data_iso(data)])
+        conn.execute("DELETE FROM efetivo_registros WHERE data = ?", (_data_iso(data),))
+        conn.execute("DELETE FROM efetivo_resumo WHERE data = ?", (_data_iso(data),))
+        _marcar_alteracao(conn, "efetivo_diario", "efetivo_resumo")
     return True
+
+# --- VALIDAÇÃO DO EFETIVO ---
+# Cada lote do upload é conferido de uma vez, com operações do pandas sobre as
+# colunas e uma única consulta ao cadastro, antes de ir para a fila de escrita.
+# Linhas com problema ficam de fora e vão para o relatório de rejeitadas; o
+# resto do lote é gravado normalmente.
+
+# Códigos de status das planilhas (1 = PRESENTE ... 13 = DESMOBILIZADO)
+STATUS_EFETIVO = range(1, 14)
+
+_CAMPOS_EFETIVO = ['data', 'matricula', 'nome', 'funcao', 'status', 'situacao']
+
+def _chave_situacao(serie):
+    # Grafia reduzida ao essencial: sem acentos, maiúsculas, só letras e números
+    return (serie.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+            .str.upper().str.replace(r"[^A-Z0-9]", "", regex=True))
+
+def _por_valor_distinto(serie, converter):
+    # As colunas do upload repetem poucos valores (dias, matrículas, situações):
+    # converte cada valor distinto uma vez e espalha o resultado pelas linhas
+    import pandas as pd
+
+    codigos, distintos = pd.factorize(serie)
+    convertidos = converter(pd.Series(distintos, dtype="string").str.strip().replace("", pd.NA))
+    return pd.Series(convertidos.array.take(codigos, allow_fill=True), index=serie.index)
+
+def _datas_upload(texto):
+    # AAAA-MM-DD ou dd/mm/aaaa -> AAAA-MM-DD; datas ilegíveis ficam vazias
+    import pandas as pd
+
+    texto = texto.str[:10]
+    datas = pd.to_datetime(texto, format="%Y-%m-%d", errors="coerce")
+    datas = datas.fillna(pd.to_datetime(texto, format="%d/%m/%Y", errors="coerce"))
+    return datas.dt.strftime("%Y-%m-%d").astype("string")
+
+def validar_efetivo(linhas, exigir_cadastro=True, grafias=None):
+    """Confere um lote de tuplas (data, matricula, nome, funcao, status, situacao).
+
+    Rejeita linhas com data ilegível (aceita AAAA-MM-DD e dd/mm/aaaa), sem
+    matrícula, com matrícula fora do cadastro de funcionários (se
+    exigir_cadastro) ou com status fora de STATUS_EFETIVO. Variações de grafia
+    de uma situação (acentos, caixa, espaços, pontuação) passam para a grafia
+    já gravada ou, se a situação é nova, para a mais frequente no lote.
+    Numa importação em vários lotes, passe o mesmo dict em `grafias` a cada
+    chamada: ele guarda a grafia escolhida por chave e os lotes seguintes a
+    reaproveitam, mesmo antes de o primeiro lote ser gravado. Retorna (linhas aceitas, rejeitadas, situações corrigidas), onde
+    rejeitadas é uma lista de dicts com os campos da linha e o motivo, e as
+    correções são {grafia recebida: grafia gravada}.
+    """
+    import pandas as pd
+
+    linhas = list(linhas)
+    if not linhas:
+        return [], [], {}
+    df = pd.DataFrame(linhas, columns=_CAMPOS_EFETIVO)
+
+    datas = _por_valor_distinto(df["data"], _datas_upload)
+    matriculas = _por_valor_distinto(df["matricula"], lambda m: m)
+    situacoes = _por_valor_distinto(df["situacao"], lambda s: s)
+    status = pd.to_numeric(df["status"], errors="coerce")
+    status_valido = (status % 1 == 0) & status.between(STATUS_EFETIVO.start, STATUS_EFETIVO.stop - 1)
+
+    fora_do_cadastro = set()
+    if exigir_cadastro:
+        # Anti-join das matrículas distintas do lote contra o cadastro, numa consulta só
+        unicas = json.dumps(matriculas.dropna().unique().tolist())
+        with get_connection() as conn:
+            fora_do_cadastro = {row[0] for row in conn.execute(
+                "SELECT value FROM json_each(?) WHERE value NOT IN (SELECT matricula FROM funcionarios)",
+                (unicas,))}
+
+    motivo = pd.Series(pd.NA, index=df.index, dtype="string")
+    for problema, descricao in [(datas.isna(), "data inválida"),
+                                (matriculas.isna(), "matrícula vazia"),
+                                (matriculas.isin(fora_do_cadastro), "matrícula fora do cadastro"),
+                                (~status_valido, "status inválido")]:
+        motivo = motivo.mask(problema & motivo.isna(), descricao)
+    rejeitada = motivo.notna()
+
+    # Grafia oficial por chave: a já gravada; senão a escolhida num lote anterior
+    # da mesma importação; senão a mais usada neste lote
+    grafias = {} if grafias is None else grafias
+    contagem = situacoes[~rejeitada].value_counts().rename_axis("situacao").reset_index()
+    contagem["chave"] = _chave_situacao(contagem["situacao"])
+    for chave, situacao in contagem.drop_duplicates("chave")[["chave", "situacao"]].itertuples(index=False):
+        grafias.setdefault(chave, situacao)
+    with get_connection() as conn:
+        gravadas = pd.Series([row[0] for row in conn.execute("SELECT nome FROM ref_situacoes ORDER BY id DESC")],
+                             dtype="string")
+    grafias.update(zip(_chave_situacao(gravadas), gravadas))
+    canonicas = _por_valor_distinto(situacoes, lambda s: _chave_situacao(s).map(grafias).astype("string").fillna(s))
+    corrigir = ~rejeitada & situacoes.notna() & (canonicas != situacoes)
+    corrigidas = dict(pd.DataFrame({"de": situacoes, "para": canonicas})[corrigir].drop_duplicates("de")
+                      .itertuples(index=False))
+
+    aceitas = pd.DataFrame({"data": datas, "matricula": matriculas,
+                            "nome": df["nome"], "funcao": df["funcao"],
+                            "status": status.where(status_valido).astype("Int64"), "situacao": canonicas})[~rejeitada]
+    aceitas = aceitas.astype(object).where(aceitas.notna(), None)
+    # O relatório mostra a linha como veio da planilha
+    rejeitadas = [dict(zip(_CAMPOS_EFETIVO, linhas[i]), motivo=m)
+                  for i, m in zip(motivo.index[rejeitada], motivo[rejeitada])]
+    return list(aceitas.itertuples(index=False, name=None)), rejeitadas, corrigidas
+
+def _validar_lotes(lotes, relatorio, exigir_cadastro=True):
+    # Entre a leitura e a gravação: acumula as rejeições no relatório
+    relatorio.setdefault("rejeitadas", 0)
+    relatorio.setdefault("rejeicoes", [])
+    relatorio.setdefault("situacoes_corrigidas", {})
+    grafias = {}  # compartilhado pelos lotes: uma grafia por situação na importação inteira
+    for lote in lotes:
+        aceitas, rejeitadas, corrigidas = validar_efetivo(lote, exigir_cadastro, grafias)
+        relatorio["rejeitadas"] += len(rejeitadas)
+        relatorio["rejeicoes"].extend(rejeitadas)
+        relatorio["situacoes_corrigidas"].update(corrigidas)
+        if aceitas:
+            yield aceitas
+
+# --- IMPORTAÇÃO DA PLANILHA DE EFETIVO ---
+# A planilha é lida linha a linha pelo openpyxl em modo somente leitura e
+# carregada em lotes, então o uso de memória não cresce com o tamanho do arquivo.
+
+COLUNAS_EFETIVO = ['Data', 'Matricula', 'Nome', 'Funcao', 'Status', 'Situacao']
+ABA_EFETIVO = 'Efetivo'
+TAMANHO_LOTE_IMPORTACAO = 5000
+
+def _valor_planilha(valor):
+    # Números inteiros chegam como float (10680.0) em algumas planilhas
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, str):
+        valor = valor.strip()
+        return valor or None
+    return valor
+
+def ler_efetivo_excel(arquivo, tamanho_lote=TAMANHO_LOTE_IMPORTACAO, relatorio=None):
+    """Lê a aba 'Efetivo' e gera lotes de tuplas (data, matricula, nome, funcao, status, situacao).
+
+    Linhas em branco são ignoradas; as demais saem como estão na planilha e
+    são conferidas depois, por validar_efetivo. relatorio['linhas'] conta as
+    linhas lidas e relatorio['total_estimado'] recebe o número de linhas
+    informado pela planilha (pode ser None).
+    """
+    from openpyxl import load_workbook
+
+    relatorio = relatorio if relatorio is not None else {}
+    relatorio.setdefault("linhas", 0)
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        if ABA_EFETIVO not in wb.sheetnames:
+            raise ValueError(f"O arquivo deve conter a aba '{ABA_EFETIVO}'")
+        ws = wb[ABA_EFETIVO]
+        relatorio["total_estimado"] = ws.max_row - 1 if ws.max_row else None
+        linhas = ws.iter_rows(values_only=True)
+        cabecalho = [str(c).strip() if c is not None else "" for c in next(linhas, ())]
+        faltando = [c for c in COLUNAS_EFETIVO if c not in cabecalho]
+        if faltando:
+            raise ValueError(f"O arquivo deve conter as colunas: {', '.join(COLUNAS_EFETIVO)}")
+        indices = [cabecalho.index(c) for c in COLUNAS_EFETIVO]
+
+        lote = []
+        for valores in linhas:
+            linha = [_valor_planilha(valores[i]) if i < len(valores) else None for i in indices]
+            if all(v is None for v in linha):
+                continue
+            relatorio["linhas"] += 1
+            linha[0] = _data_iso(linha[0]) if linha[0] is not None else None
+            linha[1] = str(linha[1]) if linha[1] is not None else None
+            lote.append(tuple(linha))
+            if len(lote) >= tamanho_lote:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+    finally:
+        wb.close()
+
+def importar_efetivo_excel(arquivo, tamanho_lote=TAMANHO_LOTE_IMPORTACAO, progresso=None, exigir_cadastro=True):
+    """Importa a planilha de efetivo em lotes via replace_efetivo_for_dates.
+
+    Cada lote passa por validar_efetivo; os dias presentes nas linhas aceitas
+    substituem o que já estava gravado para esses dias, de forma atômica.
+    progresso(relatorio) é chamado após cada lote. Retorna o relatório com
+    linhas lidas, inseridas, rejeitadas (e as linhas em 'rejeicoes'),
+    situações corrigidas e as datas importadas.
+    """
+    relatorio = {"linhas": 0, "inseridas": 0, "rejeitadas": 0, "rejeicoes": [], "situacoes_corrigidas": {},
+                 "datas": []}
+
+    def lote_carregado(carregadas):
+        relatorio["inseridas"] = carregadas
+        if progresso:
+            progresso(relatorio)
+
+    lotes = _validar_lotes(ler_efetivo_excel(arquivo, tamanho_lote, relatorio), relatorio, exigir_cadastro)
+    inseridas, datas = replace_efetivo_for_dates(lotes, progresso=lote_carregado)
+    relatorio["inseridas"] = inseridas
+    relatorio["datas"] = datas
+    return relatorio
+
+# --- IMPORTAÇÃO EM LOTE (linha de comando) ---
+# Uma pasta inteira de planilhas: a leitura (openpyxl, o trecho lento) roda em
+# paralelo num pool de processos; as linhas voltam para este processo, passam
+# por validar_efetivo e cada arquivo é gravado, na ordem do nome, por
+# replace_efetivo_for_dates através da fila de escrita. Um arquivo com
+# problema não impede os demais.
+
+def _ler_arquivo_efetivo(caminho):
+    # Roda num processo do pool: só lê a planilha, não abre o banco
+    relatorio = {"linhas": 0}
+    inicio = time.perf_counter()
+    try:
+        linhas = [linha for lote in ler_efetivo_excel(caminho, relatorio=relatorio) for linha in lote]
+        erro = None
+    except Exception as e:
+        linhas, erro = None, f"{type(e).__name__}: {e}"
+    return linhas, relatorio, erro, (time.perf_counter() - inicio) * 1000
+
+def planilhas_da_pasta(pasta, recursivo=False):
+    """Arquivos .xlsx da pasta em ordem de nome (ignora os temporários '~$' do Excel)."""
+    padrao = os.path.join(pasta, "**", "*.xlsx") if recursivo else os.path.join(pasta, "*.xlsx")
+    return sorted(p for p in glob.glob(padrao, recursive=recursivo) if not os.path.basename(p).startswith("~$"))
+
+def importar_pasta_efetivo(arquivos, processos=None, tamanho_lote=TAMANHO_LOTE_IMPORTACAO, progresso=None,
+                           exigir_cadastro=True):
+    """Importa várias planilhas de efetivo, lidas em paralelo e gravadas uma a uma.
+
+    Os dias de cada arquivo substituem os já gravados (como no upload); se dois
+    arquivos trazem o mesmo dia, vale o último na ordem da lista.
+    progresso(item) é chamado ao fim de cada arquivo. Retorna um item por
+    arquivo: arquivo, linhas, inseridas, rejeitadas, rejeicoes,
+    situacoes_corrigidas, datas, leitura_ms, gravacao_ms e erro (None quando
+    deu certo).
+    """
+    resultados = []
+    if not arquivos:
+        return resultados
+    processos = min(processos or os.cpu_count() or 1, len(arquivos))
+    if processos == 1:
+        # Sem ganho em paralelo: lê aqui mesmo e evita subir um processo
+        executor = nullcontext()
+        leituras = map(_ler_arquivo_efetivo, arquivos)
+    else:
+        # spawn: os processos filhos não herdam a thread escritora nem conexões abertas
+        executor = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+        leituras = executor.map(_ler_arquivo_efetivo, arquivos)
+    with executor:
+        for caminho, (linhas, relatorio, erro, leitura_ms) in zip(arquivos, leituras):
+            item = {"arquivo": caminho, "linhas": relatorio["linhas"], "inseridas": 0, "rejeitadas": 0,
+                    "rejeicoes": [], "situacoes_corrigidas": {}, "datas": [], "leitura_ms": round(leitura_ms, 1),
+                    "gravacao_ms": 0.0, "erro": erro}
+            if erro is None:
+                inicio = time.perf_counter()
+                try:
+                    lotes = _validar_lotes([linhas], item, exigir_cadastro)
+                    item["inseridas"], item["datas"] = replace_efetivo_for_dates(
+                        lote[i:i + tamanho_lote] for lote in lotes for i in range(0, len(lote), tamanho_lote))
+                except Exception as e:
+                    item["erro"] = f"{type(e).__name__}: {e}"
+                item["gravacao_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+            resultados.append(item)
+            if progresso:
+                progresso(item)
+    return resultados
+
+# --- RESUMO DIÁRIO DO EFETIVO ---
+# Mantido por add_efetivo_diario_batch e delete_efetivo_por_data; os gráficos
+# da aba Efetivo Diário leem daqui em vez de agregar o efetivo_diario bruto.
+
+# O resumo dos meses arquivados fica como estava no arquivamento: reconstruir
+# e verificar tratam só os dias que ainda estão no banco vivo.
+def _fora_do_arquivo(coluna="data"):
+    return f"substr({coluna}, 1, 7) NOT IN (SELECT mes FROM meses_arquivados)"
+
+@escrita
+def reconstruir_resumo_efetivo():
+    """Recalcula o resumo dos meses ativos a partir do efetivo_diario. Retorna o nº de linhas do resumo."""
+    with transacao() as conn:
+        conn.execute(f"DELETE FROM efetivo_resumo WHERE {_fora_do_arquivo()}")
+        conn.execute(_SQL_RESUMO_EFETIVO.format(filtro=""))
+        _marcar_alteracao(conn, "efetivo_resumo")
+        return conn.execute("SELECT COUNT(*) FROM efetivo_resumo").fetchone()[0]
+
+def verificar_resumo_efetivo():
+    """Compara o resumo dos meses ativos com o efetivo_diario bruto. Retorna as divergências como
+    [data, situacao, abreviacao, presentes_resumo, ausentes_resumo, presentes_bruto, ausentes_bruto]."""
+    with get_connection() as conn:
+        # Só leitura: BEGIN DEFERRED dá um retrato consistente do banco (WAL) sem
+        # o lock de escrita, que é da fila de escrita. A tabela temporária do
+        # cálculo "bruto" fica no banco temp da conexão e é desfeita no fim.
+        propria = not conn.in_transaction
+        if propria:
+            conn.execute("BEGIN DEFERRED")
+        try:
+            conn.execute("CREATE TEMP TABLE efetivo_resumo_bruto AS SELECT * FROM efetivo_resumo WHERE 0")
+            try:
+                conn.execute(_SQL_RESUMO_EFETIVO.replace("INSERT INTO efetivo_resumo ", "INSERT INTO efetivo_resumo_bruto ")
+                             .format(filtro=""))
+                rows = conn.execute(f'''
+                    SELECT r.data, r.situacao, r.abreviacao, r.presentes, r.ausentes, b.presentes, b.ausentes
+                    FROM efetivo_resumo r
+                    LEFT JOIN efetivo_resumo_bruto b USING (data, situacao, abreviacao)
+                    WHERE (b.data IS NULL OR r.presentes != b.presentes OR r.ausentes != b.ausentes)
+                      AND {_fora_do_arquivo("r.data")}
+                    UNION ALL
+                    SELECT b.data, b.situacao, b.abreviacao, NULL, NULL, b.presentes, b.ausentes
+                    FROM efetivo_resumo_bruto b
+                    LEFT JOIN efetivo_resumo r USING (data, situacao, abreviacao)
+                    WHERE r.data IS NULL
+                    ORDER BY 1, 2, 3
+                ''').fetchall()
+            finally:
+                conn.execute("DROP TABLE temp.efetivo_resumo_bruto")
+        finally:
+            if propria:
+                conn.rollback()
+    return [list(row) for row in rows]
+
+@em_cache("efetivo_resumo")
+def get_efetivo_periodo():
+    """Retorna (primeira_data, ultima_data) do efetivo, ou (None, None) se vazio."""
+    with get_connection() as conn:
+        return conn.execute("SELECT MIN(data), MAX(data) FROM efetivo_resumo").fetchone()
+
+@em_cache("efetivo_resumo")
+def get_efetivo_por_dia(data_ini, data_fim, presentes=True):
+    """Total de presentes (ou de ausentes) por dia no intervalo [data_ini, data_fim]."""
+    coluna = "presentes" if presentes else "ausentes"
+    with get_connection() as conn:
+        rows = conn.execute(f'''SELECT data, SUM({coluna}) FROM efetivo_resumo
+                                WHERE data BETWEEN ? AND ?
+                                GROUP BY data HAVING SUM({coluna}) > 0 ORDER BY data''',
+                            (_data_iso(data_ini), _data_iso(data_fim))).fetchall()
+    return [list(row) for row in rows]
+
+@em_cache("efetivo_resumo")
+def get_efetivo_por_periodo(data_ini, data_fim, agrupamento="D", presentes=True):
+    """Média diária de presentes (ou ausentes) por dia ('D'), semana ('W') ou mês ('M') no intervalo.
+    Só contam os dias com algum registro; com 'D' é o mesmo que get_efetivo_por_dia."""
+    if agrupamento == "D":
+        return get_efetivo_por_dia(data_ini, data_fim, presentes)
+    coluna = "presentes" if presentes else "ausentes"
+    periodo = AGRUPAMENTOS_DATA[agrupamento].format(coluna="data")
+    with get_connection() as conn:
+        rows = conn.execute(f'''SELECT {periodo}, AVG(total) FROM (
+                                    SELECT data, SUM({coluna}) AS total FROM efetivo_resumo
+                                    WHERE data BETWEEN ? AND ?
+                                    GROUP BY data HAVING SUM({coluna}) > 0)
+                                GROUP BY 1 ORDER BY 1''',
+                            (_data_iso(data_ini), _data_iso(data_fim))).fetchall()
+    return [list(row) for row in rows]
+
+@em_cache("efetivo_resumo")
+def get_efetivo_situacoes_dia(data=None):
+    """Ausentes (status diferente de 1) por situação em um dia, por padrão o
+    último dia carregado. Retorna (data, [[situacao, total], ...])."""
+    with get_connection() as conn:
+        if data is None:
+            data = conn.execute("SELECT MAX(data) FROM efetivo_resumo").fetchone()[0]
+            if data is None:
+                return None, []
+        rows = conn.execute('''SELECT situacao, SUM(ausentes) FROM efetivo_resumo
+                               WHERE data = ?
+                               GROUP BY situacao HAVING SUM(ausentes) > 0''',
+                            (_data_iso(data),)).fetchall()
+    return data, [list(row) for row in rows]
+
+@em_cache("efetivo_diario")
+def get_efetivo_detalhe(data, situacao):
+    """Colaboradores (matricula, nome, funcao) de um dia em uma situação."""
+    rows = _ler_com_arquivo('''SELECT matricula, nome, funcao FROM {efetivo_diario}
+                               WHERE data = ? AND situacao = ? ORDER BY nome''',
+                            (_data_iso(data), situacao), data, data)
+    return [list(row) for row in rows]
+
+# --- ARQUIVO DE MESES FECHADOS ---
+# Meses fechados do efetivo e dos apontamentos podem sair do banco vivo para
+# um arquivo SQLite por mês, em <banco>_arquivo/AAAA-MM.db, com as mesmas
+# tabelas de fatos (só as chaves inteiras). O resumo diário e as tabelas de
+# referência continuam no banco vivo, então os gráficos do efetivo não mudam.
+# As leituras com intervalo de datas só anexam (ATTACH) os arquivos dos meses
+# que o intervalo alcança; sem meses arquivados no caminho, nada muda no custo.
+# Um mês arquivado é somente leitura: para alterá-lo, use desarquivar_mes.
+# Arquivar e desarquivar passam pela fila de escrita, como as demais escritas.
+
+# Meses mantidos no banco vivo por arquivar_meses_fechados (o mês corrente conta)
+MESES_ATIVOS = int(os.environ.get("SANTIN_MESES_ATIVOS", "3"))
+# O SQLite anexa no máximo 10 bancos por conexão
+LIMITE_ANEXOS = 9
+
+def pasta_arquivo(caminho=None):
+    """Pasta dos arquivos de meses fechados do banco (padrão: o da obra atual)."""
+    return os.path.splitext(caminho or _banco().caminho)[0] + "_arquivo"
+
+def _arquivo_mes(mes, caminho=None):
+    return os.path.join(pasta_arquivo(caminho), f"{mes}.db")
+
+@em_cache("meses_arquivados")
+def get_meses_arquivados():
+    """[[mes, registros de efetivo, apontamentos, arquivado_em], ...] do mais antigo ao mais recente."""
+    with get_connection() as conn:
+        rows = conn.execute("SELECT mes, efetivo, apontamentos, arquivado_em FROM meses_arquivados ORDER BY mes").fetchall()
+    return [list(row) for row in rows]
+
+def _meses_no_intervalo(data_ini=None, data_fim=None):
+    ini = _data_iso(data_ini)[:7] if data_ini else ""
+    fim = _data_iso(data_fim)[:7] if data_fim else "9999-99"
+    return [m[0] for m in get_meses_arquivados() if ini <= m[0] <= fim]
+
+def _fontes(esquemas):
+    """Nomes usados no SQL das leituras ({efetivo_diario}, {apontamentos_registros}, ...)
+    para ler a união das tabelas de fatos nos esquemas informados."""
+    if esquemas == ["main"]:
+        return {"efetivo_registros": "efetivo_registros", "apontamentos_registros": "apontamentos_registros",
+                "efetivo_diario": "efetivo_diario", "apontamentos": "apontamentos"}
+    uniao_efetivo = "(" + " UNION ALL ".join(
+        f"SELECT {COLUNAS_EFETIVO_REGISTROS} FROM {e}.efetivo_registros" for e in esquemas) + ")"
+    uniao_apontamentos = "(" + " UNION ALL ".join(
+        f"SELECT {COLUNAS_APONTAMENTOS_REGISTROS} FROM {e}.apontamentos_registros" for e in esquemas) + ")"
+    return {"efetivo_registros": uniao_efetivo, "apontamentos_registros": uniao_apontamentos,
+            "efetivo_diario": f"({_sql_efetivo(uniao_efetivo)}) AS efetivo_diario",
+            "apontamentos": f"({_sql_apontamentos(uniao_apontamentos)}) AS apontamentos"}
+
+def _ler_com_arquivo(sql, params=(), data_ini=None, data_fim=None, arquivo=True):
+    """Executa uma leitura no banco vivo e nos meses arquivados do intervalo (None = sem limite).
+
+    No SQL, as tabelas de fatos e as views aparecem entre chaves
+    ({efetivo_diario}, {apontamentos_registros}, ...). Com mais de
+    LIMITE_ANEXOS meses no intervalo a leitura é feita em partes e as linhas
+    são concatenadas: agregações (GROUP BY) só devem ser pedidas para
+    intervalos curtos, como um mês. arquivo=False lê só o banco vivo.
+    """
+    meses = _meses_no_intervalo(data_ini, data_fim) if arquivo else []
+    if not meses:
+        with get_connection() as conn:
+            return conn.execute(sql.format(**_fontes(["main"])), params).fetchall()
+
+    banco = _banco()
+    # Conexão própria: ATTACH não pode acontecer dentro de uma transação e não
+    # deve sobrar anexado numa conexão do pool
+    conn = banco.pool._nova_conexao()
+    try:
+        rows = []
+        for inicio in range(0, len(meses), LIMITE_ANEXOS):
+            grupo = meses[inicio:inicio + LIMITE_ANEXOS]
+            anexos = []
+            try:
+                for mes in grupo:
+                    arquivo = _arquivo_mes(mes, banco.caminho)
+                    if not os.path.exists(arquivo):
+                        raise FileNotFoundError(f"Arquivo do mês {mes} não encontrado: {arquivo}")
+                    anexos.append(f"arq_{len(anexos)}")
+                    conn.execute(f"ATTACH DATABASE ? AS {anexos[-1]}", (arquivo,))
+                esquemas = (["main"] if inicio == 0 else []) + anexos
+                rows += conn.execute(sql.format(**_fontes(esquemas)), params).fetchall()
+            finally:
+                for anexo in anexos:
+                    conn.execute(f"DETACH DATABASE {anexo}")
+        return rows
+    finally:
+        conn.close()
+
+def _verificar_meses_ativos(conn, datas):
+    """Recusa (ValueError) escrita em dias de meses arquivados."""
+    arquivados = {row[0] for row in conn.execute("SELECT mes FROM meses_arquivados")}
+    if not arquivados:
+        return
+    bloqueados = sorted({str(d)[:7] for d in datas if d} & arquivados)
+    if bloqueados:
+        raise ValueError(f"Mês arquivado ({', '.join(bloqueados)}): desarquive antes de alterar")
+
+def _contagem_mes(conn, esquema, mes):
+    # Quantidade e soma dos ids: muda se qualquer linha do mês for gravada ou apagada no meio do arquivamento
+    inicio, fim = _intervalo_mes(mes)
+    efetivo = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(id), 0) FROM {esquema}.efetivo_registros "
+                           "WHERE data BETWEEN ? AND ?", (inicio, fim)).fetchone()
+    apontamentos = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(id), 0) FROM {esquema}.apontamentos_registros "
+                                "WHERE data_apontamento BETWEEN ? AND ?", (inicio, fim)).fetchone()
+    return tuple(efetivo), tuple(apontamentos)
+
+@escrita
+def _remover_mes_do_banco_vivo(mes, contagem):
+    inicio, fim = _intervalo_mes(mes)
+    with transacao() as conn:
+        if _contagem_mes(conn, "main", mes) != contagem:
+            raise RuntimeError(f"O mês {mes} foi alterado durante o arquivamento; tente de novo")
+        conn.execute("DELETE FROM efetivo_registros WHERE data BETWEEN ? AND ?", (inicio, fim))
+        conn.execute("DELETE FROM apontamentos_registros WHERE data_apontamento BETWEEN ? AND ?", (inicio, fim))
+        conn.execute("INSERT INTO meses_arquivados VALUES (?, ?, ?, ?)",
+                     (mes, contagem[0][0], contagem[1][0], datetime.now().isoformat(timespec="seconds")))
+        # O resumo diário do mês fica no banco vivo
+        _marcar_alteracao(conn, "efetivo_diario", "apontamentos", "meses_arquivados")
+
+def _mes_arquivado(mes):
+    # Direto no banco, não no cache: na escritora, enxerga também o que as
+    # tarefas anteriores do mesmo commit gravaram
+    with get_connection() as conn:
+        return conn.execute("SELECT 1 FROM meses_arquivados WHERE mes = ?", (mes,)).fetchone() is not None
+
+@escrita
+def arquivar_mes(mes):
+    """Move o efetivo e os apontamentos de um mês fechado ('AAAA-MM') para o arquivo do mês.
+
+    O arquivo é gravado e conferido antes de as linhas saírem do banco vivo.
+    Roda na escritora: arquivamentos e desarquivamentos simultâneos do mesmo
+    mês não disputam o arquivo. Retorna (registros de efetivo, apontamentos) arquivados.
+    """
+    if not re.match(r"^\d{4}-\d{2}$", mes or ""):
+        raise ValueError("Mês deve estar no formato AAAA-MM")
+    if mes >= datetime.now().strftime("%Y-%m"):
+        raise ValueError(f"O mês {mes} ainda não está fechado")
+    if _mes_arquivado(mes):
+        raise ValueError(f"O mês {mes} já está arquivado")
+
+    banco = _banco()
+    arquivo = _arquivo_mes(mes, banco.caminho)
+    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+    for sufixo in ("", "-journal"):
+        if os.path.exists(arquivo + sufixo):
+            os.remove(arquivo + sufixo)  # sobra de um arquivamento interrompido
+    inicio, fim = _intervalo_mes(mes)
+
+    # Só leitura no banco vivo (o que já tem commit); a cópia vai para o arquivo numa conexão própria
+    conn = banco.pool._nova_conexao()
+    try:
+        conn.execute("ATTACH DATABASE ? AS arq", (arquivo,))
+        conn.execute("PRAGMA arq.journal_mode=DELETE")
+        conn.execute("BEGIN")
+        try:
+            conn.execute(f"CREATE TABLE arq.efetivo_registros AS SELECT {COLUNAS_EFETIVO_REGISTROS} "
+                         "FROM main.efetivo_registros WHERE 0")
+            conn.execute(f"CREATE TABLE arq.apontamentos_registros AS SELECT {COLUNAS_APONTAMENTOS_REGISTROS} "
+                         "FROM main.apontamentos_registros WHERE 0")
+            conn.execute(f"INSERT INTO arq.efetivo_registros SELECT {COLUNAS_EFETIVO_REGISTROS} "
+                         "FROM main.efetivo_registros WHERE data BETWEEN ? AND ? ORDER BY id", (inicio, fim))
+            conn.execute(f"INSERT INTO arq.apontamentos_registros SELECT {COLUNAS_APONTAMENTOS_REGISTROS} "
+                         "FROM main.apontamentos_registros WHERE data_apontamento BETWEEN ? AND ? ORDER BY id",
+                         (inicio, fim))
+            conn.execute("CREATE INDEX arq.idx_efetivo_data ON efetivo_registros (data)")
+            conn.execute("CREATE INDEX arq.idx_apont_data ON apontamentos_registros (data_apontamento)")
+            contagem = _contagem_mes(conn, "main", mes)
+            if _contagem_mes(conn, "arq", mes) != contagem:
+                raise RuntimeError(f"Cópia do mês {mes} não confere com o banco vivo")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.execute("DETACH DATABASE arq")
+    finally:
+        conn.close()
+
+    try:
+        _remover_mes_do_banco_vivo(mes, contagem)
+    except BaseException:
+        os.remove(arquivo)
+        raise
+    return contagem[0][0], contagem[1][0]
+
+def arquivar_meses_fechados(meses_ativos=MESES_ATIVOS):
+    """Arquiva os meses anteriores aos `meses_ativos` mais recentes (contando o corrente).
+    Retorna {mes: (registros de efetivo, apontamentos)}."""
+    hoje = datetime.now()
+    indice = hoje.year * 12 + hoje.month - 1 - (meses_ativos - 1)
+    limite = f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+    with get_connection() as conn:
+        meses = [row[0] for row in conn.execute('''
+            SELECT substr(data, 1, 7) FROM efetivo_registros WHERE data < ?
+            UNION
+            SELECT substr(data_apontamento, 1, 7) FROM apontamentos_registros WHERE data_apontamento < ?
+            ORDER BY 1''', (limite, limite)) if row[0]]
+    return {mes: arquivar_mes(mes) for mes in meses}
+
+@escrita
+def _restaurar_mes(mes):
+    if not _mes_arquivado(mes):
+        raise ValueError(f"O mês {mes} não está arquivado")
+    arquivo = sqlite3.connect(_arquivo_mes(mes))
+    try:
+        linhas_efetivo = arquivo.execute(f"SELECT {COLUNAS_EFETIVO_REGISTROS} FROM efetivo_registros "
+                                         "ORDER BY id").fetchall()
+        linhas_apontamentos = arquivo.execute(f"SELECT {COLUNAS_APONTAMENTOS_REGISTROS} FROM apontamentos_registros "
+                                              "ORDER BY id").fetchall()
+    finally:
+        arquivo.close()
+    with transacao() as conn:
+        # Os ids do efetivo podem ter sido reaproveitados no banco vivo; os dos
+        # apontamentos não (AUTOINCREMENT) e seguem valendo como cursor da paginação
+        conn.executemany("INSERT INTO efetivo_registros (data, colaborador_id, status, situacao_id, funcao_id) "
+                         "VALUES (?, ?, ?, ?, ?)", [linha[1:] for linha in linhas_efetivo])
+        conn.executemany(f"INSERT INTO apontamentos_registros ({COLUNAS_APONTAMENTOS_REGISTROS}) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas_apontamentos)
+        conn.execute("DELETE FROM meses_arquivados WHERE mes = ?", (mes,))
+        _marcar_alteracao(conn, "efetivo_diario", "apontamentos", "meses_arquivados")
+    return len(linhas_efetivo), len(linhas_apontamentos)
+
+@escrita
+def _apagar_arquivo_mes(mes):
+    # Tarefa seguinte ao commit da restauração; se o mês já foi arquivado de
+    # novo, o arquivo é o novo e fica
+    arquivo = _arquivo_mes(mes)
+    if not _mes_arquivado(mes) and os.path.exists(arquivo):
+        os.remove(arquivo)
+
+def desarquivar_mes(mes):
+    """Devolve um mês arquivado ao banco vivo e apaga o arquivo. Retorna (registros de efetivo, apontamentos).
+
+    A volta das linhas é uma escrita da fila e o arquivo só é apagado depois
+    do commit dela; por isso não pode ser chamada dentro de uma transação.
+    """
+    if _fila_escrita.na_escritora() or _em_transacao():
+        raise RuntimeError("desarquivar_mes não pode rodar dentro de uma transação ou de outra escrita")
+    quantidades = _restaurar_mes(mes)
+    _apagar_arquivo_mes(mes)
+    return quantidades
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manutenção do banco de dados de obras.")
+    parser.add_argument("comando", choices=["migrar", "reconstruir-resumo", "verificar-resumo", "compactar",
+                                            "arquivar", "desarquivar", "importar"])
+    parser.add_argument("--obra", default=OBRA_PADRAO, help="código da obra (padrão: obra principal)")
+    parser.add_argument("--mes", help="mês AAAA-MM (arquivar um mês específico / desarquivar)")
+    parser.add_argument("--manter", type=int, default=MESES_ATIVOS,
+                        help=f"meses mantidos no banco vivo ao arquivar (padrão: {MESES_ATIVOS})")
+    parser.add_argument("--pasta", help="importar: pasta com as planilhas de efetivo (.xlsx)")
+    parser.add_argument("--recursivo", action="store_true", help="importar: inclui as subpastas")
+    parser.add_argument("--processos", type=int, help="importar: processos de leitura (padrão: nº de CPUs)")
+    parser.add_argument("--relatorio", help="importar: grava o relatório em JSON neste arquivo")
+    parser.add_argument("--aceitar-fora-do-cadastro", action="store_true",
+                        help="importar: não rejeita matrículas ausentes do cadastro de funcionários")
+    args = parser.parse_args()
+    _obra_local.codigo = args.obra.upper()
+
+    if args.comando == "migrar":
+        print(f"Esquema na versão {migrar()}")
+        raise SystemExit(0)
+
+    init_db()
+    if args.comando == "compactar":
+        antes, depois = compactar_banco()
+        print(f"Banco compactado: {antes} MB -> {depois} MB")
+    elif args.comando == "arquivar":
+        arquivados = {args.mes: arquivar_mes(args.mes)} if args.mes else arquivar_meses_fechados(args.manter)
+        for mes, (efetivo, apontamentos) in arquivados.items():
+            print(f"{mes}: {efetivo} registros de efetivo e {apontamentos} apontamentos -> {_arquivo_mes(mes)}")
+        print(f"{len(arquivados)} mês(es) arquivado(s)")
+    elif args.comando == "importar":
+        if not args.pasta:
+            parser.error("informe --pasta")
+        arquivos = planilhas_da_pasta(args.pasta, args.recursivo)
+        inicio = time.perf_counter()
+
+        def mostrar(item):
+            if item["erro"]:
+                print(f"ERRO  {item['arquivo']}: {item['erro']}")
+            else:
+                periodo = f"{item['datas'][0]} a {item['datas'][-1]}" if item["datas"] else "sem datas"
+                print(f"OK    {item['arquivo']}: {item['inseridas']} registros, {item['rejeitadas']} rejeitada(s), "
+                      f"{len(item['datas'])} dia(s) ({periodo})")
+            for motivo, n in Counter(r["motivo"] for r in item["rejeicoes"]).most_common():
+                print(f"        {n} {motivo}")
+            for de, para in item["situacoes_corrigidas"].items():
+                print(f"        situação '{de}' gravada como '{para}'")
+
+        resultados = importar_pasta_efetivo(arquivos, args.processos, progresso=mostrar,
+                                            exigir_cadastro=not args.aceitar_fora_do_cadastro)
+        falhas = [r for r in resultados if r["erro"]]
+        total = {"arquivos": len(resultados), "com_erro": len(falhas),
+                 "inseridas": sum(r["inseridas"] for r in resultados),
+                 "rejeitadas": sum(r["rejeitadas"] for r in resultados),
+                 "dias": len({d for r in resultados for d in r["datas"]}),
+                 "duracao_s": round(time.perf_counter() - inicio, 2)}
+        print(f"{total['arquivos']} arquivo(s), {total['com_erro']} com erro: {total['inseridas']} registros em "
+              f"{total['dias']} dia(s), {total['rejeitadas']} linha(s) rejeitada(s), {total['duracao_s']} s")
+        if args.relatorio:
+            with open(args.relatorio, "w", encoding="utf-8") as f:
+                json.dump({"obra": obra_atual(), "executado_em": datetime.now().isoformat(timespec="seconds"),
+                           "total": total, "arquivos": resultados}, f, ensure_ascii=False, indent=2)
+        raise SystemExit(1 if falhas else 0)
+    elif args.comando == "desarquivar":
+        if not args.mes:
+            parser.error("informe --mes AAAA-MM")
+        efetivo, apontamentos = desarquivar_mes(args.mes)
+        print(f"{args.mes}: {efetivo} registros de efetivo e {apontamentos} apontamentos de volta ao banco vivo")
+    elif args.comando == "reconstruir-resumo":
+        print(f"Resumo do efetivo reconstruído: {reconstruir_resumo_efetivo()} linhas")
+    else:
+        divergencias = verificar_resumo_efetivo()
+        for d in divergencias:
+            print(" | ".join("" if v is None else str(v) for v in d))
+        print(f"{len(divergencias)} divergência(s) entre efetivo_resumo e efetivo_diario")
+        raise SystemExit(1 if divergencias else 0)
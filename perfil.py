@@ -0,0 +1,163 @@
+"""Perfil de tempo dos reruns do app_final, seção por seção.
+
+Ligado pela variável de ambiente SANTIN_PERFIL ou pelo parâmetro ?perfil= na
+URL. O valor "1" mede as seções; SANTIN_PERFIL=cprofile também grava um
+arquivo .pstats por rerun em PASTA_PERFIS (abrir com `python -m pstats
+arquivo`). O cProfile só liga pela variável de ambiente: pela URL, qualquer
+visitante poderia encher o disco do servidor com arquivos.
+
+Cada seção registra o tempo total e o separa em banco (tempo das consultas do
+db_rh nesta thread), montagem de DataFrames e construção de gráficos; o resto
+é o Streamlit desenhando widgets. Desligado, tudo vira nullcontext.
+
+O relatório de partida (relatorio_partida) guarda, uma vez por processo, o
+tempo dos imports pesados e da inicialização do banco. Por isso este módulo
+não importa nada pesado no topo: ele é o primeiro a ser carregado pelo app.
+"""
+import os
+import sys
+import time
+import importlib
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+PASTA_PERFIS = os.environ.get("SANTIN_PERFIL_DIR", "perfis")
+
+ETAPAS = {"dados": "DataFrames (ms)", "graficos": "Gráficos (ms)"}
+COLUNAS = ["Seção", "Total (ms)", "Banco (ms)", *ETAPAS.values(), "Outros (ms)"]
+
+
+# --- PARTIDA DO PROCESSO ---
+
+_INICIO_PROCESSO = time.perf_counter()
+_partida = {}
+_partida_lock = threading.Lock()
+
+
+@contextmanager
+def partida(etapa):
+    """Mede uma etapa de partida; só a primeira execução por processo entra no relatório."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _partida_lock:
+            _partida.setdefault(etapa, {"Etapa": etapa, "Duração (ms)": round((time.perf_counter() - inicio) * 1000, 1),
+                                        "Após a partida (ms)": round((inicio - _INICIO_PROCESSO) * 1000, 1)})
+
+
+def importar(nome):
+    """Importa um módulo sob demanda, registrando o tempo da primeira carga na partida."""
+    modulo = sys.modules.get(nome)
+    if modulo is None:
+        with partida(f"import {nome}"):
+            modulo = importlib.import_module(nome)
+    return modulo
+
+
+def relatorio_partida():
+    """Etapas da partida deste processo na ordem em que aconteceram."""
+    with _partida_lock:
+        return sorted(_partida.values(), key=lambda e: e["Após a partida (ms)"])
+
+
+# --- PERFIL DOS RERUNS ---
+
+def _tempo_banco():
+    import db_rh
+    return db_rh.tempo_consultas_thread()
+
+
+class PerfilRerun:
+    """Cronômetro de um rerun: seções (linhas da tabela) e etapas dentro delas."""
+
+    ativo = True
+
+    def __init__(self, cprofile=False):
+        self.linhas = []
+        self.arquivo = None
+        self._atual = None
+        self._inicio = time.perf_counter()
+        self._banco_inicio = _tempo_banco()
+        self._profiler = None
+        if cprofile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Outro profiler já ativo (ex.: outra sessão perfilando ao mesmo tempo)
+                self._profiler = None
+
+    @contextmanager
+    def secao(self, nome):
+        linha = dict.fromkeys(COLUNAS, 0.0)
+        linha["Seção"] = nome
+        anterior, self._atual = self._atual, linha
+        t0, b0 = time.perf_counter(), _tempo_banco()
+        try:
+            yield
+        finally:
+            linha["Total (ms)"] = (time.perf_counter() - t0) * 1000
+            linha["Banco (ms)"] = _tempo_banco() - b0
+            self._atual = anterior
+            self.linhas.append(linha)
+
+    @contextmanager
+    def etapa(self, tipo):
+        # O banco consultado dentro da etapa já aparece na coluna Banco
+        t0, b0 = time.perf_counter(), _tempo_banco()
+        try:
+            yield
+        finally:
+            if self._atual is not None:
+                decorrido = (time.perf_counter() - t0) * 1000 - (_tempo_banco() - b0)
+                self._atual[ETAPAS[tipo]] += max(decorrido, 0.0)
+
+    def finalizar(self):
+        """Encerra o rerun: grava o .pstats (se pedido) e devolve a tabela por seção."""
+        pd = importar("pandas")
+        total = {"Seção": "Rerun completo", "Total (ms)": (time.perf_counter() - self._inicio) * 1000,
+                 "Banco (ms)": _tempo_banco() - self._banco_inicio}
+        for coluna in ETAPAS.values():
+            total[coluna] = sum(l[coluna] for l in self.linhas)
+        df = pd.DataFrame(self.linhas + [total], columns=COLUNAS).fillna(0.0)
+        df["Outros (ms)"] = (df["Total (ms)"] - df["Banco (ms)"] - df[list(ETAPAS.values())].sum(axis=1)).clip(lower=0)
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(PASTA_PERFIS, exist_ok=True)
+            self.arquivo = os.path.join(PASTA_PERFIS, f"rerun_{datetime.now():%Y%m%d_%H%M%S_%f}.pstats")
+            self._profiler.dump_stats(self.arquivo)
+            self._profiler = None
+        return df.round(1)
+
+
+class _PerfilDesligado:
+    ativo = False
+    arquivo = None
+
+    def secao(self, nome):
+        return nullcontext()
+
+    def etapa(self, tipo):
+        return nullcontext()
+
+    def finalizar(self):
+        return None
+
+
+_DESLIGADO = _PerfilDesligado()
+
+
+def iniciar(parametro=None):
+    """Perfil do rerun atual. `parametro` é o ?perfil= da URL; sem ele vale SANTIN_PERFIL.
+
+    Pela URL só se liga a tabela de tempos; o .pstats depende de SANTIN_PERFIL=cprofile.
+    """
+    ambiente = os.environ.get("SANTIN_PERFIL", "").strip().lower()
+    modo = (parametro or ambiente).strip().lower()
+    if modo in ("", "0", "nao", "não", "false"):
+        return _DESLIGADO
+    return PerfilRerun(cprofile=ambiente == "cprofile")